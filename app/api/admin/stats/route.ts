@@ -49,31 +49,48 @@ export async function GET(request: Request) {
     const startOfToday = new Date(now.setHours(0, 0, 0, 0))
     const startOfMonth = new Date(now.getFullYear(), now.getMonth(), 1)
     const startOfLastMonth = new Date(now.getFullYear(), now.getMonth() - 1, 1)
-    const endOfLastMonth = new Date(now.getFullYear(), now.getMonth(), 0)
+    const lastMonthSameDay = new Date(now.getFullYear(), now.getMonth() - 1, now.getDate())
 
-    // 1. Miembros Activos (con membresía activa y no expirada) - filtrado por gimnasio
-    const activeMembers = await prisma.member.count({
+    // Los días anteriores a hoy salen de los agregados diarios que mantiene
+    // scripts/rollup-stats.py (gym_daily_stats); solo hoy se cuenta en vivo
+    const dailyStats = await prisma.gymDailyStats.findMany({
       where: {
         gymId: gymId,
-        status: "active",
-        membershipEnd: {
-          gte: now,
+        day: {
+          gte: toDay(startOfLastMonth),
+          lt: toDay(startOfToday),
         },
       },
+      select: {
+        day: true,
+        checkins: true,
+        activeMembers: true,
+        newMembers: true,
+        revenue: true,
+      },
     })
+    type DailyRow = (typeof dailyStats)[number]
+
+    const daysBetween = (from: Date, to: Date) =>
+      dailyStats.filter((row) => row.day >= toDay(from) && row.day < toDay(to))
+    const sumOf = (rows: DailyRow[], key: "checkins" | "newMembers" | "revenue") =>
+      rows.reduce((total, row) => total + row[key], 0)
+    const lastMonthRow = dailyStats.find((row) => row.day.getTime() === toDay(lastMonthSameDay).getTime())
 
-    // Miembros activos del mes anterior para calcular tendencia
-    const lastMonthDate = new Date(now.getFullYear(), now.getMonth() - 1, now.getDate())
-    const activeMembersLastMonth = await prisma.member.count({
+    // 1. Miembros Activos (con membresía activa y no expirada) - filtrado por gimnasio
+    const activeMembers = await prisma.member.count({
       where: {
         gymId: gymId,
         status: "active",
         membershipEnd: {
-          gte: lastMonthDate,
+          gte: now,
         },
       },
     })
 
+    // Miembros activos el mismo día del mes anterior para calcular tendencia
+    const activeMembersLastMonth = lastMonthRow?.activeMembers ?? 0
+
     const activeMembersTrend = activeMembersLastMonth > 0
       ? Math.round(((activeMembers - activeMembersLastMonth) / activeMembersLastMonth) * 100)
       : 0
@@ -90,31 +107,20 @@ export async function GET(request: Request) {
       },
     })
 
-    // Check-ins del mismo día del mes anterior (aproximado)
-    const lastMonthSameDay = new Date(now.getFullYear(), now.getMonth() - 1, now.getDate())
-    const checkinsLastMonth = await prisma.checkIn.count({
-      where: {
-        checkinTime: {
-          gte: new Date(lastMonthSameDay.setHours(0, 0, 0, 0)),
-          lt: new Date(lastMonthSameDay.setHours(23, 59, 59, 999)),
-        },
-        member: {
-          gymId: gymId,
-        },
-      },
-    })
+    // Check-ins del mismo día del mes anterior
+    const checkinsLastMonth = lastMonthRow?.checkins ?? 0
 
     const checkinsTrend = checkinsLastMonth > 0
       ? Math.round(((todayCheckins - checkinsLastMonth) / checkinsLastMonth) * 100)
       : 0
 
     // 3. Ingresos del Mes (suma de precios de planes de membresía de miembros creados este mes)
-    // Obtener todos los miembros creados este mes - filtrado por gimnasio
-    const membersThisMonth = await prisma.member.findMany({
+    // Los agregados ya tienen los días anteriores; faltan los miembros creados hoy
+    const membersToday = await prisma.member.findMany({
       where: {
         gymId: gymId,
         createdAt: {
-          gte: startOfMonth,
+          gte: startOfToday,
         },
       },
       select: {
@@ -134,9 +140,9 @@ export async function GET(request: Request) {
       },
     })
 
-    // Calcular ingresos basado en membresías creadas este mes
-    let monthlyRevenue = 0
-    for (const member of membersThisMonth) {
+    // Misma regla que scripts/rollup-stats.py: precio mensual del plan
+    let todayRevenue = 0
+    for (const member of membersToday) {
       const plan = allPlans.find((p) => p.name === member.membershipType)
       if (plan) {
         // Si el periodo es "mes", usar el precio directamente
@@ -148,61 +154,23 @@ export async function GET(request: Request) {
         } else if (plan.period === "año") {
           monthlyPrice = plan.price / 12
         }
-        monthlyRevenue += monthlyPrice
+        todayRevenue += monthlyPrice
       }
     }
 
-    // Ingresos del mes anterior
-    const membersLastMonth = await prisma.member.findMany({
-      where: {
-        gymId: gymId,
-        createdAt: {
-          gte: startOfLastMonth,
-          lt: startOfMonth,
-        },
-      },
-      select: {
-        membershipType: true,
-      },
-    })
+    const monthlyRevenue = sumOf(daysBetween(startOfMonth, startOfToday), "revenue") + todayRevenue
 
-    let lastMonthRevenue = 0
-    for (const member of membersLastMonth) {
-      const plan = allPlans.find((p) => p.name === member.membershipType)
-      if (plan) {
-        let monthlyPrice = plan.price
-        if (plan.period === "trimestre") {
-          monthlyPrice = plan.price / 3
-        } else if (plan.period === "año") {
-          monthlyPrice = plan.price / 12
-        }
-        lastMonthRevenue += monthlyPrice
-      }
-    }
+    // Ingresos del mes anterior
+    const lastMonthRevenue = sumOf(daysBetween(startOfLastMonth, startOfMonth), "revenue")
 
     const revenueTrend = lastMonthRevenue > 0
       ? Math.round(((monthlyRevenue - lastMonthRevenue) / lastMonthRevenue) * 100)
       : 0
 
     // 4. Nuevas Membresías (miembros creados este mes) - filtrado por gimnasio
-    const newMemberships = await prisma.member.count({
-      where: {
-        gymId: gymId,
-        createdAt: {
-          gte: startOfMonth,
-        },
-      },
-    })
+    const newMemberships = sumOf(daysBetween(startOfMonth, startOfToday), "newMembers") + membersToday.length
 
-    const newMembershipsLastMonth = await prisma.member.count({
-      where: {
-        gymId: gymId,
-        createdAt: {
-          gte: startOfLastMonth,
-          lt: startOfMonth,
-        },
-      },
-    })
+    const newMembershipsLastMonth = sumOf(daysBetween(startOfLastMonth, startOfMonth), "newMembers")
 
     const newMembershipsTrend = newMembershipsLastMonth > 0
       ? Math.round(((newMemberships - newMembershipsLastMonth) / newMembershipsLastMonth) * 100)
@@ -213,20 +181,6 @@ export async function GET(request: Request) {
     weekStart.setDate(now.getDate() - now.getDay() + 1) // Lunes de esta semana
     weekStart.setHours(0, 0, 0, 0)
 
-    const weeklyCheckins = await prisma.checkIn.findMany({
-      where: {
-        checkinTime: {
-          gte: weekStart,
-        },
-        member: {
-          gymId: gymId,
-        },
-      },
-      select: {
-        checkinTime: true,
-      },
-    })
-
     // Agrupar por día de la semana
     const attendanceByDay: { [key: string]: number } = {
       Lun: 0,
@@ -237,12 +191,15 @@ export async function GET(request: Request) {
       Sáb: 0,
       Dom: 0,
     }
+    const dayNames = ["Dom", "Lun", "Mar", "Mié", "Jue", "Vie", "Sáb"]
 
-    weeklyCheckins.forEach((checkin) => {
-      const day = new Date(checkin.checkinTime).getDay()
-      const dayNames = ["Dom", "Lun", "Mar", "Mié", "Jue", "Vie", "Sáb"]
-      attendanceByDay[dayNames[day]]++
+    // Los días de los agregados son fechas UTC
+    daysBetween(weekStart, startOfToday).forEach((row) => {
+      attendanceByDay[dayNames[row.day.getUTCDay()]] += row.checkins
     })
+    if (weekStart <= startOfToday) {
+      attendanceByDay[dayNames[startOfToday.getDay()]] += todayCheckins
+    }
 
     // 6. Total de miembros inscritos hasta hoy - filtrado por gimnasio
     const totalMembers = await prisma.member.count({
@@ -283,3 +240,7 @@ export async function GET(request: Request) {
   }
 }
 
+// Fecha (sin hora) de un día local, como la guarda una columna @db.Date
+function toDay(date: Date) {
+  return new Date(Date.UTC(date.getFullYear(), date.getMonth(), date.getDate()))
+}
@@ -2,7 +2,7 @@ import { NextResponse } from "next/server"
 import { cookies } from "next/headers"
 import { z } from "zod"
 import { prisma } from "@/lib/db"
-import bcrypt from "bcryptjs"
+import { hashPassword, needsRehash, verifyPassword } from "@/lib/password"
 import { SignJWT } from "jose"
 
 const loginSchema = z.object({
@@ -59,7 +59,7 @@ export async function POST(request: Request) {
     }
 
     // Verify password
-    const isValidPassword = await bcrypt.compare(password, user.passwordHash)
+    const isValidPassword = await verifyPassword(password, user.passwordHash)
 
     if (!isValidPassword) {
       return NextResponse.json(
@@ -68,6 +68,19 @@ export async function POST(request: Request) {
       )
     }
 
+    // Move the hash to the configured cost while the password is at hand;
+    // skipped if the password changed meanwhile, and never fails the login
+    if (needsRehash(user.passwordHash)) {
+      try {
+        await prisma.userAccount.updateMany({
+          where: { id: user.id, passwordHash: user.passwordHash },
+          data: { passwordHash: await hashPassword(password) },
+        })
+      } catch (error) {
+        console.error("Error rehashing user password", error)
+      }
+    }
+
     // Create JWT token
     const token = await new SignJWT({
       userId: user.id,
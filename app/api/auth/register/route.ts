@@ -1,8 +1,8 @@
 import { NextResponse } from "next/server"
-import bcrypt from "bcryptjs"
 import { z } from "zod"
 
 import { prisma } from "@/lib/db"
+import { hashPassword } from "@/lib/password"
 
 const registerSchema = z.object({
   firstName: z
@@ -62,7 +62,7 @@ export async function POST(request: Request) {
       )
     }
 
-    const hashedPassword = await bcrypt.hash(password, 10)
+    const hashedPassword = await hashPassword(password)
     const fullName = `${firstName.trim()} ${lastName.trim()}`.trim()
 
     const user = await prisma.userAccount.create({
@@ -1,8 +1,8 @@
 import { NextResponse } from "next/server"
-import bcrypt from "bcryptjs"
 import { z } from "zod"
 
 import { prisma } from "@/lib/db"
+import { hashPassword } from "@/lib/password"
 
 const registerSchema = z.object({
   name: z.string().min(3, "El nombre debe tener al menos 3 caracteres"),
@@ -71,7 +71,7 @@ export async function POST(request: Request) {
       )
     }
 
-    const hashedPassword = await bcrypt.hash(password, 10)
+    const hashedPassword = await hashPassword(password)
 
     const userAccount = await prisma.userAccount.create({
       data: {
@@ -2,7 +2,7 @@ import { NextResponse } from "next/server"
 import { getGymSession, getGymAccess } from "@/lib/gym-session"
 import { prisma } from "@/lib/db"
 import { z } from "zod"
-import bcrypt from "bcryptjs"
+import { hashPassword, verifyPassword } from "@/lib/password"
 
 const passwordSchema = z.object({
   currentPassword: z.string().min(1, "La contraseña actual es obligatoria"),
@@ -77,7 +77,7 @@ export async function PUT(
       )
     }
 
-    const isValidPassword = await bcrypt.compare(
+    const isValidPassword = await verifyPassword(
       validation.data.currentPassword,
       gymData.passwordHash
     )
@@ -90,7 +90,7 @@ export async function PUT(
     }
 
     // Hashear nueva contraseña
-    const hashedPassword = await bcrypt.hash(validation.data.newPassword, 10)
+    const hashedPassword = await hashPassword(validation.data.newPassword)
 
     // Actualizar contraseña
     await prisma.gym.update({
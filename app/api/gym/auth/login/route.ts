@@ -2,7 +2,7 @@ import { NextResponse } from "next/server"
 import { cookies } from "next/headers"
 import { z } from "zod"
 import { prisma } from "@/lib/db"
-import bcrypt from "bcryptjs"
+import { hashPassword, needsRehash, verifyPassword } from "@/lib/password"
 import { SignJWT } from "jose"
 
 const loginSchema = z.object({
@@ -60,7 +60,7 @@ export async function POST(request: Request) {
     }
 
     // Verify password
-    const isValidPassword = await bcrypt.compare(password, gym.passwordHash)
+    const isValidPassword = await verifyPassword(password, gym.passwordHash)
 
     if (!isValidPassword) {
       return NextResponse.json(
@@ -69,6 +69,19 @@ export async function POST(request: Request) {
       )
     }
 
+    // Move the hash to the configured cost while the password is at hand;
+    // skipped if the password changed meanwhile, and never fails the login
+    if (needsRehash(gym.passwordHash)) {
+      try {
+        await prisma.gym.updateMany({
+          where: { id: gym.id, passwordHash: gym.passwordHash },
+          data: { passwordHash: await hashPassword(password) },
+        })
+      } catch (error) {
+        console.error("Error rehashing gym password", error)
+      }
+    }
+
     // Create JWT token
     const token = await new SignJWT({
       gymId: gym.id,
@@ -0,0 +1,51 @@
+import bcrypt from "bcryptjs"
+
+// bcrypt accepts costs 4-31; bcryptjs silently clamps anything else, which
+// would make every stored hash look out of date
+const MIN_ROUNDS = 4
+const MAX_ROUNDS = 31
+const DEFAULT_ROUNDS = 10
+
+function configuredRounds() {
+  const value = Number(process.env.BCRYPT_ROUNDS)
+  if (!process.env.BCRYPT_ROUNDS || !Number.isInteger(value)) {
+    return DEFAULT_ROUNDS
+  }
+  const rounds = Math.min(MAX_ROUNDS, Math.max(MIN_ROUNDS, value))
+  if (rounds !== value) {
+    console.warn(`BCRYPT_ROUNDS=${value} is outside ${MIN_ROUNDS}-${MAX_ROUNDS}, using ${rounds}`)
+  }
+  return rounds
+}
+
+// Cost factor for new hashes. Each round doubles the time of a login, so
+// calibrate it on the server with scripts/calibrate-bcrypt.py
+export const BCRYPT_ROUNDS = configuredRounds()
+
+// Re-hashing down to a cheaper cost weakens stored passwords: only with
+// BCRYPT_REHASH_DOWN=true
+export const BCRYPT_REHASH_DOWN = process.env.BCRYPT_REHASH_DOWN === "true"
+
+export function hashPassword(password: string) {
+  return bcrypt.hash(password, BCRYPT_ROUNDS)
+}
+
+export function verifyPassword(password: string, hash: string) {
+  return bcrypt.compare(password, hash)
+}
+
+// Cost factor stored in a bcrypt hash ("$2a$10$..."), or null if it is not one
+export function hashRounds(hash: string) {
+  const match = /^\$2[abxy]?\$(\d{2})\$/.exec(hash)
+  return match ? Number(match[1]) : null
+}
+
+// A verified password whose hash is cheaper than the target is re-hashed on
+// login; a stronger one only when BCRYPT_REHASH_DOWN is set
+export function needsRehash(hash: string) {
+  const rounds = hashRounds(hash)
+  if (rounds === null) {
+    return false
+  }
+  return rounds < BCRYPT_ROUNDS || (BCRYPT_REHASH_DOWN && rounds > BCRYPT_ROUNDS)
+}
@@ -0,0 +1,24 @@
+-- CreateTable
+CREATE TABLE "gym_daily_stats" (
+    "gym_id" INTEGER NOT NULL,
+    "day" DATE NOT NULL,
+    "checkins" INTEGER NOT NULL DEFAULT 0,
+    "active_members" INTEGER NOT NULL DEFAULT 0,
+    "new_members" INTEGER NOT NULL DEFAULT 0,
+    "revenue" DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "updated_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "gym_daily_stats_pkey" PRIMARY KEY ("gym_id","day")
+);
+
+-- CreateTable
+CREATE TABLE "gym_daily_plan_revenue" (
+    "gym_id" INTEGER NOT NULL,
+    "day" DATE NOT NULL,
+    "plan_name" TEXT NOT NULL,
+    "new_members" INTEGER NOT NULL DEFAULT 0,
+    "revenue" DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "updated_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "gym_daily_plan_revenue_pkey" PRIMARY KEY ("gym_id","day","plan_name")
+);
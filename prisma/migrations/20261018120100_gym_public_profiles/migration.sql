@@ -0,0 +1,12 @@
+-- CreateTable
+CREATE TABLE "gym_public_profiles" (
+    "gym_id" INTEGER NOT NULL,
+    "slug" TEXT,
+    "profile" JSON NOT NULL,
+    "refreshed_at" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "gym_public_profiles_pkey" PRIMARY KEY ("gym_id")
+);
+
+-- CreateIndex
+CREATE INDEX "gym_public_profiles_slug_idx" ON "gym_public_profiles"("slug");
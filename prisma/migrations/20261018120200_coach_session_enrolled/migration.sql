@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "coach_class_sessions" ADD COLUMN     "enrolled" INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Benchmark the SQL behind the admin stats and public gym routes.
+
+Replays every query in ``db/queries.py`` with parameters for a sample of
+gyms, from several connections at once, and records p50/p95/p99 latency
+plus one ``EXPLAIN (ANALYZE, BUFFERS)`` plan per query (run against the
+gym with the most members). Results are written as JSON together with the
+table sizes they were measured at, so runs can be compared:
+
+    python scripts/generate-load-data.py --members 1000000 --gyms 50
+    python scripts/benchmark.py --concurrency 8 --output antes.json
+    python scripts/benchmark.py --compare antes.json   # sale con 1 si hay regresiones
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connect, connection, get_database_url
+from db.catalog import introspect
+from db.config import PROJECT_ROOT
+from db.latency import percentile
+from db.queries import find_queries, route_params
+
+RESULTS_DIR = PROJECT_ROOT / "benchmark-results"
+
+# Sub-millisecond queries jitter by more than 20%; ignore changes below this
+MIN_REGRESSION_MS = 0.5
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mide la latencia de las consultas de las rutas de la API")
+    parser.add_argument("--query", action="append", help="Consulta o grupo a medir (p. ej. stats, public.classes)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conexiones simultáneas (por defecto 4)")
+    parser.add_argument("--iterations", type=int, default=50, help="Ejecuciones por consulta (por defecto 50)")
+    parser.add_argument("--warmup", type=int, default=3, help="Ejecuciones de calentamiento sin medir")
+    parser.add_argument("--gyms", type=int, default=10, help="Gimnasios distintos a consultar (por defecto 10)")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla para elegir gimnasios y parámetros")
+    parser.add_argument("--now", type=datetime.fromisoformat, help="Fecha/hora de referencia (por defecto ahora)")
+    parser.add_argument("--no-explain", action="store_true", help="No guardar planes EXPLAIN ANALYZE")
+    parser.add_argument("--output", type=Path, help="Archivo JSON de salida (por defecto benchmark-results/)")
+    parser.add_argument("--compare", type=Path, help="Resultado anterior con el que comparar")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="Aumento de p95 (%%) que cuenta como regresión al comparar (por defecto 20)",
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.iterations < 1 or args.gyms < 1 or args.warmup < 0:
+        parser.error("--concurrency, --iterations y --gyms deben ser al menos 1")
+    return args
+
+
+def summarize(latencies_ms, elapsed):
+    values = sorted(latencies_ms)
+    return {
+        "samples": len(values),
+        "min_ms": round(values[0], 3),
+        "mean_ms": round(statistics.fmean(values), 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3),
+        "throughput_qps": round(len(values) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+class Workers:
+    """One dedicated connection per worker thread, outside the shared pool."""
+
+    def __init__(self, concurrency, dsn):
+        self.dsn = dsn
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def cursor(self):
+        if not hasattr(self.local, "cursor"):
+            conn = connect(self.dsn, autocommit=True)
+            with self.lock:
+                self.connections.append(conn)
+            self.local.cursor = conn.cursor()
+        return self.local.cursor
+
+    def timed(self, sql, params):
+        cursor = self.cursor()
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        return (time.perf_counter() - started) * 1000
+
+    def run(self, sql, param_sets):
+        return list(self.executor.map(lambda params: self.timed(sql, params), param_sets))
+
+    def close(self):
+        self.executor.shutdown()
+        for conn in self.connections:
+            conn.close()
+
+
+def pick_gyms(cursor, count, rng):
+    cursor.execute("SELECT id, slug FROM gyms ORDER BY id;")
+    gyms = cursor.fetchall()
+    if len(gyms) > count:
+        gyms = rng.sample(gyms, count)
+    cursor.execute("""
+        SELECT g.id, g.slug
+        FROM gyms g
+        JOIN (SELECT gym_id, COUNT(*) AS n FROM members GROUP BY gym_id ORDER BY n DESC LIMIT 1) m
+            ON m.gym_id = g.id;
+    """)
+    largest = cursor.fetchone() or (gyms[0] if gyms else None)
+    return gyms, largest
+
+
+def explain(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query.sql, params)
+    plan = cursor.fetchone()[0][0]
+    root = plan["Plan"]
+    return {
+        "node": root["Node Type"],
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit_blocks": root.get("Shared Hit Blocks"),
+        "shared_read_blocks": root.get("Shared Read Blocks"),
+        "plan": plan,
+    }
+
+
+def database_info(cursor):
+    cursor.execute("SHOW server_version;")
+    version = cursor.fetchone()[0]
+    tables = introspect(cursor)
+    return {
+        "server_version": version,
+        "tables": {
+            name: {"rows": table.estimated_rows, "bytes": table.total_bytes}
+            for name, table in tables.items()
+        },
+    }
+
+
+def run_benchmark(args, queries):
+    rng = random.Random(args.seed)
+    now = args.now or datetime.now()
+
+    with connection(autocommit=True) as conn:
+        cursor = conn.cursor()
+        info = database_info(cursor)
+        gyms, largest = pick_gyms(cursor, args.gyms, rng)
+        if not gyms:
+            raise DatabaseConfigError("No hay gimnasios; genera datos con generate-load-data.py")
+
+        workers = Workers(args.concurrency, get_database_url())
+        results = {}
+        try:
+            for query in queries:
+                warmup = [route_params(*rng.choice(gyms), now) for _ in range(args.warmup)]
+                workers.run(query.sql, warmup)
+
+                param_sets = [route_params(*rng.choice(gyms), now) for _ in range(args.iterations)]
+                started = time.perf_counter()
+                latencies = workers.run(query.sql, param_sets)
+                entry = {"route": query.route, **summarize(latencies, time.perf_counter() - started)}
+                if not args.no_explain:
+                    entry["explain"] = explain(cursor, query, route_params(*largest, now))
+                results[query.name] = entry
+                print(
+                    f"  {query.name:<40} p50 {entry['p50_ms']:>8.2f} ms  "
+                    f"p95 {entry['p95_ms']:>8.2f} ms  p99 {entry['p99_ms']:>8.2f} ms"
+                )
+        finally:
+            workers.close()
+        cursor.close()
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "gyms": [gym_id for gym_id, _ in gyms],
+            "seed": args.seed,
+            "now": now.isoformat(),
+        },
+        "database": info,
+        "queries": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print p95 deltas against a previous run; return the regressed query names."""
+    regressions = []
+    print(f"\n📈 Comparación con {baseline.get('created_at', '?')} (p95):\n")
+    for name, entry in current["queries"].items():
+        before = baseline.get("queries", {}).get(name)
+        if not before:
+            print(f"   {name:<40} nueva")
+            continue
+        old, new = before["p95_ms"], entry["p95_ms"]
+        change = (new - old) / old * 100 if old else 0.0
+        regressed = change > threshold and new - old > MIN_REGRESSION_MS
+        marker = "❌ " if regressed else "✅ " if change < -threshold else "   "
+        print(f"{marker}{name:<40} {old:>8.2f} → {new:>8.2f} ms ({change:+.0f}%)")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    queries = find_queries(args.query)
+    if not queries:
+        print(f"❌ Ninguna consulta coincide con: {', '.join(args.query)}")
+        sys.exit(1)
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"❌ Error al leer {args.compare}: {e}")
+            sys.exit(1)
+
+    print(f"⏱️  Midiendo {len(queries)} consultas ({args.iterations} ejecuciones, {args.concurrency} conexiones)...\n")
+    try:
+        result = run_benchmark(args, queries)
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.write_text(json.dumps(result, indent=2, default=str), encoding="utf-8")
+    print(f"\n💾 Resultados guardados en {output}")
+
+    if baseline is not None:
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} consultas más lentas que el umbral ({args.threshold:.0f}%)")
+            sys.exit(1)
+        print("\n✅ Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""Pick the bcrypt cost for this server, audit stored hashes and plan their rehash.
+
+The login routes verify passwords with ``bcryptjs``, pure JavaScript that
+runs on the Node event loop: at cost N one verification takes about
+2^N work units of CPU on a single core, and nothing else runs in that
+process meanwhile. The cost factor therefore sets both the login latency
+and how many logins per second each Node process can absorb when a gym
+opens and everyone signs in at once.
+
+The tool:
+
+1. measures hash and verify time per cost on this machine, with
+   ``bcryptjs`` through ``node`` when the project's dependencies are
+   installed (what the routes run), or with the native ``bcrypt``
+   module otherwise, which is faster, so the figures are a lower bound;
+2. recommends the highest cost whose median verification fits
+   ``--budget-ms``, never below ``--min-rounds``;
+3. audits ``user_accounts.password_hash`` and ``gyms.password_hash``:
+   how many hashes use each cost, how many are not bcrypt and how many
+   accounts have no password;
+4. prints the rehash plan: with ``BCRYPT_ROUNDS`` set to the target, the
+   login routes re-hash each password cheaper than the target the next
+   time its owner signs in successfully (``lib/password.ts``). Stronger
+   hashes are only lowered with ``BCRYPT_REHASH_DOWN=true``. Hashes that
+   are not bcrypt cannot be migrated on login and are listed apart.
+
+Costs above the budget are extrapolated (each round doubles the work)
+instead of measured, so the run stays short.
+
+Usage:
+    python scripts/calibrate-bcrypt.py --budget-ms 250
+    python scripts/calibrate-bcrypt.py --peak-logins 40 --output plan-bcrypt.json
+    python scripts/calibrate-bcrypt.py --no-audit --engine python
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connection
+from db.config import PROJECT_ROOT, load_env_files
+
+# What the routes use when BCRYPT_ROUNDS is not set (lib/password.ts)
+APP_DEFAULT_ROUNDS = 10
+
+# Tables whose password_hash is audited
+HASH_TABLES = ("user_accounts", "gyms")
+
+# Once a cost is this many times over the budget, larger costs are extrapolated
+MEASURE_LIMIT = 4
+
+PASSWORD = "calibracion-bcrypt"
+
+NODE_BENCHMARK = """
+const bcrypt = require("bcryptjs");
+const [cost, samples, password] = [Number(process.argv[1]), Number(process.argv[2]), process.argv[3]];
+(async () => {
+  const hash = [], verify = [];
+  let stored;
+  for (let i = 0; i < samples; i++) {
+    let started = process.hrtime.bigint();
+    stored = await bcrypt.hash(password, cost);
+    hash.push(Number(process.hrtime.bigint() - started) / 1e6);
+    started = process.hrtime.bigint();
+    await bcrypt.compare(password, stored);
+    verify.push(Number(process.hrtime.bigint() - started) / 1e6);
+  }
+  console.log(JSON.stringify({ hash, verify }));
+})();
+"""
+
+AUDIT_SQL = """
+    SELECT substring(password_hash FROM '^\\$2[abxy]?\\$([0-9]{{2}})\\$')::integer AS cost,
+        password_hash IS NULL AS missing,
+        COUNT(*)
+    FROM {table}
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calibra el costo de bcrypt y planifica el re-hash de contraseñas")
+    parser.add_argument("--budget-ms", type=float, default=250,
+                        help="Tiempo máximo de una verificación en el login (por defecto 250 ms)")
+    parser.add_argument("--min-rounds", type=int, default=10,
+                        help="Costo mínimo aceptable aunque no cumpla el presupuesto (por defecto 10)")
+    parser.add_argument("--max-rounds", type=int, default=16, help="Costo máximo a considerar (por defecto 16)")
+    parser.add_argument("--samples", type=int, default=5, help="Mediciones por costo (por defecto 5)")
+    parser.add_argument("--engine", choices=("auto", "node", "python"), default="auto",
+                        help="bcryptjs con node (como las rutas) o bcrypt nativo de Python (por defecto auto)")
+    parser.add_argument("--peak-logins", type=float,
+                        help="Logins por segundo en el pico (p. ej. la apertura) para estimar procesos de Node")
+    parser.add_argument("--target", type=int, help="Costo objetivo del plan (por defecto el recomendado)")
+    parser.add_argument("--no-audit", action="store_true", help="Solo medir; no leer la base de datos")
+    parser.add_argument("--output", type=Path, help="Guardar mediciones, auditoría y plan en JSON")
+    args = parser.parse_args(argv)
+    if args.budget_ms <= 0:
+        parser.error("--budget-ms debe ser mayor que 0")
+    if not 4 <= args.min_rounds <= args.max_rounds <= 31:
+        parser.error("se requiere 4 <= --min-rounds <= --max-rounds <= 31")
+    if args.samples < 1:
+        parser.error("--samples debe ser al menos 1")
+    if args.target is not None and not 4 <= args.target <= 31:
+        parser.error("--target debe estar entre 4 y 31")
+    if args.peak_logins is not None and args.peak_logins <= 0:
+        parser.error("--peak-logins debe ser mayor que 0")
+    return args
+
+
+def node_available():
+    """True when node can load the project's bcryptjs."""
+    if not shutil.which("node"):
+        return False
+    result = subprocess.run(["node", "-e", 'require("bcryptjs")'], cwd=PROJECT_ROOT, capture_output=True)
+    return result.returncode == 0
+
+
+def measure_node(cost, samples):
+    result = subprocess.run(
+        ["node", "-e", NODE_BENCHMARK, str(cost), str(samples), PASSWORD],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    times = json.loads(result.stdout)
+    return times["hash"], times["verify"]
+
+
+def measure_python(cost, samples):
+    import bcrypt
+
+    hashes, verifies = [], []
+    for _ in range(samples):
+        started = time.perf_counter()
+        stored = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(cost))
+        hashes.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        bcrypt.checkpw(PASSWORD.encode("utf-8"), stored)
+        verifies.append((time.perf_counter() - started) * 1000)
+    return hashes, verifies
+
+
+def benchmark(measure, args):
+    """{cost: {"hash_ms", "verify_ms", "measured"}} from 4 to --max-rounds."""
+    results = {}
+    for cost in range(4, args.max_rounds + 1):
+        previous = results.get(cost - 1)
+        if previous and previous["verify_ms"] > args.budget_ms * MEASURE_LIMIT:
+            results[cost] = {
+                "hash_ms": previous["hash_ms"] * 2,
+                "verify_ms": previous["verify_ms"] * 2,
+                "measured": False,
+            }
+            continue
+        # Cheap costs are repeated more so timer noise does not dominate
+        samples = args.samples * (4 if cost < 8 else 1)
+        hashes, verifies = measure(cost, samples)
+        results[cost] = {
+            "hash_ms": statistics.median(hashes),
+            "verify_ms": statistics.median(verifies),
+            "measured": True,
+        }
+        print(f"  ✓ costo {cost:>2}: hash {results[cost]['hash_ms']:>9.1f} ms · "
+              f"verificación {results[cost]['verify_ms']:>9.1f} ms")
+    extrapolated = [cost for cost, r in results.items() if not r["measured"]]
+    if extrapolated:
+        print(f"  ℹ️  Costos {extrapolated[0]}-{extrapolated[-1]} extrapolados (cada ronda duplica el tiempo)")
+    return results
+
+
+def recommend(results, args):
+    """Highest cost within budget, never below --min-rounds; also whether the budget was met."""
+    within = [cost for cost, r in results.items() if r["verify_ms"] <= args.budget_ms]
+    best = max(within, default=None)
+    if best is None or best < args.min_rounds:
+        return args.min_rounds, False
+    return best, True
+
+
+def audit(cursor):
+    """{table: {"costs": {cost: n}, "unknown": n, "missing": n}}."""
+    result = {}
+    for table in HASH_TABLES:
+        cursor.execute(AUDIT_SQL.format(table=table))
+        summary = {"costs": {}, "unknown": 0, "missing": 0}
+        for cost, missing, count in cursor.fetchall():
+            if missing:
+                summary["missing"] += count
+            elif cost is None:
+                summary["unknown"] += count
+            else:
+                summary["costs"][cost] = count
+        result[table] = summary
+    return result
+
+
+def plan(audited, target, results):
+    """Per table: hashes already at the target, to re-hash on login (up or down) and unmigratable."""
+    tables = {}
+    for table, summary in audited.items():
+        costs = summary["costs"]
+        tables[table] = {
+            "at_target": costs.get(target, 0),
+            "raise": sum(n for cost, n in costs.items() if cost < target),
+            "lower": sum(n for cost, n in costs.items() if cost > target),
+            "not_bcrypt": summary["unknown"],
+            "no_password": summary["missing"],
+        }
+    extra_ms = results[target]["hash_ms"] if target in results else None
+    return {"target": target, "extra_login_ms": extra_ms, "tables": tables}
+
+
+def print_capacity(results, costs, args):
+    print("\n📊 Capacidad de login por proceso de Node (una verificación ocupa el event loop):")
+    for cost in costs:
+        verify_ms = results[cost]["verify_ms"]
+        line = f"  costo {cost:>2}: {verify_ms:>8.1f} ms por login, {1000 / verify_ms:>7.1f} logins/s por proceso"
+        if args.peak_logins:
+            processes = math.ceil(args.peak_logins * verify_ms / 1000)
+            line += f", {processes} procesos para {args.peak_logins:g} logins/s"
+        print(line)
+
+
+def print_audit(audited):
+    print("\n📊 Hashes guardados:")
+    for table, summary in audited.items():
+        total = sum(summary["costs"].values()) + summary["unknown"] + summary["missing"]
+        costs = ", ".join(f"costo {cost}: {n:,}" for cost, n in sorted(summary["costs"].items())) or "ninguno bcrypt"
+        print(f"  {table} ({total:,}): {costs}")
+        if summary["unknown"]:
+            print(f"    ⚠️  {summary['unknown']:,} no son hashes bcrypt")
+        if summary["missing"]:
+            print(f"    ℹ️  {summary['missing']:,} sin contraseña")
+
+
+def print_plan(rehash, current):
+    target = rehash["target"]
+    print(f"\n📋 Plan de re-hash (costo objetivo {target}):")
+    for table, counts in rehash["tables"].items():
+        print(f"  {table}: {counts['at_target']:,} ya en el objetivo, "
+              f"{counts['raise']:,} suben de costo en su próximo login")
+        if counts["lower"]:
+            print(f"    ℹ️  {counts['lower']:,} tienen un costo mayor y se conservan; para bajarlos en su próximo "
+                  f"login define también BCRYPT_REHASH_DOWN=true")
+        if counts["not_bcrypt"]:
+            print(f"    ⚠️  {counts['not_bcrypt']:,} no se pueden migrar al iniciar sesión (no son bcrypt); "
+                  f"requieren restablecer la contraseña")
+    if rehash["extra_login_ms"] is not None:
+        print(f"  ⏳ El primer login de cada cuenta migrada suma un hash (~{rehash['extra_login_ms']:.0f} ms)")
+    if target == current:
+        print(f"\nℹ️  BCRYPT_ROUNDS ya es {target}: los logins migran las cuentas restantes")
+    else:
+        print(f"\nℹ️  Para aplicarlo define BCRYPT_ROUNDS={target} en el entorno de la aplicación (ver env.example)")
+        print("   Los registros y cambios de contraseña usarán el nuevo costo y cada login exitoso sube las cuentas más baratas")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    load_env_files()
+    try:
+        current = int(os.environ.get("BCRYPT_ROUNDS") or APP_DEFAULT_ROUNDS)
+    except ValueError:
+        print(f"❌ Error: BCRYPT_ROUNDS debe ser un número entero (valor: {os.environ['BCRYPT_ROUNDS']!r})")
+        sys.exit(1)
+    if not 4 <= current <= 31:
+        # lib/password.ts clamps it the same way
+        clamped = min(31, max(4, current))
+        print(f"⚠️  BCRYPT_ROUNDS={current} está fuera de 4-31; la aplicación usa {clamped}\n")
+        current = clamped
+
+    engine = args.engine
+    if engine in ("auto", "node") and node_available():
+        engine, measure = "node", measure_node
+    elif engine == "node":
+        print("❌ Error: node no puede cargar bcryptjs")
+        print("   Instala las dependencias con: npm install")
+        sys.exit(1)
+    else:
+        try:
+            import bcrypt  # noqa: F401
+        except ImportError:
+            print("❌ Error: bcrypt no está instalado")
+            print("   Instala con: pip install bcrypt")
+            sys.exit(1)
+        if engine == "auto":
+            print("⚠️  bcryptjs no está disponible (npm install); se mide bcrypt nativo de Python, más rápido que")
+            print("   el de las rutas: los tiempos reales de login serán mayores\n")
+        engine, measure = "python", measure_python
+
+    print(f"🔄 Midiendo bcrypt ({engine}) en este equipo, presupuesto {args.budget_ms:g} ms por verificación\n")
+    try:
+        results = benchmark(measure, args)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Error: la medición con node falló: {e.stderr.strip()}")
+        sys.exit(1)
+
+    target, met = recommend(results, args)
+    extrapolated = "" if results[target]["measured"] else " (extrapolado)"
+    if met:
+        print(f"\n✅ Costo recomendado: {target}{extrapolated} "
+              f"({results[target]['verify_ms']:.0f} ms por verificación, costo actual {current})")
+    else:
+        print(f"\n⚠️  Ningún costo desde {args.min_rounds} cumple {args.budget_ms:g} ms en este equipo; "
+              f"se recomienda el mínimo, {target} ({results[target]['verify_ms']:.0f} ms)")
+    if target < current:
+        print(f"⚠️  El costo recomendado es menor que el actual ({current}): baja la latencia a costa de seguridad")
+    print_capacity(results, sorted({current, target} & set(results)), args)
+
+    report = {
+        "engine": engine,
+        "budget_ms": args.budget_ms,
+        "current": current,
+        "recommended": target,
+        "budget_met": met,
+        "benchmark": results,
+    }
+    if not args.no_audit:
+        try:
+            with connection() as conn:
+                with conn.cursor() as cursor:
+                    audited = audit(cursor)
+                conn.rollback()
+        except (psycopg2.Error, DatabaseConfigError) as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+        print_audit(audited)
+        rehash = plan(audited, args.target or target, results)
+        print_plan(rehash, current)
+        report.update(audit=audited, plan=rehash)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\n💾 Informe guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""Check the class schedules for double bookings, over-capacity and utilisation.
+
+Two schedules are checked:
+
+* ``coach_class_sessions`` between ``--from`` and ``--until`` (by default
+  the next 52 weeks): a coach with two sessions at once, a room (gym and
+  ``location``) booked twice, sessions with more active attendees than
+  ``capacity``, and the utilisation of every gym per weekday and hour
+  (sessions, booked places, capacity and the share of it booked).
+* the weekly ``classes`` grid: an instructor teaching two classes at once,
+  classes with more ``enrolled`` than ``capacity``, and utilisation per
+  weekday and hour.
+
+Sessions are loaded once and every check is done in NumPy: double
+bookings with the sorted interval sweep of ``db/schedule.py``
+(``overlap_clusters``), utilisation with ``bincount`` over
+(gym, weekday, hour). A year of sessions for every gym takes seconds,
+most of it reading the rows.
+
+Usage:
+    python scripts/check-schedule.py
+    python scripts/check-schedule.py --gym 3 --limit 50
+    python scripts/check-schedule.py --from 2025-01-01 --until 2026-01-01 --output horarios.json
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connection
+from db import schedule
+
+if not schedule.available():
+    print("❌ Error: numpy no está instalado")
+    print("   Instala con: pip install numpy")
+    sys.exit(1)
+
+import numpy as np  # noqa: E402
+
+WEEKDAYS = ("lun", "mar", "mié", "jue", "vie", "sáb", "dom")
+WEEK_MINUTES = 7 * 24 * 60
+
+# Slots per gym in the utilisation grid: weekday x hour
+SLOTS = 7 * 24
+
+# Session or class ids printed per conflict; the JSON report has them all
+MAX_IDS = 8
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Detecta choques de horario, sobrecupo y ocupación por franja")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="Inicio del periodo de sesiones (por defecto hoy)")
+    parser.add_argument("--until", dest="end", type=datetime.fromisoformat,
+                        help="Fin del periodo (por defecto 52 semanas después de --from)")
+    parser.add_argument("--gym", type=int, help="Solo las sesiones de los coaches de este gimnasio")
+    parser.add_argument("--limit", type=int, default=20, help="Problemas y franjas listados por sección (por defecto 20)")
+    parser.add_argument("--output", type=Path, help="Guardar el informe completo en JSON")
+    args = parser.parse_args(argv)
+    if args.limit < 1:
+        parser.error("--limit debe ser al menos 1")
+    return args
+
+
+def load_sessions(cursor, start, end, gym_id):
+    """Sessions starting in [start, end) as parallel NumPy arrays, plus the room names."""
+    where = "AND c.gym_id = %(gym)s" if gym_id is not None else ""
+    cursor.execute(f"""
+        SELECT s.id, s.coach_id, COALESCE(c.gym_id, 0), NULLIF(lower(btrim(s.location)), ''),
+            EXTRACT(epoch FROM s.start_date)::bigint, EXTRACT(epoch FROM s.end_date)::bigint,
+            COALESCE(s.capacity, 0), COALESCE(a.booked, 0)
+        FROM coach_class_sessions s
+        JOIN coach_profiles c ON c.id = s.coach_id
+        LEFT JOIN (
+            SELECT session_id, COUNT(*) AS booked
+            FROM coach_class_attendees
+            WHERE status <> 'CANCELLED'
+            GROUP BY session_id
+        ) a ON a.session_id = s.id
+        WHERE s.start_date >= %(start)s AND s.start_date < %(end)s {where};
+    """, {"start": start, "end": end, "gym": gym_id})
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    ids, coaches, gyms, locations, starts, ends, capacity, booked = zip(*rows)
+
+    # One integer per (gym, location) so rooms go through the same sweep as coaches
+    located = np.array([loc is not None for loc in locations], dtype=bool)
+    rooms = {}
+    room = [rooms.setdefault((gym, loc), len(rooms)) for gym, loc in zip(gyms, locations) if loc is not None]
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "coach": np.array(coaches, dtype=np.int64),
+        "gym": np.array(gyms, dtype=np.int64),
+        "start": np.array(starts, dtype=np.int64),
+        "end": np.array(ends, dtype=np.int64),
+        "capacity": np.array(capacity, dtype=np.int64),
+        "booked": np.array(booked, dtype=np.int64),
+        "located": located,
+        "room": np.array(room, dtype=np.int64),
+        "room_names": list(rooms),
+    }
+
+
+def load_classes(cursor):
+    cursor.execute("""
+        -- enrolled is nullable in tables created by the older SQL scripts
+        SELECT id, name, instructor_id, instructor_name, day_of_week, time, duration, capacity,
+               COALESCE(enrolled, 0)
+        FROM classes
+        ORDER BY id;
+    """)
+    return cursor.fetchall()
+
+
+def conflicts(keys, starts, ends, ids):
+    """Double bookings as (key, first start, last end, ids), longest first."""
+    positions, clusters = schedule.overlap_clusters(keys, starts, ends)
+    if not len(positions):
+        return []
+    bounds = np.flatnonzero(np.diff(clusters)) + 1
+    found = []
+    for group in np.split(positions, bounds):
+        found.append((int(keys[group[0]]), int(starts[group].min()), int(ends[group].max()), ids[group].tolist()))
+    found.sort(key=lambda c: (-len(c[3]), c[1]))
+    return found
+
+
+def slot_of(seconds):
+    """Weekday x hour (0-167, Monday 00h first) of wall-clock epoch seconds."""
+    days = seconds // 86400
+    weekday = (days + schedule.EPOCH_WEEKDAY) % 7
+    return weekday * 24 + (seconds % 86400) // 3600
+
+
+def utilisation(groups, slots, capacity, booked):
+    """Per (group, slot): sessions, capacity and booked places, as (n_groups, SLOTS) arrays."""
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+    cells = groups * SLOTS + slots
+    shape = (n_groups, SLOTS)
+    size = n_groups * SLOTS
+    return (
+        np.bincount(cells, minlength=size).reshape(shape),
+        np.bincount(cells, weights=capacity, minlength=size).reshape(shape),
+        np.bincount(cells, weights=booked, minlength=size).reshape(shape),
+    )
+
+
+def id_list(ids):
+    shown = ", ".join(map(str, ids[:MAX_IDS]))
+    return f"{shown}, ..." if len(ids) > MAX_IDS else shown
+
+
+def gym_label(gym_names, gym_id):
+    return f"{gym_names[gym_id]} ({gym_id})" if gym_id in gym_names else "Sin gimnasio"
+
+
+def slot_name(slot):
+    return f"{WEEKDAYS[slot // 24]} {slot % 24:02d}h"
+
+
+def stamp(seconds):
+    return str(np.datetime64(seconds, "s").astype("datetime64[m]")).replace("T", " ")
+
+
+def check_sessions(cursor, args, start, end):
+    sessions = load_sessions(cursor, start, end, args.gym)
+    if sessions is None:
+        return None
+    ids, starts, ends = sessions["id"], sessions["start"], sessions["end"]
+
+    coach_conflicts = conflicts(sessions["coach"], starts, ends, ids)
+    located = sessions["located"]
+    room_conflicts = [
+        (sessions["room_names"][room], first, last, group)
+        for room, first, last, group in conflicts(sessions["room"], starts[located], ends[located], ids[located])
+    ]
+
+    over = np.flatnonzero((sessions["capacity"] > 0) & (sessions["booked"] > sessions["capacity"]))
+    over = over[np.argsort(sessions["capacity"][over] - sessions["booked"][over], kind="stable")]
+
+    gym_ids, gym_group = np.unique(sessions["gym"], return_inverse=True)
+    # Capacity and bookings only count for sessions that have a capacity
+    limited = sessions["capacity"] > 0
+    count, capacity, booked = utilisation(gym_group, slot_of(starts), sessions["capacity"],
+                                          np.where(limited, sessions["booked"], 0))
+    return {
+        "sessions": len(ids),
+        "coach_conflicts": coach_conflicts,
+        "room_conflicts": room_conflicts,
+        "located": int(located.sum()),
+        "over_capacity": [
+            (int(ids[i]), int(sessions["coach"][i]), int(starts[i]), int(sessions["booked"][i]), int(sessions["capacity"][i]))
+            for i in over
+        ],
+        "gyms": gym_ids.tolist(),
+        "count": count,
+        "capacity": capacity,
+        "booked": booked,
+    }
+
+
+def check_classes(classes):
+    """Weekly grid of ``classes`` in minutes of the week, one interval per weekday."""
+    rows, starts, invalid = [], [], []
+    for index, (class_id, name, _, _, day_text, time_text, duration, _, _) in enumerate(classes):
+        days = schedule.parse_days(day_text)
+        minute = schedule.parse_time(time_text)
+        if days is None or minute is None or not duration or duration <= 0:
+            invalid.append((class_id, name, day_text, time_text))
+            continue
+        rows.extend([index] * len(days))
+        starts.extend(day * 24 * 60 + minute for day in days)
+    rows = np.array(rows, dtype=np.int64)
+    starts = np.array(starts, dtype=np.int64)
+    durations = np.array([classes[row][6] for row in rows.tolist()], dtype=np.int64)
+    ends = starts + durations
+
+    # A Sunday-night class running past midnight also occupies Monday morning
+    weekly = len(rows)
+    wraps = ends > WEEK_MINUTES
+    rows = np.concatenate([rows, rows[wraps]])
+    starts = np.concatenate([starts, np.zeros(wraps.sum(), dtype=np.int64)])
+    ends = np.concatenate([ends, ends[wraps] - WEEK_MINUTES])
+
+    # Instructor by id, else by name; classes without either get a key of their own
+    instructors = {}
+    keys = []
+    for row in rows.tolist():
+        _, _, instructor_id, instructor_name, *_ = classes[row]
+        name = (instructor_name or "").strip()
+        if instructor_id is None and not name:
+            keys.append(-1 - row)
+            continue
+        label = name or f"instructor {instructor_id}"
+        keys.append(instructors.setdefault((instructor_id, name.lower() if instructor_id is None else None),
+                                           (len(instructors), label))[0])
+    labels = {key: label for key, label in instructors.values()}
+    found = [
+        (labels[key], first, last, sorted(set(group)))
+        for key, first, last, group in conflicts(np.array(keys, dtype=np.int64), starts, ends, rows)
+    ]
+
+    # Utilisation counts each class once per weekday it runs, by its start
+    once = slice(0, weekly)
+    capacity = np.array([classes[row][7] for row in rows[once].tolist()], dtype=np.int64)
+    enrolled = np.array([classes[row][8] for row in rows[once].tolist()], dtype=np.int64)
+    count, capacity_grid, enrolled_grid = utilisation(np.zeros(weekly, dtype=np.int64), starts[once] // 60,
+                                                      capacity, enrolled)
+    over = [(c[0], c[1], c[8], c[7]) for c in classes if c[7] and c[8] > c[7]]
+    return {
+        "classes": len(classes),
+        "conflicts": [(name, first, last, [classes[row][0] for row in group]) for name, first, last, group in found],
+        "over_capacity": sorted(over, key=lambda c: c[3] - c[2]),
+        "invalid": invalid,
+        "count": count,
+        "capacity": capacity_grid,
+        "booked": enrolled_grid,
+    }
+
+
+def busiest(count, capacity, booked, limit):
+    """Slots with capacity, by share booked: [(group, slot, sessions, booked, capacity, share)]."""
+    group, slot = np.nonzero(capacity)
+    share = booked[group, slot] / capacity[group, slot]
+    order = np.lexsort((-booked[group, slot], -share))[:limit]
+    return [
+        (int(group[i]), int(slot[i]), int(count[group[i], slot[i]]), int(booked[group[i], slot[i]]),
+         int(capacity[group[i], slot[i]]), float(share[i]))
+        for i in order
+    ]
+
+
+def week_minute(minute):
+    return f"{WEEKDAYS[minute // 1440]} {minute % 1440 // 60:02d}:{minute % 60:02d}"
+
+
+def print_sessions(result, gym_names, limit):
+    located = result["located"]
+    print(f"📊 Sesiones de coach: {result['sessions']:,} ({located:,} con sala)\n")
+
+    print(f"  Coaches con dos sesiones a la vez: {len(result['coach_conflicts']):,}")
+    for coach, first, last, ids in result["coach_conflicts"][:limit]:
+        print(f"    ⚠️  Coach {coach}: {len(ids)} sesiones entre {stamp(first)} y {stamp(last)[11:]} (ids {id_list(ids)})")
+    if located:
+        print(f"\n  Salas reservadas dos veces: {len(result['room_conflicts']):,}")
+        for (gym, room), first, last, ids in result["room_conflicts"][:limit]:
+            print(f"    ⚠️  {gym_label(gym_names, gym)} · {room}: {len(ids)} sesiones "
+                  f"entre {stamp(first)} y {stamp(last)[11:]} (ids {id_list(ids)})")
+
+    print(f"\n  Sesiones con más asistentes que cupo: {len(result['over_capacity']):,}")
+    for session_id, coach, start, booked, capacity in result["over_capacity"][:limit]:
+        print(f"    ⚠️  Sesión {session_id} (coach {coach}, {stamp(start)}): {booked}/{capacity}")
+
+    print("\n  Ocupación por gimnasio:")
+    for index, gym in enumerate(result["gyms"]):
+        sessions = int(result["count"][index].sum())
+        capacity = result["capacity"][index].sum()
+        share = f"{result['booked'][index].sum() / capacity:.1%}" if capacity else "sin cupo"
+        peak = int(result["count"][index].argmax())
+        print(f"    {gym_label(gym_names, gym):<36} {sessions:>8,} sesiones  ocupación {share:>8}  "
+              f"franja con más sesiones {slot_name(peak)} ({int(result['count'][index][peak]):,})")
+
+    slots = busiest(result["count"], result["capacity"], result["booked"], limit)
+    if slots:
+        print("\n  Franjas más ocupadas:")
+        for group, slot, sessions, booked, capacity, share in slots:
+            gym = result["gyms"][group]
+            print(f"    {share:>7.1%}  {gym_label(gym_names, gym):<36} {slot_name(slot)}  "
+                  f"{booked:,}/{capacity:,} plazas en {sessions:,} sesiones")
+
+
+def print_classes(result, limit):
+    print(f"\n📊 Clases semanales: {result['classes']}\n")
+    for class_id, name, day_text, time_text in result["invalid"][:limit]:
+        print(f"  ⚠️  Clase {class_id} ({name}): día '{day_text}' u hora '{time_text}' no reconocidos; se omite")
+
+    print(f"  Instructores con dos clases a la vez: {len(result['conflicts'])}")
+    for instructor, first, last, ids in result["conflicts"][:limit]:
+        print(f"    ⚠️  {instructor}: clases {id_list(ids)} "
+              f"entre {week_minute(first)} y {week_minute(last % WEEK_MINUTES)}")
+
+    print(f"\n  Clases con más inscritos que cupo: {len(result['over_capacity'])}")
+    for class_id, name, enrolled, capacity in result["over_capacity"][:limit]:
+        print(f"    ⚠️  Clase {class_id} ({name}): {enrolled}/{capacity}")
+
+    slots = busiest(result["count"], result["capacity"], result["booked"], limit)
+    if slots:
+        print("\n  Franjas más ocupadas:")
+        for _, slot, classes, enrolled, capacity, share in slots:
+            print(f"    {share:>7.1%}  {slot_name(slot)}  {enrolled:,}/{capacity:,} plazas en {classes} clases")
+
+
+def as_json(sessions, classes):
+    def grid(result, gyms=None):
+        return [
+            {**({"gym_id": gyms[i] or None} if gyms else {}), "slot": slot_name(slot),
+             "sessions": int(result["count"][i, slot]), "booked": int(result["booked"][i, slot]),
+             "capacity": int(result["capacity"][i, slot])}
+            for i in range(len(result["count"]))
+            for slot in np.flatnonzero(result["count"][i]).tolist()
+        ]
+
+    report = {"classes": {
+        "conflicts": [{"instructor": i, "start": week_minute(f), "end": week_minute(l % WEEK_MINUTES), "class_ids": ids}
+                      for i, f, l, ids in classes["conflicts"]],
+        "over_capacity": [{"class_id": c, "name": n, "enrolled": e, "capacity": cap}
+                          for c, n, e, cap in classes["over_capacity"]],
+        "utilisation": grid(classes),
+    }}
+    if sessions is not None:
+        report["sessions"] = {
+            "coach_conflicts": [{"coach_id": c, "start": stamp(f), "end": stamp(l), "session_ids": ids}
+                                for c, f, l, ids in sessions["coach_conflicts"]],
+            "room_conflicts": [{"gym_id": int(g), "location": r, "start": stamp(f), "end": stamp(l), "session_ids": ids}
+                               for (g, r), f, l, ids in sessions["room_conflicts"]],
+            "over_capacity": [{"session_id": s, "coach_id": c, "start": stamp(t), "booked": b, "capacity": cap}
+                              for s, c, t, b, cap in sessions["over_capacity"]],
+            "utilisation": grid(sessions, sessions["gyms"]),
+        }
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = args.start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = args.end or start + timedelta(weeks=52)
+    if end <= start:
+        print("❌ Error: --until debe ser posterior a --from")
+        sys.exit(1)
+    print(f"🔄 Revisando horarios del {start:%Y-%m-%d} al {end:%Y-%m-%d}\n")
+
+    try:
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                started = time.perf_counter()
+                cursor.execute("SELECT id, name FROM gyms;")
+                gym_names = dict(cursor.fetchall())
+                sessions = check_sessions(cursor, args, start, end)
+                classes = check_classes(load_classes(cursor))
+                elapsed = time.perf_counter() - started
+            conn.rollback()
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    if sessions is None:
+        print("ℹ️  No hay sesiones de coach en el periodo")
+    else:
+        print_sessions(sessions, gym_names, args.limit)
+    print_classes(classes, args.limit)
+
+    if args.output:
+        args.output.write_text(json.dumps(as_json(sessions, classes), ensure_ascii=False, indent=2),
+                               encoding="utf-8")
+        print(f"\n💾 Informe guardado en {args.output}")
+    print(f"\n✅ Revisión completada en {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
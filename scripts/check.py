@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Health check for the database schema.
+
+Introspects every table (columns, indexes, constraints and row estimates)
+with a single pg_catalog query. Exact COUNT(*) only runs with --exact,
+since it scans each table in full; with asyncpg installed the counts run
+in parallel (up to --concurrency connections) and each one is timed.
+
+Usage:
+    python scripts/check.py                  # resumen de todas las tablas
+    python scripts/check.py classes gyms     # detalle de tablas concretas
+    python scripts/check.py --exact -v       # conteo exacto y detalle completo
+"""
+import argparse
+import sys
+
+import psycopg2
+
+from db import DatabaseConfigError, aio, connection
+from db.catalog import exact_counts, format_bytes, introspect
+from db.prisma import quote
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Revisa las tablas de la base de datos")
+    parser.add_argument("tables", nargs="*", help="Tablas a revisar (por defecto: todas)")
+    parser.add_argument("--exact", action="store_true", help="Contar filas con COUNT(*) en lugar de estimar")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar columnas, índices y restricciones")
+    parser.add_argument("--schema", default="public", help="Esquema a revisar (por defecto: public)")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Conteos simultáneos con --exact (por defecto DB_POOL_MAX)",
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency debe ser al menos 1")
+    return args
+
+
+def count_task(schema, table):
+    async def work(conn):
+        return await conn.fetchval(f"SELECT COUNT(*) FROM {quote(schema)}.{quote(table)};")
+    return work
+
+
+def parallel_counts(tables, args):
+    """COUNT(*) each table on its own connection; return ({table: count}, {table: TaskResult}, wall)."""
+    results, wall = aio.run_concurrently(
+        {name: count_task(args.schema, name) for name in tables},
+        concurrency=args.concurrency,
+    )
+    for result in results:
+        if not result.ok:
+            raise result.error
+    return {r.name: r.result for r in results}, {r.name: r for r in results}, wall
+
+
+def print_table(table, count, exact, verbose, timing=None):
+    label = "registros" if exact else "registros (estimado)"
+    took = f" ({aio.format_timing(timing)})" if timing else ""
+    print(f"  - {table.name}: {count} {label}, {format_bytes(table.total_bytes)}{took}")
+    if not verbose:
+        return
+
+    print("\n    📋 Estructura de la tabla:")
+    for column in table.columns:
+        nullable = "" if column.not_null else " (opcional)"
+        print(f"      - {column.name}: {column.type}{nullable}")
+
+    if table.indexes:
+        print("\n    🔑 Índices:")
+        for index in table.indexes:
+            flags = []
+            if index.primary:
+                flags.append("PK")
+            elif index.unique:
+                flags.append("único")
+            if index.partial:
+                flags.append("parcial")
+            if not index.valid:
+                flags.append("INVÁLIDO")
+            suffix = f" [{', '.join(flags)}]" if flags else ""
+            print(f"      - {index.name} ({', '.join(index.columns)}){suffix}, {format_bytes(index.size)}")
+
+    if table.constraints:
+        print("\n    🔗 Restricciones:")
+        for constraint in table.constraints:
+            print(f"      - {constraint.name}: {constraint.definition}")
+    print()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    requested = args.tables
+
+    timings = {}
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            tables = introspect(cursor, requested, schema=args.schema)
+
+            print("✅ Conexión exitosa a la base de datos\n")
+
+            missing = [name for name in requested if name not in tables]
+            for name in missing:
+                print(f"❌ La tabla '{name}' NO existe")
+            if missing:
+                print()
+
+            if args.exact and not aio.available():
+                print("ℹ️  asyncpg no está instalado; conteo secuencial (pip install asyncpg para contar en paralelo)\n")
+                counts = exact_counts(cursor, tables, schema=args.schema)
+            elif not args.exact:
+                counts = {name: table.estimated_rows for name, table in tables.items()}
+            cursor.close()
+
+        # Outside the block: the parallel counts use their own connections
+        if args.exact and aio.available():
+            counts, timings, wall = parallel_counts(tables, args)
+
+        print(f"📊 Tablas encontradas ({len(tables)}):\n")
+        verbose = args.verbose or bool(requested)
+        for name, table in tables.items():
+            print_table(table, counts[name], args.exact, verbose, timings.get(name))
+        if timings:
+            print(f"\n⏱️  Conteo exacto: {aio.summarize(list(timings.values()), wall)}")
+
+    except (psycopg2.Error, DatabaseConfigError, *aio.ERRORS) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Shared database access for the Python maintenance scripts.
+
+Scripts under ``scripts/`` run as ``python scripts/<name>.py``, which puts
+this directory on ``sys.path`` so they can ``from db import connection``.
+"""
+
+from .config import DatabaseConfigError, Settings, get_database_url, load_settings
+from .pool import (
+    TRANSIENT_ERRORS,
+    close_pool,
+    connect,
+    connection,
+    get_pool,
+    is_transient,
+    run_with_retry,
+    statement_timeout,
+)
+
+__all__ = [
+    "DatabaseConfigError",
+    "Settings",
+    "TRANSIENT_ERRORS",
+    "close_pool",
+    "connect",
+    "connection",
+    "get_database_url",
+    "get_pool",
+    "is_transient",
+    "load_settings",
+    "run_with_retry",
+    "statement_timeout",
+]
@@ -0,0 +1,265 @@
+"""Index advice from the routes' query shapes and the server's own counters.
+
+Candidates come from two places: the filters and orderings of the route
+queries in ``queries.py`` (written down here, next to the query names they
+serve) and every foreign key whose columns do not lead any index. Each is
+checked against the live indexes, sized from ``pg_stats`` and backed by
+evidence from ``pg_stat_user_tables`` and, when the extension is loaded,
+``pg_stat_statements``.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+import psycopg2.errors
+
+from .catalog import introspect
+from .prisma import quote, quote_list
+
+FOREIGN_KEY_RE = re.compile(r"FOREIGN KEY \((.+?)\) REFERENCES")
+
+# B-tree leaf: 8-byte tuple header + 4-byte line pointer, pages 90% full
+INDEX_TUPLE_OVERHEAD = 12
+LEAF_FILL = 0.9
+# Used when a column has no pg_stats row yet (table never analyzed)
+FALLBACK_WIDTHS = {"integer": 4, "bigint": 8, "date": 4, "boolean": 1, "double precision": 8}
+DEFAULT_WIDTH = 16
+
+
+@dataclass(frozen=True)
+class IndexCandidate:
+    table: str
+    columns: tuple
+    reason: str
+    where: str = None
+    queries: tuple = ()
+    # Non-key columns stored in the leaf pages (INCLUDE), for index-only scans
+    include: tuple = ()
+
+    @property
+    def name(self):
+        suffix = "_part_idx" if self.where else "_covering_idx" if self.include else "_idx"
+        return f"{self.table}_{'_'.join(self.columns)}{suffix}"
+
+    def definition(self, concurrently=True):
+        include = f" INCLUDE ({quote_list(self.include)})" if self.include else ""
+        where = f" WHERE {self.where}" if self.where else ""
+        mode = "CONCURRENTLY IF NOT EXISTS " if concurrently else ""
+        return (f"CREATE INDEX {mode}{quote(self.name)} ON {quote(self.table)}"
+                f"({quote_list(self.columns)}){include}{where};")
+
+    def prisma_hint(self):
+        """The @@index line that keeps schema.prisma in sync, if Prisma can express it."""
+        if self.where or self.include:
+            return None
+        return f"@@index([{', '.join(_camel(c) for c in self.columns)}])"
+
+
+ROUTE_CANDIDATES = (
+    IndexCandidate(
+        "members", ("gym_id", "membership_end"),
+        "miembros activos por gimnasio (status = 'active' AND membership_end >= ahora)",
+        where="status = 'active'",
+        queries=("stats.active_members",),
+    ),
+    IndexCandidate(
+        "members", ("gym_id", "created_at"),
+        "altas e ingresos de hoy por gimnasio (rango de created_at)",
+        queries=("stats.members_today", "stats.total_members"),
+    ),
+    IndexCandidate(
+        "check_ins", ("member_id", "checkin_time"),
+        "check-ins de los miembros de un gimnasio desde una fecha",
+        queries=("stats.today_checkins",),
+    ),
+    IndexCandidate(
+        "gym_membership_plans", ("gym_id", "order"),
+        "planes de un gimnasio ordenados por \"order\"",
+        queries=("stats.membership_plans", "public.membership_plans"),
+    ),
+    IndexCandidate(
+        "gym_facilities", ("gym_id", "order"),
+        "instalaciones de un gimnasio ordenadas por \"order\"",
+        queries=("public.facilities",),
+    ),
+    IndexCandidate(
+        "gym_amenities", ("gym_id", "order"),
+        "amenidades de un gimnasio ordenadas por \"order\"",
+        queries=("public.amenities",),
+    ),
+    IndexCandidate(
+        "classes", ("gym_id",),
+        "clases de un gimnasio",
+        queries=("public.classes",),
+    ),
+)
+
+
+@dataclass
+class Advice:
+    candidate: IndexCandidate
+    rows: int
+    estimated_bytes: int = 0
+    covered_by: str = None
+    missing_columns: list = field(default_factory=list)
+    seq_scan: int = 0
+    seq_tup_read: int = 0
+    idx_scan: int = 0
+    statements: list = field(default_factory=list)
+
+    @property
+    def actionable(self):
+        return not self.covered_by and not self.missing_columns
+
+
+def _camel(column):
+    head, *rest = column.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+def _unquote(identifier):
+    identifier = identifier.strip()
+    if identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def foreign_key_candidates(tables):
+    """A candidate for every foreign key that no index starts with."""
+    candidates = []
+    for table in tables.values():
+        for constraint in table.constraints:
+            if constraint.type != "f":
+                continue
+            match = FOREIGN_KEY_RE.search(constraint.definition)
+            if match:
+                columns = tuple(_unquote(c) for c in match.group(1).split(","))
+                candidates.append(IndexCandidate(
+                    table.name, columns,
+                    f"clave foránea {constraint.name} (joins y ON DELETE en la tabla referenciada)",
+                ))
+    return candidates
+
+
+def _normalize_predicate(text):
+    # pg_get_indexdef() adds casts and parentheses: WHERE (status = 'active'::text)
+    return re.sub(r"::[\w ]+|[()\s]", "", text or "")
+
+
+def covering_index(candidate, table):
+    """Name of a valid index whose leading columns already serve the candidate."""
+    wanted = list(candidate.columns)
+    for index in table.indexes:
+        if not index.valid:
+            continue
+        columns = [_unquote(c) for c in index.columns]
+        if columns[:len(wanted)] != wanted:
+            continue
+        if index.partial:
+            predicate = index.definition.split(" WHERE ", 1)[-1]
+            if not candidate.where or _normalize_predicate(predicate) != _normalize_predicate(candidate.where):
+                continue
+        return index.name
+    return None
+
+
+def _column_widths(cursor, table):
+    cursor.execute(
+        "SELECT attname, avg_width FROM pg_stats WHERE schemaname = 'public' AND tablename = %s;",
+        (table,),
+    )
+    return dict(cursor.fetchall())
+
+
+def _selectivity(cursor, candidate, rows):
+    """Fraction of rows a partial index keeps, from the planner's estimate."""
+    if not candidate.where or not rows:
+        return 1.0
+    cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {quote(candidate.table)} WHERE {candidate.where};")
+    estimated = cursor.fetchone()[0][0]["Plan"]["Plan Rows"]
+    return min(1.0, estimated / rows)
+
+
+def estimate_size(cursor, candidate, table):
+    """Rough B-tree size: entries x (header + aligned key width) / leaf fill."""
+    widths = _column_widths(cursor, candidate.table)
+    key = 0
+    for name in candidate.columns + candidate.include:
+        column = table.column(name)
+        fallback = FALLBACK_WIDTHS.get(column.type if column else "", DEFAULT_WIDTH)
+        key += widths.get(name) or fallback
+    key = (key + 7) // 8 * 8
+    entries = table.estimated_rows * _selectivity(cursor, candidate, table.estimated_rows)
+    return int(entries * (INDEX_TUPLE_OVERHEAD + key) / LEAF_FILL) + 8192
+
+
+def table_activity(cursor):
+    cursor.execute("SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0) FROM pg_stat_user_tables;")
+    return {name: (seq, tup, idx) for name, seq, tup, idx in cursor.fetchall()}
+
+
+def statement_stats(cursor, limit=500):
+    """Top statements by total time, or None when pg_stat_statements is not available."""
+    cursor.execute("SAVEPOINT advisor_statements;")
+    try:
+        cursor.execute("""
+            SELECT query, calls, total_exec_time, mean_exec_time
+            FROM pg_stat_statements
+            ORDER BY total_exec_time DESC
+            LIMIT %s;
+        """, (limit,))
+        rows = cursor.fetchall()
+        cursor.execute("RELEASE SAVEPOINT advisor_statements;")
+        return rows
+    except (
+        psycopg2.errors.UndefinedTable,
+        psycopg2.errors.UndefinedColumn,
+        psycopg2.errors.ObjectNotInPrerequisiteState,
+    ):
+        cursor.execute("ROLLBACK TO SAVEPOINT advisor_statements;")
+        return None
+
+
+def _matching_statements(candidate, statements):
+    table_re = re.compile(rf'\b"?{re.escape(candidate.table)}"?\b')
+    found = []
+    for query, calls, total, mean in statements or ():
+        if table_re.search(query) and all(c in query for c in candidate.columns):
+            found.append({"query": " ".join(query.split())[:160], "calls": calls,
+                          "total_ms": total, "mean_ms": mean})
+    return found[:3]
+
+
+def advise(cursor, min_rows=0):
+    """Return (advice list, statements available?) for every candidate."""
+    tables = introspect(cursor)
+    activity = table_activity(cursor)
+    statements = statement_stats(cursor)
+
+    candidates = list(ROUTE_CANDIDATES)
+    for candidate in foreign_key_candidates(tables):
+        # A full route index that starts with the key already serves it
+        served = any(
+            c.table == candidate.table and not c.where and c.columns[:len(candidate.columns)] == candidate.columns
+            for c in candidates
+        )
+        if not served:
+            candidates.append(candidate)
+
+    advice = []
+    for candidate in candidates:
+        table = tables.get(candidate.table)
+        if table is None:
+            continue
+        item = Advice(candidate, table.estimated_rows)
+        item.missing_columns = [c for c in candidate.columns if table.column(c) is None]
+        if not item.missing_columns:
+            item.covered_by = covering_index(candidate, table)
+        if item.actionable:
+            if table.estimated_rows < min_rows:
+                continue
+            item.estimated_bytes = estimate_size(cursor, candidate, table)
+            item.seq_scan, item.seq_tup_read, item.idx_scan = activity.get(candidate.table, (0, 0, 0))
+            item.statements = _matching_statements(candidate, statements)
+        advice.append(item)
+    return advice, statements is not None
@@ -0,0 +1,163 @@
+"""Concurrent tasks over asyncpg with a global connection cap and per-task timings.
+
+The psycopg2 pool serves the sequential scripts; this module is for the
+operations that are independent of each other (one per table, one per
+gym) and spend their time waiting on round trips. Each task is an async
+function that receives a connection; at most ``DB_POOL_MAX`` connections
+are open at once, the rest of the tasks wait for one. The cap is the one
+``pool.py`` enforces: an asyncpg pool is sized from the slots the psycopg2
+pool is not using and holds them until it closes.
+
+Sessions get the same policy as ``pool.py``: statement_timeout,
+application_name, connect timeout and retries of transient errors.
+asyncpg is optional; scripts check ``available()`` and keep their
+sequential path when it is missing.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .config import load_settings
+from .pool import backoff_delay, release_slots, reserve_slots
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+# libpq / Prisma options asyncpg would send as server settings and fail on
+# (Neon URLs carry channel_binding=require)
+UNSUPPORTED_PARAMS = {"channel_binding", "connect_timeout", "connection_limit", "pgbouncer", "pool_timeout", "schema"}
+
+
+# What a task can raise from the server or the connection; empty without asyncpg
+ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError) if asyncpg else ()
+
+
+def available():
+    return asyncpg is not None
+
+
+def transient_errors():
+    """Errors worth retrying, as in ``pool.TRANSIENT_ERRORS``."""
+    return (
+        OSError,
+        asyncio.TimeoutError,
+        asyncpg.ConnectionDoesNotExistError,
+        asyncpg.CannotConnectNowError,
+        asyncpg.SerializationError,
+        asyncpg.DeadlockDetectedError,
+    )
+
+
+def asyncpg_dsn(url):
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key not in UNSUPPORTED_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+@dataclass
+class TaskResult:
+    name: str
+    result: object = None
+    error: BaseException = None
+    waited: float = 0.0
+    elapsed: float = 0.0
+    attempts: int = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@asynccontextmanager
+async def open_pool(concurrency=None, settings=None):
+    """asyncpg pool of up to ``min(concurrency, DB_POOL_MAX)`` connections within the shared cap."""
+    settings = settings or load_settings()
+    wanted = min(concurrency or settings.pool_max, settings.pool_max)
+    # Waiting for a slot blocks: keep it off the event loop
+    size = await asyncio.to_thread(reserve_slots, wanted)
+    try:
+        pool = await asyncpg.create_pool(
+            asyncpg_dsn(settings.database_url),
+            min_size=0,
+            max_size=size,
+            timeout=settings.connect_timeout,
+            server_settings={
+                "application_name": settings.application_name,
+                "statement_timeout": str(settings.statement_timeout_ms),
+            },
+        )
+        try:
+            yield pool
+        finally:
+            await pool.close()
+    finally:
+        release_slots(size)
+
+
+async def _run_task(pool, name, work, settings):
+    task = TaskResult(name)
+    for attempt in range(1, settings.retry_attempts + 1):
+        task.attempts = attempt
+        queued = time.perf_counter()
+        try:
+            async with pool.acquire() as conn:
+                began = time.perf_counter()
+                task.waited += began - queued
+                try:
+                    task.result = await work(conn)
+                    task.error = None
+                    return task
+                finally:
+                    task.elapsed += time.perf_counter() - began
+        except transient_errors() as e:
+            task.error = e
+            if attempt < settings.retry_attempts:
+                await asyncio.sleep(backoff_delay(attempt, settings.retry_backoff))
+        except Exception as e:
+            task.error = e
+            return task
+    return task
+
+
+async def run_tasks(tasks, concurrency=None, on_done=None):
+    """Run ``{name: async fn(conn)}`` concurrently; return TaskResults in the given order.
+
+    A failing task does not cancel the others: its error is kept in its
+    result. ``on_done(result)`` is called as each task finishes.
+    """
+    settings = load_settings()
+    async with open_pool(concurrency, settings) as pool:
+        async def run(name, work):
+            result = await _run_task(pool, name, work, settings)
+            if on_done:
+                on_done(result)
+            return result
+
+        return await asyncio.gather(*(run(name, work) for name, work in tasks.items()))
+
+
+def run_concurrently(tasks, concurrency=None, on_done=None):
+    """Blocking entry point for scripts; returns (results, wall-clock seconds)."""
+    started = time.perf_counter()
+    results = asyncio.run(run_tasks(tasks, concurrency, on_done))
+    return results, time.perf_counter() - started
+
+
+def format_timing(result):
+    wait = f", espera {result.waited * 1000:.0f} ms" if result.waited >= 0.001 else ""
+    retries = f", {result.attempts} intentos" if result.attempts > 1 else ""
+    return f"{result.elapsed * 1000:.0f} ms{wait}{retries}"
+
+
+def summarize(results, wall):
+    """One-line summary: tasks, wall clock and how much of the work overlapped."""
+    busy = sum(r.elapsed for r in results)
+    overlap = busy / wall if wall else 0.0
+    failed = sum(not r.ok for r in results)
+    errors = f", {failed} con error" if failed else ""
+    return f"{len(results)} tareas en {wall:.2f}s (suma {busy:.2f}s, paralelismo {overlap:.1f}x){errors}"
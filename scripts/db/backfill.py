@@ -0,0 +1,233 @@
+"""Batched, resumable backfills.
+
+A backfill walks a table in primary key order with keyset pagination
+(``WHERE id > last_id ORDER BY id LIMIT n``) and applies one batch per
+transaction. The last id of each batch is written to
+``_backfill_checkpoints`` in that same transaction, so row locks are only
+held for one batch and an interrupted run resumes after the last batch
+that committed. Statements are grouped with ``batch.StatementBatch``: a
+batch whose job issues one statement costs three round trips (BEGIN with
+the SELECT, the job, the checkpoint with the COMMIT).
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import psycopg2
+import psycopg2.errors
+
+from .batch import StatementBatch, rollback_open
+from .pool import backoff_delay, connection, get_settings
+from .prisma import quote
+
+CHECKPOINT_TABLE = "_backfill_checkpoints"
+
+CHECKPOINT_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+        name text PRIMARY KEY,
+        last_id bigint NOT NULL DEFAULT 0,
+        rows_done bigint NOT NULL DEFAULT 0,
+        batches integer NOT NULL DEFAULT 0,
+        started_at timestamptz NOT NULL DEFAULT now(),
+        updated_at timestamptz NOT NULL DEFAULT now(),
+        finished_at timestamptz
+    );
+"""
+
+# Only these are safe to replay on the same connection: the batch rolled
+# back and nothing about the session changed
+RETRYABLE_BATCH_ERRORS = (
+    psycopg2.errors.SerializationFailure,
+    psycopg2.errors.DeadlockDetected,
+    psycopg2.errors.LockNotAvailable,
+)
+
+
+class BackfillError(Exception):
+    """Raised when a backfill cannot start (e.g. it is already running)."""
+
+
+@dataclass
+class Backfill:
+    """One backfill job.
+
+    ``apply(cursor, rows)`` receives the rows of a batch (``key`` first,
+    then ``columns``) already locked FOR UPDATE and returns how many rows
+    it changed. ``where`` selects the rows that still need work; rows that
+    stop matching it are simply skipped on the next pass.
+    """
+
+    name: str
+    table: str
+    columns: tuple
+    apply: Callable
+    where: str = None
+    batch_size: int = 1000
+    key: str = "id"
+
+    def select_sql(self):
+        columns = ", ".join(quote(c) for c in (self.key, *self.columns))
+        predicate = f"AND ({self.where})" if self.where else ""
+        return (
+            f"SELECT {columns} FROM {quote(self.table)} "
+            f"WHERE {quote(self.key)} > %s {predicate} "
+            f"ORDER BY {quote(self.key)} LIMIT %s FOR UPDATE;"
+        )
+
+
+@dataclass
+class BackfillProgress:
+    name: str
+    last_id: int
+    high_id: int
+    start_id: int
+    rows: int
+    batches: int
+    elapsed: float
+    resumed: bool = False
+
+    @property
+    def percent(self):
+        span = self.high_id - self.start_id
+        if span <= 0:
+            return 100.0
+        return min(100.0, 100 * (self.last_id - self.start_id) / span)
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def load_checkpoint(cursor, name):
+    """Return (last_id, rows_done, batches, finished) or None."""
+    cursor.execute(
+        f"SELECT last_id, rows_done, batches, finished_at IS NOT NULL FROM {CHECKPOINT_TABLE} WHERE name = %s;",
+        (name,),
+    )
+    return cursor.fetchone()
+
+
+def _start(cursor, job, restart):
+    """Create or reuse the checkpoint; a finished one starts a fresh pass.
+
+    Returns (last_id, resumed, high_id).
+    """
+    batch = StatementBatch(cursor)
+    batch.add(CHECKPOINT_DDL)
+    batch.add(f"INSERT INTO {CHECKPOINT_TABLE} (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;", (job.name,))
+    batch.add(
+        f"""
+        SELECT last_id, finished_at IS NOT NULL,
+               (SELECT COALESCE(MAX({quote(job.key)}), 0) FROM {quote(job.table)})
+        FROM {CHECKPOINT_TABLE} WHERE name = %s;
+        """,
+        (job.name,),
+    )
+    (last_id, finished, high_id), = batch.flush()
+    if restart or finished:
+        cursor.execute(
+            f"""
+            UPDATE {CHECKPOINT_TABLE}
+            SET last_id = 0, rows_done = 0, batches = 0,
+                started_at = now(), updated_at = now(), finished_at = NULL
+            WHERE name = %s;
+            """,
+            (job.name,),
+        )
+        return 0, False, high_id
+    return last_id, last_id > 0, high_id
+
+
+def _run_batch(conn, cursor, job, select_sql, last_id, settings):
+    """Apply one batch; return (last id or None when nothing was left, rows changed, finished).
+
+    Two round trips besides the job's own statements: BEGIN goes out with
+    the SELECT, and the checkpoint with the COMMIT. A short batch is the
+    last one, and marks the checkpoint finished in that same COMMIT.
+    """
+    for attempt in range(1, settings.retry_attempts + 1):
+        try:
+            rows = StatementBatch(cursor, begin=True).add(select_sql, (last_id, job.batch_size)).flush()
+            finish = StatementBatch(cursor, commit=True)
+            if not rows:
+                finish.add(
+                    f"UPDATE {CHECKPOINT_TABLE} SET finished_at = now(), updated_at = now() WHERE name = %s;",
+                    (job.name,),
+                ).flush()
+                return None, 0, True
+            changed = job.apply(cursor, rows)
+            batch_last = rows[-1][0]
+            done = len(rows) < job.batch_size
+            finish.add(
+                f"""
+                UPDATE {CHECKPOINT_TABLE}
+                SET last_id = %s, rows_done = rows_done + %s, batches = batches + 1, updated_at = now(),
+                    finished_at = CASE WHEN %s THEN now() END
+                WHERE name = %s;
+                """,
+                (batch_last, changed, done, job.name),
+            ).flush()
+            return batch_last, changed, done
+        except RETRYABLE_BATCH_ERRORS:
+            rollback_open(conn)
+            if attempt == settings.retry_attempts:
+                raise
+            time.sleep(backoff_delay(attempt, settings.retry_backoff))
+
+
+def run_backfill(job, restart=False, on_batch=None, conn=None):
+    """Run ``job`` to completion, one committed batch at a time.
+
+    Two runs of the same job never overlap: the run holds an advisory lock
+    named after the job. Returns the final BackfillProgress.
+
+    ``conn`` is an autocommit connection the caller already holds; without
+    it one is borrowed from the pool. A caller holding a pooled connection
+    must pass it, or with ``DB_POOL_MAX=1`` the two would wait on each other.
+    """
+    if conn is not None:
+        return _run_backfill(conn, job, restart, on_batch)
+    # Autocommit: transactions are opened and closed inside the batches,
+    # so psycopg2 sends no BEGIN/COMMIT round trips of its own
+    with connection(autocommit=True) as conn:
+        return _run_backfill(conn, job, restart, on_batch)
+
+
+def _run_backfill(conn, job, restart, on_batch):
+    settings = get_settings()
+    on_batch = on_batch or (lambda progress: None)
+    select_sql = job.select_sql()
+    lock_key = f"backfill:{job.name}"
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (lock_key,))
+    if not cursor.fetchone()[0]:
+        raise BackfillError(f"El backfill '{job.name}' ya se está ejecutando en otra sesión")
+    try:
+        last_id, resumed, high_id = _start(cursor, job, restart)
+
+        started = time.perf_counter()
+        progress = BackfillProgress(job.name, last_id, high_id, last_id, 0, 0, 0.0, resumed)
+        finished = False
+        while not finished:
+            batch_last, changed, finished = _run_batch(conn, cursor, job, select_sql, progress.last_id, settings)
+            if batch_last is None:
+                break
+            progress.last_id = batch_last
+            progress.rows += changed
+            progress.batches += 1
+            progress.elapsed = time.perf_counter() - started
+            on_batch(progress)
+
+        progress.elapsed = time.perf_counter() - started
+        return progress
+    finally:
+        # Session-level lock: release it before the connection goes back to its owner
+        if not conn.closed:
+            try:
+                rollback_open(conn)
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (lock_key,))
+            except psycopg2.Error:
+                conn.close()
+        cursor.close()
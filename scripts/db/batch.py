@@ -0,0 +1,71 @@
+"""Send several statements to the server in one round trip.
+
+psycopg2 sends one statement per ``execute()`` and, outside autocommit,
+a separate ``BEGIN`` before the first one and a ``COMMIT`` at the end.
+Against a remote endpoint each of those is a full network round trip.
+A ``StatementBatch`` binds its statements with ``mogrify`` and sends them
+as a single multi-statement string: the server runs them in order and
+stops at the first error, and only the last statement's rows come back.
+
+On an autocommit connection ``begin=True`` / ``commit=True`` put the
+transaction boundaries in the same string, so a short transaction costs
+one round trip to open (with its first query) and one to close (with its
+last writes).
+"""
+
+import psycopg2.extensions
+
+OPEN_TRANSACTION = (
+    psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+    psycopg2.extensions.TRANSACTION_STATUS_INERROR,
+)
+
+
+def rollback_open(conn):
+    """Roll back a transaction opened with an explicit BEGIN on an autocommit connection."""
+    if conn.closed:
+        return
+    if not conn.autocommit:
+        conn.rollback()
+    elif conn.info.transaction_status in OPEN_TRANSACTION:
+        with conn.cursor() as cursor:
+            cursor.execute("ROLLBACK;")
+
+
+class StatementBatch:
+    """Queue of statements flushed together with one ``execute()``."""
+
+    def __init__(self, cursor, begin=False, commit=False):
+        self.cursor = cursor
+        self.begin = begin
+        self.commit = commit
+        self._statements = []
+
+    def __len__(self):
+        return len(self._statements)
+
+    def add(self, query, params=None):
+        statement = self.cursor.mogrify(query, params) if params is not None else query.encode()
+        self._statements.append(statement.strip().rstrip(b";"))
+        return self
+
+    def flush(self):
+        """Run the queued statements; return the last one's rows (None if it returns none).
+
+        With ``commit`` the last statement is the COMMIT, so nothing comes back.
+        """
+        statements = self._statements
+        self._statements = []
+        if self.begin:
+            statements = [b"BEGIN", *statements]
+        if self.commit:
+            statements = [*statements, b"COMMIT"]
+        if not statements:
+            return None
+        try:
+            self.cursor.execute(b";\n".join(statements) + b";")
+        except psycopg2.Error:
+            # The server stopped at the failing statement; close what BEGIN opened
+            rollback_open(self.cursor.connection)
+            raise
+        return self.cursor.fetchall() if self.cursor.description else None
@@ -0,0 +1,222 @@
+"""Catalog introspection: every table, column, index and constraint in one query."""
+
+from dataclasses import dataclass, field
+
+from psycopg2 import sql
+
+INTROSPECT_SQL = """
+    SELECT
+        c.relname,
+        COALESCE(parts.reltuples, c.reltuples::bigint),
+        COALESCE(parts.n_live_tup, s.n_live_tup),
+        COALESCE(parts.seq_scan, s.seq_scan),
+        COALESCE(parts.idx_scan, s.idx_scan),
+        COALESCE(parts.bytes, pg_total_relation_size(c.oid)),
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'name', a.attname,
+                'type', format_type(a.atttypid, a.atttypmod),
+                'not_null', a.attnotnull,
+                'default', pg_get_expr(d.adbin, d.adrelid)
+            ) ORDER BY a.attnum)
+            FROM pg_attribute a
+            LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+            WHERE a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        ), '[]'),
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'name', i.relname,
+                'columns', (
+                    SELECT array_agg(pg_get_indexdef(x.indexrelid, k, true) ORDER BY k)
+                    FROM generate_series(1, x.indnkeyatts) AS k
+                ),
+                'unique', x.indisunique,
+                'primary', x.indisprimary,
+                'valid', x.indisvalid,
+                'partial', x.indpred IS NOT NULL,
+                'definition', pg_get_indexdef(x.indexrelid),
+                'size', COALESCE(
+                    (SELECT SUM(pg_relation_size(t.relid)) FROM pg_partition_tree(x.indexrelid) t WHERE t.isleaf),
+                    pg_relation_size(x.indexrelid)
+                )::bigint
+            ) ORDER BY i.relname)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = c.oid
+        ), '[]'),
+        COALESCE((
+            SELECT json_agg(json_build_object(
+                'name', con.conname,
+                'type', con.contype,
+                'definition', pg_get_constraintdef(con.oid)
+            ) ORDER BY con.conname)
+            FROM pg_constraint con
+            WHERE con.conrelid = c.oid
+        ), '[]')
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    -- A partitioned table holds no rows itself: add up its partitions
+    LEFT JOIN LATERAL (
+        SELECT
+            SUM(GREATEST(p.reltuples, 0))::bigint AS reltuples,
+            SUM(ps.n_live_tup)::bigint AS n_live_tup,
+            SUM(ps.seq_scan)::bigint AS seq_scan,
+            SUM(ps.idx_scan)::bigint AS idx_scan,
+            SUM(pg_total_relation_size(p.oid))::bigint AS bytes
+        FROM pg_partition_tree(c.oid) t
+        JOIN pg_class p ON p.oid = t.relid
+        LEFT JOIN pg_stat_user_tables ps ON ps.relid = p.oid
+        WHERE t.isleaf
+    ) parts ON c.relkind = 'p'
+    WHERE n.nspname = %(schema)s
+    AND c.relkind IN ('r', 'p')
+    AND NOT c.relispartition
+    AND (%(tables)s::text[] IS NULL OR c.relname = ANY(%(tables)s::text[]))
+    ORDER BY c.relname;
+"""
+
+CONSTRAINT_TYPES = {
+    "p": "PRIMARY KEY",
+    "u": "UNIQUE",
+    "f": "FOREIGN KEY",
+    "c": "CHECK",
+    "x": "EXCLUDE",
+}
+
+
+@dataclass
+class Column:
+    name: str
+    type: str
+    not_null: bool
+    default: str = None
+
+
+@dataclass
+class Index:
+    name: str
+    columns: list
+    unique: bool
+    primary: bool
+    valid: bool
+    partial: bool
+    definition: str
+    size: int
+
+
+@dataclass
+class Constraint:
+    name: str
+    type: str
+    definition: str
+
+    @property
+    def kind(self):
+        return CONSTRAINT_TYPES.get(self.type, self.type)
+
+
+@dataclass
+class TableInfo:
+    name: str
+    reltuples: int
+    live_tuples: int
+    seq_scan: int
+    idx_scan: int
+    total_bytes: int
+    columns: list = field(default_factory=list)
+    indexes: list = field(default_factory=list)
+    constraints: list = field(default_factory=list)
+
+    @property
+    def estimated_rows(self):
+        """Row estimate without scanning the table.
+
+        pg_stat_user_tables is kept current by the stats collector;
+        reltuples only moves on VACUUM/ANALYZE and is -1 before the first.
+        """
+        if self.live_tuples:
+            return self.live_tuples
+        if self.reltuples is not None and self.reltuples >= 0:
+            return self.reltuples
+        return self.live_tuples or 0
+
+    def column(self, name):
+        return next((c for c in self.columns if c.name == name), None)
+
+    def index(self, name):
+        return next((i for i in self.indexes if i.name == name), None)
+
+
+def introspect(cursor, tables=None, schema="public"):
+    """Return {table_name: TableInfo} for the schema in a single round trip."""
+    cursor.execute(INTROSPECT_SQL, {"schema": schema, "tables": list(tables) if tables else None})
+    result = {}
+    for name, reltuples, live, seq_scan, idx_scan, total_bytes, columns, indexes, constraints in cursor.fetchall():
+        result[name] = TableInfo(
+            name=name,
+            reltuples=reltuples,
+            live_tuples=live,
+            seq_scan=seq_scan,
+            idx_scan=idx_scan,
+            total_bytes=total_bytes,
+            columns=[Column(**c) for c in columns],
+            indexes=[Index(**i) for i in indexes],
+            constraints=[Constraint(**c) for c in constraints],
+        )
+    return result
+
+
+def introspect_enums(cursor, schema="public"):
+    """Return {enum_name: [labels in sort order]} for the schema."""
+    cursor.execute("""
+        SELECT t.typname, array_agg(e.enumlabel ORDER BY e.enumsortorder)
+        FROM pg_type t
+        JOIN pg_enum e ON e.enumtypid = t.oid
+        JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE n.nspname = %s
+        GROUP BY t.typname;
+    """, (schema,))
+    return dict(cursor.fetchall())
+
+
+def exact_counts(cursor, tables, schema="public"):
+    """COUNT(*) every table in one statement. Scans each table in full."""
+    if not tables:
+        return {}
+    tables = list(tables)
+    query = sql.SQL("SELECT {}").format(
+        sql.SQL(", ").join(
+            sql.SQL("(SELECT COUNT(*) FROM {})").format(sql.Identifier(schema, table))
+            for table in tables
+        )
+    )
+    cursor.execute(query)
+    return dict(zip(tables, cursor.fetchone()))
+
+
+def empty_tables(cursor, tables, schema="public"):
+    """The tables that hold no rows, from one EXISTS probe each.
+
+    Unlike reltuples (0 or -1 until the first ANALYZE) this is exact, and
+    each probe stops at the first row.
+    """
+    if not tables:
+        return set()
+    tables = list(tables)
+    query = sql.SQL("SELECT {}").format(
+        sql.SQL(", ").join(
+            sql.SQL("EXISTS (SELECT 1 FROM {})").format(sql.Identifier(schema, table))
+            for table in tables
+        )
+    )
+    cursor.execute(query)
+    return {table for table, has_rows in zip(tables, cursor.fetchone()) if not has_rows}
+
+
+def format_bytes(size):
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
@@ -0,0 +1,123 @@
+"""Database settings for the maintenance scripts, read from the environment.
+
+Values come from the process environment first and then from the
+project's ``.env.local`` / ``.env`` files (same keys as ``env.example``).
+"""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from psycopg2.extensions import parse_dsn
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+ENV_FILES = (".env.local", ".env")
+
+# Placeholder shipped in env.example
+PLACEHOLDER_URL = "your_database_url_here"
+
+# Hosts that mean "this machine" in a connection string or a server URL
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+
+class DatabaseConfigError(Exception):
+    """Raised when the database settings are missing or invalid."""
+
+
+@dataclass(frozen=True)
+class Settings:
+    database_url: str
+    pool_min: int = 1
+    pool_max: int = 5
+    connect_timeout: int = 10
+    statement_timeout_ms: int = 60000
+    retry_attempts: int = 3
+    retry_backoff: float = 0.5
+    application_name: str = "gym-pilot-scripts"
+
+
+def _parse_env_file(path):
+    values = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key = key.strip()
+        if key.startswith("export "):
+            key = key[len("export "):].strip()
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+            value = value[1:-1]
+        values[key] = value
+    return values
+
+
+def load_env_files():
+    """Copy keys from .env.local / .env into os.environ without overriding."""
+    for name in ENV_FILES:
+        path = PROJECT_ROOT / name
+        if not path.is_file():
+            continue
+        for key, value in _parse_env_file(path).items():
+            os.environ.setdefault(key, value)
+
+
+def _env_int(name, default):
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise DatabaseConfigError(f"{name} debe ser un número entero (valor: {raw!r})")
+
+
+def _env_float(name, default):
+    raw = os.environ.get(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        raise DatabaseConfigError(f"{name} debe ser un número (valor: {raw!r})")
+
+
+def get_database_url(name="DATABASE_URL"):
+    """Return the connection string stored in the given variable."""
+    load_env_files()
+    url = os.environ.get(name, "").strip()
+    if not url or url == PLACEHOLDER_URL:
+        raise DatabaseConfigError(
+            f"{name} no está configurada. Defínela en el entorno o en .env.local (ver env.example)"
+        )
+    return url
+
+
+def is_local_database(url):
+    """Whether a connection string points at a server on this machine."""
+    host = parse_dsn(url).get("host", "")
+    # No host or a socket directory means a local server
+    return not host or host.startswith("/") or host in LOCAL_HOSTS
+
+
+def load_settings():
+    """Build the pool settings from the environment."""
+    database_url = get_database_url()
+    pool_min = _env_int("DB_POOL_MIN", Settings.pool_min)
+    pool_max = _env_int("DB_POOL_MAX", Settings.pool_max)
+    if pool_min < 0 or pool_max < 1 or pool_min > pool_max:
+        raise DatabaseConfigError(
+            f"Tamaño de pool inválido: DB_POOL_MIN={pool_min}, DB_POOL_MAX={pool_max}"
+        )
+
+    return Settings(
+        database_url=database_url,
+        pool_min=pool_min,
+        pool_max=pool_max,
+        connect_timeout=_env_int("DB_CONNECT_TIMEOUT", Settings.connect_timeout),
+        statement_timeout_ms=_env_int("DB_STATEMENT_TIMEOUT_MS", Settings.statement_timeout_ms),
+        retry_attempts=max(1, _env_int("DB_RETRY_ATTEMPTS", Settings.retry_attempts)),
+        retry_backoff=_env_float("DB_RETRY_BACKOFF", Settings.retry_backoff),
+        application_name=os.environ.get("DB_APPLICATION_NAME", Settings.application_name),
+    )
@@ -0,0 +1,106 @@
+"""Streaming COPY helpers.
+
+Rows are rendered to CSV only as psycopg2 asks for more data, so loading
+a million rows uses the same memory as loading ten. Files are passed to
+the server as they are read.
+"""
+
+import csv
+import io
+from collections.abc import Mapping
+
+from .prisma import quote, quote_list
+
+# Bytes psycopg2 requests per read(); large enough to keep round trips rare
+COPY_CHUNK = 64 * 1024
+
+
+class CopyStream(io.TextIOBase):
+    """File-like object that renders rows as CSV on demand for COPY FROM STDIN.
+
+    Rows may be dicts (looked up by ``columns``) or sequences already in
+    column order. None and empty strings both load as NULL.
+    """
+
+    def __init__(self, rows, columns):
+        self._rows = iter(rows)
+        self._columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def _render(self, row):
+        if isinstance(row, Mapping):
+            row = [row.get(column) for column in self._columns]
+        self._writer.writerow(["" if value is None else value for value in row])
+        self.count += 1
+
+    def read(self, size=-1):
+        # Render into the buffer until it can satisfy the request, then
+        # move it to _pending in one piece rather than once per row
+        while size < 0 or len(self._pending) + self._buffer.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._render(row)
+        if self._buffer.tell():
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+
+        if size < 0:
+            chunk, self._pending = self._pending, ""
+        else:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def copy_rows(cursor, table, columns, rows, size=COPY_CHUNK):
+    """COPY ``rows`` into ``table`` and return how many were sent."""
+    stream = CopyStream(rows, columns)
+    cursor.copy_expert(
+        f"COPY {quote(table)} ({quote_list(columns)}) FROM STDIN WITH (FORMAT csv)",
+        stream,
+        size=size,
+    )
+    return stream.count
+
+
+def copy_file(cursor, table, columns, file, delimiter=",", size=COPY_CHUNK):
+    """COPY a CSV file object (header already read) into ``table``; return the row count.
+
+    The server parses the CSV, so the file never goes through Python rows.
+    """
+    if len(delimiter) != 1 or delimiter in "'\\":
+        raise ValueError(f"Delimitador no válido: {delimiter!r}")
+    cursor.copy_expert(
+        f"COPY {quote(table)} ({quote_list(columns)}) FROM STDIN WITH (FORMAT csv, DELIMITER '{delimiter}')",
+        file,
+        size=size,
+    )
+    return cursor.rowcount
+
+
+def copy_query_to(cursor, query, file, header=True, size=COPY_CHUNK):
+    """COPY the result of ``query`` to a file object as CSV; return the row count.
+
+    Text files receive str and binary files (e.g. BytesIO) raw bytes.
+    """
+    options = "FORMAT csv, HEADER" if header else "FORMAT csv"
+    cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH ({options})", file, size=size)
+    return cursor.rowcount
+
+
+def sync_sequence(cursor, table, column="id"):
+    """Move the serial sequence past rows loaded with explicit ids."""
+    cursor.execute(
+        f"""
+        SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({quote(column)}), 0) + 1, false)
+        FROM {quote(table)};
+        """,
+        (quote(table), column),
+    )
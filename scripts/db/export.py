@@ -0,0 +1,246 @@
+"""Parallel, chunked table exports to CSV or Parquet.
+
+An export splits the key range of a table into one contiguous slice per
+worker. Each worker walks its slice in windows of ``batch_size`` ids and
+streams every window with ``COPY (SELECT ...) TO STDOUT``: one short
+autocommit statement per window, so no snapshot outlives a window and
+memory holds one window per worker however large the table is. CSV
+windows are appended to the worker's file as they arrive; for Parquet
+pyarrow parses each window and writes it as one row group.
+
+The result is not a single point-in-time snapshot: a row written while
+the export runs is included only if its window had not been read yet.
+"""
+
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .copy import copy_query_to
+from .pool import connection
+from .prisma import quote, quote_list
+
+FORMATS = ("parquet", "csv")
+
+# format_type() names -> pyarrow type factory names; anything else is exported as text
+ARROW_TYPES = {
+    "smallint": "int16",
+    "integer": "int32",
+    "bigint": "int64",
+    "real": "float32",
+    "double precision": "float64",
+    "boolean": "bool_",
+    "date": "date32",
+}
+
+
+def arrow_type(pg_type):
+    import pyarrow as pa
+
+    if pg_type.startswith("timestamp"):
+        tz = "UTC" if "with time zone" in pg_type else None
+        return pa.timestamp("ms" if pg_type.startswith("timestamp(3)") else "us", tz=tz)
+    return getattr(pa, ARROW_TYPES.get(pg_type, "string"))()
+
+
+@dataclass
+class ExportSource:
+    """The rows of ``table`` to export.
+
+    ``columns`` are catalog ``Column`` objects in table order; ``where`` is
+    a predicate with its values already bound (``cursor.mogrify``), since
+    COPY takes no parameters.
+    """
+
+    table: str
+    columns: list
+    where: str = None
+    key: str = "id"
+
+    @property
+    def names(self):
+        return [c.name for c in self.columns]
+
+    def bounds_sql(self):
+        where = f" WHERE {self.where}" if self.where else ""
+        key = quote(self.key)
+        return f"SELECT MIN({key}), MAX({key}) FROM {quote(self.table)}{where};"
+
+    def window_sql(self, after, upto):
+        key = quote(self.key)
+        predicate = f" AND ({self.where})" if self.where else ""
+        return (
+            f"SELECT {quote_list(self.names)} FROM {quote(self.table)} "
+            f"WHERE {key} > {int(after)} AND {key} <= {int(upto)}{predicate} ORDER BY {key}"
+        )
+
+
+def split_ranges(low, high, workers, batch_size):
+    """Split ids ``low..high`` into (after, upto] slices, at most one per worker and per window."""
+    if low is None:
+        return []
+    span = high - low + 1
+    workers = max(1, min(workers, -(-span // batch_size)))
+    step = -(-span // workers)
+    return [(low - 1 + i * step, min(high, low - 1 + (i + 1) * step)) for i in range(workers)]
+
+
+class CsvPart:
+    """One worker's CSV file: a header line, then the COPY output appended as is."""
+
+    def __init__(self, path, source):
+        self.path = path
+        self._file = path.open("wb")
+        self._file.write((",".join(source.names) + "\n").encode())
+
+    def write(self, chunk):
+        self._file.write(chunk.getbuffer())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetPart:
+    """One worker's Parquet file; every window becomes one row group."""
+
+    def __init__(self, path, source, compression="zstd"):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self._pacsv = pacsv
+        self._schema = pa.schema([pa.field(c.name, arrow_type(c.type), not c.not_null) for c in source.columns])
+        self._read = pacsv.ReadOptions(column_names=source.names)
+        # COPY writes NULL unquoted and '' quoted, which keeps the two apart
+        self._convert = pacsv.ConvertOptions(
+            column_types=self._schema,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=False,
+            true_values=["t"],
+            false_values=["f"],
+        )
+        self._writer = pq.ParquetWriter(path, self._schema, compression=compression)
+
+    def write(self, chunk):
+        chunk.seek(0)
+        table = self._pacsv.read_csv(chunk, read_options=self._read, convert_options=self._convert)
+        self._writer.write_table(table.cast(self._schema), row_group_size=max(1, table.num_rows))
+
+    def close(self):
+        self._writer.close()
+
+
+@dataclass
+class ExportResult:
+    table: str
+    rows: int = 0
+    windows: int = 0
+    files: list = field(default_factory=list)
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _export_slice(source, after, upto, path, fmt, batch_size, options, progress):
+    """Stream ids (after, upto] window by window; the file is created on the first row."""
+    part = None
+    rows = 0
+    try:
+        with connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+            for start in range(after, upto, batch_size):
+                if progress.stopped:
+                    break
+                chunk = io.BytesIO()
+                query = source.window_sql(start, min(start + batch_size, upto))
+                count = copy_query_to(cursor, query, chunk, header=False)
+                if count:
+                    if part is None:
+                        part = ParquetPart(path, source, **options) if fmt == "parquet" else CsvPart(path, source)
+                    part.write(chunk)
+                    rows += count
+                progress.add(count)
+            cursor.close()
+    finally:
+        if part is not None:
+            part.close()
+    return (path, rows) if part is not None else (None, 0)
+
+
+class _Progress:
+    """Row counter shared by the workers; reports at most every ``interval`` seconds."""
+
+    def __init__(self, total_windows, on_progress, interval=2.0):
+        self._lock = threading.Lock()
+        self._on_progress = on_progress or (lambda rows, windows, total: None)
+        self._interval = interval
+        self._last = time.perf_counter()
+        self.total_windows = total_windows
+        self.rows = 0
+        self.windows = 0
+        self.stopped = False
+
+    def add(self, rows):
+        with self._lock:
+            self.rows += rows
+            self.windows += 1
+            now = time.perf_counter()
+            if now - self._last >= self._interval:
+                self._last = now
+                self._on_progress(self.rows, self.windows, self.total_windows)
+
+
+def export_table(source, directory, fmt="parquet", workers=4, batch_size=50_000, on_progress=None,
+                 compression="zstd"):
+    """Export ``source`` into ``directory/part-NNN.<fmt>`` files and return an ExportResult.
+
+    ``on_progress(rows, windows_done, windows_total)`` is called from the
+    worker threads. Each worker holds one pooled connection for its slice.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    result = ExportResult(source.table)
+    started = time.perf_counter()
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(source.bounds_sql())
+        low, high = cursor.fetchone()
+        cursor.close()
+    slices = split_ranges(low, high, workers, batch_size)
+    if not slices:
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    directory.mkdir(parents=True, exist_ok=True)
+    options = {"compression": compression} if fmt == "parquet" else {}
+    progress = _Progress(sum(-(-(upto - after) // batch_size) for after, upto in slices), on_progress)
+    with ThreadPoolExecutor(max_workers=len(slices)) as executor:
+        futures = [
+            executor.submit(
+                _export_slice, source, after, upto, directory / f"part-{number:03d}.{fmt}",
+                fmt, batch_size, options, progress,
+            )
+            for number, (after, upto) in enumerate(slices)
+        ]
+        try:
+            done = [future.result() for future in futures]
+        except BaseException:
+            # Let the other workers finish their current window and stop
+            progress.stopped = True
+            raise
+
+    for path, rows in done:
+        if path is not None:
+            result.files.append(path)
+            result.bytes += path.stat().st_size
+    result.rows = progress.rows
+    result.windows = progress.windows
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,271 @@
+"""Index inventory: duplicate, redundant and unused indexes, and covering indexes.
+
+Every index in the schema comes from ``pg_index`` with its key columns,
+INCLUDE columns, operator classes, collations and predicate, and its scan
+count from ``pg_stat_user_indexes`` (summed over the partitions of a
+partitioned index). Each index costs a write on every INSERT and on
+every UPDATE that touches its columns, so one whose reads another index
+can serve is pure overhead:
+
+- duplicate: same method, keys, opclasses, collations and predicate;
+- redundant prefix: a non-unique B-tree whose keys lead another B-tree
+  with the same predicate, e.g. ``(email)`` next to ``(email, gym_id)``;
+- unused: no scans since the statistics were last reset.
+
+Indexes that back a primary key, unique or exclusion constraint are never
+proposed for dropping: they are the constraint.
+
+``COVERING_CANDIDATES`` are the lookups every authenticated request makes
+(``lib/session.ts``): a primary-key read of a handful of columns. Storing
+those columns in the index leaf (INCLUDE) turns the read into an
+index-only scan once VACUUM has marked the heap pages all-visible.
+
+An INCLUDE column still has to fit in a B-tree entry (about 2.7 kB), so
+free-text columns with no length limit stay out: the gyms lookup in
+``lib/gym-session.ts`` would include ``image``, which the API accepts as
+a data URL of any size, and one such row makes every write to it fail.
+``WITHDRAWN_INDEXES`` lists covering indexes proposed earlier for that
+reason, so the audit drops them.
+"""
+
+from dataclasses import dataclass
+
+from .advisor import IndexCandidate, _unquote
+from .prisma import quote, quote_list
+
+INVENTORY_SQL = """
+    SELECT
+        t.relname,
+        c.relname,
+        am.amname,
+        ARRAY(
+            SELECT pg_get_indexdef(x.indexrelid, k, true)
+            FROM generate_series(1, x.indnkeyatts) AS k ORDER BY k
+        ),
+        ARRAY(
+            SELECT pg_get_indexdef(x.indexrelid, k, true)
+            FROM generate_series(x.indnkeyatts + 1, x.indnatts) AS k ORDER BY k
+        ),
+        x.indclass::text,
+        x.indcollation::text,
+        x.indoption::text,
+        pg_get_expr(x.indpred, x.indrelid),
+        x.indisunique,
+        x.indisprimary,
+        con.contype,
+        x.indisvalid,
+        t.relkind = 'p',
+        COALESCE(parts.bytes, pg_relation_size(x.indexrelid)),
+        COALESCE(parts.scans, s.idx_scan, 0),
+        pg_get_indexdef(x.indexrelid)
+    FROM pg_index x
+    JOIN pg_class c ON c.oid = x.indexrelid
+    JOIN pg_class t ON t.oid = x.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_am am ON am.oid = c.relam
+    LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.contype IN ('p', 'u', 'x')
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = x.indexrelid
+    -- A partitioned index holds nothing itself: add up its partitions
+    LEFT JOIN LATERAL (
+        SELECT
+            SUM(pg_relation_size(p.relid))::bigint AS bytes,
+            SUM(ps.idx_scan)::bigint AS scans
+        FROM pg_partition_tree(x.indexrelid) p
+        LEFT JOIN pg_stat_user_indexes ps ON ps.indexrelid = p.relid
+        WHERE p.isleaf
+    ) parts ON c.relkind = 'I'
+    WHERE n.nspname = %(schema)s
+    AND NOT t.relispartition
+    ORDER BY t.relname, c.relname;
+"""
+
+COVERING_CANDIDATES = (
+    IndexCandidate(
+        "user_accounts", ("id",),
+        "getSessionUser() en lib/session.ts, en cada petición autenticada",
+        include=("name", "email", "role"),
+    ),
+)
+
+# Covering indexes an earlier audit created and that are unsafe to keep
+WITHDRAWN_INDEXES = {
+    "gyms_id_covering_idx": "incluye texto sin límite (image, hours): una fila grande hace fallar los INSERT/UPDATE",
+}
+
+
+@dataclass
+class IndexInfo:
+    table: str
+    name: str
+    method: str
+    keys: tuple
+    include: tuple
+    opclasses: tuple
+    collations: tuple
+    options: tuple
+    predicate: str
+    unique: bool
+    primary: bool
+    constraint: str
+    valid: bool
+    partitioned: bool
+    size: int
+    scans: int
+    definition: str
+
+    @property
+    def required(self):
+        """Backs a constraint: DROP INDEX would fail, and it should."""
+        return self.primary or self.constraint is not None
+
+    @property
+    def columns(self):
+        return {_unquote(c) for c in self.keys + self.include}
+
+    def key_signature(self, length=None):
+        """Everything that decides which lookups the first ``length`` keys can serve."""
+        length = len(self.keys) if length is None else length
+        return (
+            self.method,
+            self.keys[:length],
+            self.opclasses[:length],
+            self.collations[:length],
+            self.options[:length],
+            self.predicate,
+        )
+
+
+@dataclass
+class Finding:
+    index: IndexInfo
+    kind: str  # "duplicate", "prefix", "unused" or "withdrawn"
+    kept_by: IndexInfo = None
+    declared: bool = False
+
+    @property
+    def droppable(self):
+        """Can go through DROP INDEX CONCURRENTLY without schema.prisma bringing it back."""
+        return not self.declared and not self.index.partitioned
+
+
+@dataclass
+class Covering:
+    candidate: IndexCandidate
+    covered_by: str = None
+    missing_columns: tuple = ()
+
+    @property
+    def actionable(self):
+        return self.covered_by is None and not self.missing_columns
+
+
+def inventory(cursor, schema="public"):
+    """Every index in the schema, as a list of IndexInfo."""
+    cursor.execute(INVENTORY_SQL, {"schema": schema})
+    return [
+        IndexInfo(
+            table=table, name=name, method=method, keys=tuple(keys), include=tuple(include),
+            opclasses=tuple(opclasses.split()), collations=tuple(collations.split()),
+            options=tuple(options.split()), predicate=predicate, unique=unique, primary=primary,
+            constraint=constraint, valid=valid, partitioned=partitioned, size=size, scans=scans,
+            definition=definition,
+        )
+        for (table, name, method, keys, include, opclasses, collations, options, predicate, unique,
+             primary, constraint, valid, partitioned, size, scans, definition) in cursor.fetchall()
+    ]
+
+
+def _serves(kept, index):
+    """How ``kept`` makes ``index`` unnecessary: "duplicate", "prefix" or None."""
+    if kept.name == index.name or kept.table != index.table or not kept.valid:
+        return None
+    if not index.columns <= kept.columns:
+        return None  # index-only scans on index would lose columns
+    if kept.key_signature() == index.key_signature():
+        # A unique index enforces something the other one may not
+        return "duplicate" if kept.unique or not index.unique else None
+    if (index.method == "btree" and not index.unique and len(index.keys) < len(kept.keys)
+            and kept.key_signature(len(index.keys)) == index.key_signature()):
+        return "prefix"
+    return None
+
+
+def _keep_order(index, declared):
+    """Sort key: the index to keep among duplicates sorts last."""
+    return (index.required, index.unique, index.name in declared, index.scans, index.name)
+
+
+def find_redundant(indexes, declared=()):
+    """Duplicate and redundant-prefix indexes, each with the index that serves it.
+
+    Candidates are visited from least to most worth keeping and a dropped
+    index never serves another, so of two identical indexes one survives;
+    each is matched to the best index that serves it, the one that stays.
+    """
+    declared = set(declared)
+    ranked = sorted(indexes, key=lambda i: _keep_order(i, declared))
+    findings = []
+    dropped = set()
+    for index in ranked:
+        if index.required:
+            continue
+        for kept in reversed(ranked):
+            if kept.name in dropped:
+                continue
+            kind = _serves(kept, index)
+            if kind:
+                findings.append(Finding(index, kind, kept, index.name in declared))
+                dropped.add(index.name)
+                break
+    return findings
+
+
+def find_unused(indexes, skip=(), declared=()):
+    """Valid, non-unique indexes with no scans, except those in ``skip``."""
+    declared = set(declared)
+    return [
+        Finding(index, "unused", declared=index.name in declared)
+        for index in indexes
+        if index.valid and not index.unique and not index.required
+        and index.scans == 0 and index.name not in skip
+    ]
+
+
+def find_withdrawn(indexes, withdrawn=WITHDRAWN_INDEXES):
+    """Live indexes listed in ``withdrawn``."""
+    return [Finding(index, "withdrawn") for index in indexes if index.name in withdrawn and not index.required]
+
+
+def find_covering(indexes, tables, candidates=COVERING_CANDIDATES):
+    """Check each covering candidate against the live indexes and columns."""
+    result = []
+    for candidate in candidates:
+        table = tables.get(candidate.table)
+        if table is None:
+            continue
+        missing = tuple(c for c in candidate.columns + candidate.include if table.column(c) is None)
+        wanted = list(candidate.columns)
+        covered_by = next(
+            (
+                index.name for index in indexes
+                if index.table == candidate.table and index.valid and index.predicate is None
+                and [_unquote(k) for k in index.keys[:len(wanted)]] == wanted
+                and set(candidate.include) <= index.columns
+            ),
+            None,
+        )
+        result.append(Covering(candidate, covered_by, missing))
+    return result
+
+
+def stats_reset(cursor):
+    """When this database's counters were last reset, or None if never."""
+    cursor.execute("SELECT stats_reset FROM pg_stat_database WHERE datname = current_database();")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def lookup_sql(candidate):
+    """The session read a covering candidate serves, for EXPLAIN."""
+    where = " AND ".join(f"{quote(c)} = %s" for c in candidate.columns)
+    return f"SELECT {quote_list(candidate.columns + candidate.include)} FROM {quote(candidate.table)} WHERE {where};"
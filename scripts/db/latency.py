@@ -0,0 +1,17 @@
+"""Latency summaries shared by the benchmark and load-test scripts."""
+
+import math
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list.
+
+    The rank is ``ceil(fraction * n)``: p95 of 100 samples is the 95th
+    value, never the maximum.
+    """
+    if not sorted_values:
+        return 0.0
+    # round() first: 0.07 * 100 is 7.000000000000001 in floating point
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    rank = max(1, min(len(sorted_values), rank))
+    return sorted_values[rank - 1]
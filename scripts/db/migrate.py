@@ -0,0 +1,571 @@
+"""Declarative migrations: diff schema.prisma against the live catalog.
+
+The plan is additive and avoids long locks:
+
+* enum values are added first, in autocommit (a new label cannot be used
+  in the transaction that adds it);
+* tables, columns, defaults and foreign keys go in one transaction.
+  Columns are added nullable or with a constant default, which never
+  rewrites the table, and foreign keys on existing tables are added
+  ``NOT VALID``;
+* after commit, indexes on existing tables are built ``CONCURRENTLY``
+  (partition by partition on partitioned tables) and the new foreign keys
+  are validated without blocking writes.
+
+With ``backfill=True`` columns that the schema declares NOT NULL are
+filled in resumable batches (see ``backfill.py``) and then promoted through a
+``CHECK ... NOT VALID`` constraint, so ``SET NOT NULL`` skips the scan.
+
+Anything else that would need a rewrite or a full-table lock (type
+changes, dropping columns) is reported as a warning, never applied.
+
+Statements that take an ACCESS EXCLUSIVE lock run under ``lock_timeout``
+and are retried with backoff, so a migration queued behind a long
+transaction gives up quickly instead of blocking every reader.
+``@updatedAt`` columns get ``DEFAULT CURRENT_TIMESTAMP`` so raw SQL inserts
+from these scripts keep working.
+"""
+
+import re
+import threading
+from dataclasses import dataclass, field, replace
+
+from .backfill import Backfill, run_backfill
+from .catalog import empty_tables, introspect, introspect_enums
+from .partitions import is_partitioned, list_partitions
+from .pool import connect, connection, get_settings, statement_timeout, with_lock_retry
+from .prisma import quote, quote_list, load_schema
+
+PHASE_PRE = "pre"
+PHASE_TRANSACTION = "transaction"
+PHASE_ONLINE = "online"
+PHASES = (PHASE_PRE, PHASE_TRANSACTION, PHASE_ONLINE)
+
+# Order of steps inside the transaction
+ORDER_TYPE, ORDER_TABLE, ORDER_COLUMN, ORDER_ALTER, ORDER_INDEX, ORDER_FOREIGN_KEY = range(6)
+
+# Order of steps after commit
+(
+    ONLINE_INDEX,
+    ONLINE_VALIDATE,
+    ONLINE_BACKFILL,
+    ONLINE_CHECK,
+    ONLINE_CHECK_VALIDATE,
+    ONLINE_SET_NOT_NULL,
+    ONLINE_DROP_CHECK,
+) = range(7)
+
+STEP_SQL = "sql"
+STEP_BACKFILL = "backfill"
+
+PROGRESS_SQL = """
+    SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total
+    FROM pg_stat_progress_create_index
+    WHERE pid = %s;
+"""
+
+FOREIGN_KEY_RE = re.compile(r"FOREIGN KEY \((.+?)\) REFERENCES (.+?)\((.+?)\)")
+
+
+@dataclass
+class Step:
+    phase: str
+    table: str
+    description: str
+    sql: str
+    order: int = 0
+    # False for steps that never block readers or writers (CONCURRENTLY,
+    # VALIDATE, batched updates): those run without lock_timeout
+    blocking: bool = True
+    kind: str = STEP_SQL
+    index: str = None
+    column: str = None
+    fill: str = None
+
+
+@dataclass
+class RunOptions:
+    lock_timeout_ms: int = 2000
+    attempts: int = 10
+    backoff: float = 0.5
+    batch_size: int = 5000
+    progress_interval: float = 5.0
+
+
+@dataclass
+class Plan:
+    steps: list = field(default_factory=list)
+    warnings: list = field(default_factory=list)
+
+    def add(self, phase, table, description, sql, order=0, **extra):
+        self.steps.append(Step(phase, table, description, sql, order, **extra))
+
+    def warn(self, table, message):
+        self.warnings.append((table, message))
+
+    def phase(self, name):
+        return sorted((s for s in self.steps if s.phase == name), key=lambda s: s.order)
+
+    @property
+    def empty(self):
+        return not self.steps
+
+
+def _unquote(identifier):
+    identifier = identifier.strip()
+    if identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier
+
+
+def _split_identifiers(text):
+    return [_unquote(part) for part in text.split(",")]
+
+
+def normalize_type(sql_type):
+    return sql_type.replace('"', "").strip().lower()
+
+
+def normalize_default(expression):
+    """Reduce a default expression to a comparable form.
+
+    pg_get_expr() adds casts ('active'::text) and spells some defaults
+    differently from Prisma (now() vs CURRENT_TIMESTAMP, '{}' vs ARRAY[]).
+    """
+    if expression is None:
+        return None
+    value = expression.strip()
+    previous = None
+    while previous != value:
+        previous = value
+        value = re.sub(r"::[\w\s\"\[\]()]+$", "", value).strip()
+        if value.startswith("(") and value.endswith(")"):
+            value = value[1:-1].strip()
+    value = value.lower()
+    if value in ("now()", "current_timestamp", "current_timestamp(3)"):
+        return "current_timestamp"
+    if value in ("array[]", "'{}'"):
+        return "'{}'"
+    return value
+
+
+def _column_definition(column, for_new_table, table_is_empty=True):
+    """Column DDL that never forces a table rewrite."""
+    if column.serial:
+        return f"{quote(column.name)} SERIAL NOT NULL"
+    parts = [quote(column.name), column.type]
+    default = column.default
+    if default is None and column.updated_at:
+        default = "CURRENT_TIMESTAMP"
+    if column.not_null and (for_new_table or default is not None or table_is_empty):
+        parts.append("NOT NULL")
+    if default is not None:
+        parts.append(f"DEFAULT {default}")
+    return " ".join(parts)
+
+
+def _live_foreign_keys(table_info):
+    keys = []
+    for constraint in table_info.constraints:
+        if constraint.type != "f":
+            continue
+        match = FOREIGN_KEY_RE.search(constraint.definition)
+        if match:
+            keys.append((
+                _split_identifiers(match.group(1)),
+                _unquote(match.group(2).split(".")[-1]),
+                _split_identifiers(match.group(3)),
+            ))
+    return keys
+
+
+def _index_satisfied(spec, live_indexes):
+    wanted = list(spec.columns)
+    for index in live_indexes:
+        if not index.valid:
+            continue
+        columns = [_unquote(c) for c in index.columns]
+        if spec.unique:
+            # Any unique index on the same column set enforces the same rule
+            if index.unique and sorted(columns) == sorted(wanted):
+                return True
+        elif columns[:len(wanted)] == wanted:
+            return True
+    return False
+
+
+def _enum_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _plan_enums(plan, spec, live_enums):
+    for name, enum in spec.enums.items():
+        live = live_enums.get(name)
+        if live is None:
+            values = ", ".join(_enum_literal(v) for v in enum.values)
+            plan.add(PHASE_TRANSACTION, None, f"Crear enum {name}",
+                     f"CREATE TYPE {quote(name)} AS ENUM ({values});", ORDER_TYPE)
+            continue
+        for position, value in enumerate(enum.values):
+            if value in live:
+                continue
+            following = next((v for v in enum.values[position + 1:] if v in live), None)
+            placement = f" BEFORE {_enum_literal(following)}" if following else ""
+            plan.add(PHASE_PRE, None, f"Agregar '{value}' al enum {name}",
+                     f"ALTER TYPE {quote(name)} ADD VALUE IF NOT EXISTS {_enum_literal(value)}{placement};")
+            live = live + [value]
+        extra = [v for v in live_enums[name] if v not in enum.values]
+        if extra:
+            plan.warn(None, f"El enum {name} tiene valores fuera del esquema: {', '.join(extra)}")
+
+
+def _plan_new_table(plan, table):
+    columns = [_column_definition(c, for_new_table=True) for c in table.columns]
+    if table.primary_key:
+        columns.append(f"CONSTRAINT {quote(table.name + '_pkey')} PRIMARY KEY ({quote_list(table.primary_key)})")
+    body = ",\n    ".join(columns)
+    plan.add(PHASE_TRANSACTION, table.name, f"Crear tabla {table.name}",
+             f"CREATE TABLE {quote(table.name)} (\n    {body}\n);", ORDER_TABLE)
+    # The table is empty and invisible until commit: plain builds are instant
+    for index in table.indexes:
+        unique = "UNIQUE " if index.unique else ""
+        plan.add(PHASE_TRANSACTION, table.name, f"Crear índice {index.name}",
+                 f"CREATE {unique}INDEX {quote(index.name)} ON {quote(table.name)}({quote_list(index.columns)});",
+                 ORDER_INDEX)
+
+
+def _constraint_name(*parts):
+    return "_".join(parts)[:63]
+
+
+def _plan_not_null(plan, table, column, current, backfill):
+    fill = column.default or ("CURRENT_TIMESTAMP" if column.updated_at else None)
+    if not backfill or fill is None:
+        hint = " (usa --backfill)" if fill else ""
+        plan.warn(table.name, f"{column.name} admite NULL pero el esquema lo prohíbe{hint}")
+        return
+
+    name = quote(table.name)
+    col = quote(column.name)
+    check = quote(_constraint_name(table.name, column.name, "not_null"))
+    if current.default is None and column.default is None:
+        # New rows must stop arriving as NULL before the check is validated
+        plan.add(PHASE_TRANSACTION, table.name, f"Default de {table.name}.{column.name} → {fill}",
+                 f"ALTER TABLE {name} ALTER COLUMN {col} SET DEFAULT {fill};", ORDER_ALTER)
+    plan.add(PHASE_ONLINE, table.name, f"Rellenar NULL en {table.name}.{column.name} por lotes",
+             None, ONLINE_BACKFILL, blocking=False, kind=STEP_BACKFILL, column=column.name, fill=fill)
+    plan.add(PHASE_ONLINE, table.name, f"CHECK NOT VALID en {table.name}.{column.name}",
+             f"ALTER TABLE {name} ADD CONSTRAINT {check} CHECK ({col} IS NOT NULL) NOT VALID;", ONLINE_CHECK)
+    plan.add(PHASE_ONLINE, table.name, f"Validar CHECK de {table.name}.{column.name}",
+             f"ALTER TABLE {name} VALIDATE CONSTRAINT {check};", ONLINE_CHECK_VALIDATE, blocking=False)
+    plan.add(PHASE_ONLINE, table.name, f"NOT NULL en {table.name}.{column.name}",
+             f"ALTER TABLE {name} ALTER COLUMN {col} SET NOT NULL;", ONLINE_SET_NOT_NULL)
+    plan.add(PHASE_ONLINE, table.name, f"Quitar CHECK temporal de {table.name}.{column.name}",
+             f"ALTER TABLE {name} DROP CONSTRAINT {check};", ONLINE_DROP_CHECK)
+
+
+def _plan_existing_table(plan, table, live, backfill=False, empty=False):
+    for column in table.columns:
+        current = live.column(column.name)
+        if current is None:
+            if column.serial:
+                plan.warn(table.name, f"Falta la columna autoincremental {column.name}; agrégala manualmente")
+                continue
+            definition = _column_definition(column, for_new_table=False, table_is_empty=empty)
+            plan.add(PHASE_TRANSACTION, table.name, f"Agregar columna {table.name}.{column.name}",
+                     f"ALTER TABLE {quote(table.name)} ADD COLUMN IF NOT EXISTS {definition};", ORDER_COLUMN)
+            if column.not_null and "NOT NULL" not in definition:
+                plan.warn(table.name, f"{column.name} se agrega como NULL: rellénala y luego aplica NOT NULL")
+            continue
+
+        if normalize_type(current.type) != normalize_type(column.type):
+            plan.warn(table.name, f"{column.name} es {current.type}, el esquema espera {column.type} (no se cambia)")
+            continue
+
+        if current.not_null and not column.not_null:
+            plan.add(PHASE_TRANSACTION, table.name, f"Permitir NULL en {table.name}.{column.name}",
+                     f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} DROP NOT NULL;", ORDER_ALTER)
+        elif column.not_null and not current.not_null:
+            _plan_not_null(plan, table, column, current, backfill)
+
+        if column.serial or column.default is None:
+            continue
+        if normalize_default(current.default) != normalize_default(column.default):
+            plan.add(PHASE_TRANSACTION, table.name, f"Default de {table.name}.{column.name} → {column.default}",
+                     f"ALTER TABLE {quote(table.name)} ALTER COLUMN {quote(column.name)} SET DEFAULT {column.default};",
+                     ORDER_ALTER)
+
+    if table.primary_key and not any(i.primary for i in live.indexes):
+        plan.warn(table.name, "No tiene PRIMARY KEY (agregarla bloquea la tabla; hazlo manualmente)")
+
+    for index in table.indexes:
+        if _index_satisfied(index, live.indexes):
+            continue
+        broken = live.index(index.name)
+        if broken is not None and not broken.valid:
+            plan.add(PHASE_ONLINE, table.name, f"Eliminar índice inválido {index.name}",
+                     f"DROP INDEX CONCURRENTLY IF EXISTS {quote(index.name)};", ONLINE_INDEX, blocking=False)
+        unique = "UNIQUE " if index.unique else ""
+        plan.add(PHASE_ONLINE, table.name, f"Crear índice {index.name} (concurrente)",
+                 f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {quote(index.name)} "
+                 f"ON {quote(table.name)}({quote_list(index.columns)});",
+                 ONLINE_INDEX, blocking=False, index=index.name)
+
+
+def _plan_foreign_keys(plan, table, live, available_tables):
+    live_keys = _live_foreign_keys(live) if live else []
+    for key in table.foreign_keys:
+        if any(cols == key.columns and ref == key.ref_table for cols, ref, _ in live_keys):
+            continue
+        if key.ref_table not in available_tables:
+            plan.warn(table.name, f"{key.name} omitida: la tabla {key.ref_table} no existe")
+            continue
+        if live is None:
+            plan.add(PHASE_TRANSACTION, table.name, f"Crear llave foránea {key.name}",
+                     f"ALTER TABLE {quote(table.name)} ADD CONSTRAINT {quote(key.name)} {key.definition()};",
+                     ORDER_FOREIGN_KEY)
+            continue
+        plan.add(PHASE_TRANSACTION, table.name, f"Crear llave foránea {key.name} (NOT VALID)",
+                 f"ALTER TABLE {quote(table.name)} ADD CONSTRAINT {quote(key.name)} {key.definition()} NOT VALID;",
+                 ORDER_FOREIGN_KEY)
+        plan.add(PHASE_ONLINE, table.name, f"Validar llave foránea {key.name}",
+                 f"ALTER TABLE {quote(table.name)} VALIDATE CONSTRAINT {quote(key.name)};",
+                 ONLINE_VALIDATE, blocking=False)
+
+
+def build_plan(spec, live_tables, live_enums, only=None, backfill=False, empty=()):
+    """Compare the desired schema with the introspected catalog.
+
+    ``empty`` names the existing tables known to hold no rows: only those get
+    a NOT NULL column without a default in one step.
+    """
+    plan = Plan()
+    wanted = [t for name, t in spec.tables.items() if not only or name in only]
+    if only:
+        unknown = sorted(set(only) - set(spec.tables))
+        for name in unknown:
+            plan.warn(name, "No está definida en schema.prisma")
+
+    _plan_enums(plan, spec, live_enums)
+
+    available = set(live_tables) | {t.name for t in wanted}
+    for table in wanted:
+        live = live_tables.get(table.name)
+        if live is None:
+            _plan_new_table(plan, table)
+        else:
+            _plan_existing_table(plan, table, live, backfill, table.name in empty)
+        _plan_foreign_keys(plan, table, live, available)
+
+    return plan
+
+
+def snapshot(cursor, schema="public"):
+    """Read tables and enums in one transaction so the diff sees a single state."""
+    return introspect(cursor, schema=schema), introspect_enums(cursor, schema=schema)
+
+
+def _tables_adding_required_columns(spec, live_tables, only=None):
+    """Existing tables that would get a NOT NULL column without a default."""
+    return [
+        name for name, table in spec.tables.items()
+        if name in live_tables and (not only or name in only)
+        and any(
+            c.not_null and c.default is None and not c.serial and not c.updated_at
+            and live_tables[name].column(c.name) is None
+            for c in table.columns
+        )
+    ]
+
+
+def plan_migration(only=None, schema_path=None, backfill=False):
+    spec = load_schema(schema_path) if schema_path else load_schema()
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+        live_tables, live_enums = snapshot(cursor)
+        empty = empty_tables(cursor, _tables_adding_required_columns(spec, live_tables, only))
+        cursor.close()
+    return build_plan(spec, live_tables, live_enums, only, backfill, empty)
+
+
+def _set_lock_timeout(cursor, step, options):
+    milliseconds = options.lock_timeout_ms if step.blocking else 0
+    cursor.execute("SET lock_timeout = %s;", (milliseconds,))
+
+
+def _with_lock_retry(run, label, options, report):
+    """Call ``run()``, retrying when a blocking statement hits lock_timeout."""
+    return with_lock_retry(run, label, options.attempts, options.backoff, report)
+
+
+def _format_progress(row):
+    phase, blocks_done, blocks_total, tuples_done, tuples_total = row
+    if blocks_total:
+        return f"{phase}: {100 * blocks_done / blocks_total:.0f}% ({blocks_done}/{blocks_total} bloques)"
+    if tuples_total:
+        return f"{phase}: {100 * tuples_done / tuples_total:.0f}% ({tuples_done}/{tuples_total} filas)"
+    return phase
+
+
+def _execute_with_progress(conn, step, options, report):
+    """Run a CREATE INDEX CONCURRENTLY and poll pg_stat_progress_create_index."""
+    pid = conn.get_backend_pid()
+    failure = []
+
+    def build():
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(step.sql)
+        except BaseException as e:
+            failure.append(e)
+
+    worker = threading.Thread(target=build, daemon=True)
+    worker.start()
+    monitor = None
+    try:
+        while True:
+            worker.join(options.progress_interval)
+            if not worker.is_alive():
+                break
+            if monitor is None:
+                # Separate connection: the pool may have a single slot
+                monitor = connect(get_settings().database_url, autocommit=True)
+            with monitor.cursor() as cursor:
+                cursor.execute(PROGRESS_SQL, (pid,))
+                row = cursor.fetchone()
+            if row:
+                report(f"{step.index}: {_format_progress(row)}")
+    finally:
+        if monitor is not None:
+            monitor.close()
+    if failure:
+        raise failure[0]
+
+
+def _drop_invalid_index(cursor, name):
+    cursor.execute("""
+        SELECT 1 FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE i.relname = %s AND NOT x.indisvalid;
+    """, (name,))
+    if cursor.fetchone():
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(name)};")
+
+
+def _backfill(conn, step, options, report):
+    """Fill NULLs through the resumable backfill runner, one commit per batch.
+
+    Runs on the phase's own connection: borrowing a second pooled one would
+    wait forever with DB_POOL_MAX=1.
+    """
+    column = quote(step.column)
+
+    def fill(cursor, rows):
+        cursor.execute(
+            f"UPDATE {quote(step.table)} SET {column} = {step.fill} WHERE id = ANY(%s) AND {column} IS NULL;",
+            ([row[0] for row in rows],),
+        )
+        return cursor.rowcount
+
+    job = Backfill(
+        name=f"migrate:{step.table}.{step.column}",
+        table=step.table,
+        columns=(),
+        where=f"{column} IS NULL",
+        apply=fill,
+        batch_size=options.batch_size,
+    )
+    progress = run_backfill(
+        job,
+        conn=conn,
+        on_batch=lambda p: report(f"{step.table}.{step.column}: {p.percent:.0f}% ({p.rows} filas actualizadas)"),
+    )
+    return progress.rows
+
+
+def _build_partitioned_index(conn, step, options, report):
+    """Build an index on a partitioned table without blocking writes.
+
+    CONCURRENTLY is not allowed on the parent: its index is created ON ONLY
+    (empty and invalid), each partition's is built concurrently and then
+    attached; the parent's turns valid once every partition has one.
+    """
+    target = f" ON {quote(step.table)}("
+    suffix = step.index[len(step.table):] if step.index.startswith(step.table + "_") else "_" + step.index
+    with conn.cursor() as cursor:
+        cursor.execute(step.sql.replace(" CONCURRENTLY", "", 1).replace(target, f" ON ONLY {quote(step.table)}(", 1))
+        for partition in list_partitions(cursor, step.table):
+            if partition.detach_pending:
+                continue
+            name = (partition.name + suffix)[:63]
+            _drop_invalid_index(cursor, name)
+            sql = step.sql.replace(quote(step.index), quote(name), 1).replace(target, f" ON {quote(partition.name)}(", 1)
+            _execute_with_progress(conn, replace(step, sql=sql, index=name), options, report)
+            cursor.execute(f"ALTER INDEX {quote(step.index)} ATTACH PARTITION {quote(name)};")
+
+
+def _run_autocommit_step(conn, step, options, report):
+    with conn.cursor() as cursor:
+        _set_lock_timeout(cursor, step, options)
+        if step.kind == STEP_BACKFILL:
+            _backfill(conn, step, options, report)
+        elif step.index and is_partitioned(cursor, step.table):
+            _build_partitioned_index(conn, step, options, report)
+        elif step.index:
+            _drop_invalid_index(cursor, step.index)
+            _execute_with_progress(conn, step, options, report)
+        else:
+            cursor.execute(step.sql)
+
+
+def _run_autocommit_phase(steps, options, on_step, report):
+    with connection(autocommit=True) as conn:
+        # Concurrent builds and backfills on big tables outlive the default timeout
+        with statement_timeout(conn, 0):
+            try:
+                for step in steps:
+                    on_step(step)
+                    _with_lock_retry(
+                        lambda: _run_autocommit_step(conn, step, options, report),
+                        step.description, options, report,
+                    )
+            finally:
+                if not conn.closed:
+                    with conn.cursor() as cursor:
+                        cursor.execute("RESET lock_timeout;")
+
+
+def _run_transaction(steps, options, on_step):
+    with connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SET LOCAL lock_timeout = %s;", (options.lock_timeout_ms,))
+        for step in steps:
+            on_step(step)
+            cursor.execute(step.sql)
+        cursor.close()
+
+
+def apply_plan(plan, on_step=None, on_progress=None, options=None):
+    """Run the plan phase by phase; the transactional phase is all or nothing.
+
+    A lock timeout inside the transaction rolls it back and the whole
+    transaction is retried, so a partial schema is never committed.
+    """
+    on_step = on_step or (lambda step: None)
+    report = on_progress or (lambda message: None)
+    options = options or RunOptions()
+
+    pre = plan.phase(PHASE_PRE)
+    if pre:
+        _run_autocommit_phase(pre, options, on_step, report)
+
+    transactional = plan.phase(PHASE_TRANSACTION)
+    if transactional:
+        _with_lock_retry(
+            lambda: _run_transaction(transactional, options, on_step),
+            "transacción", options, report,
+        )
+
+    online = plan.phase(PHASE_ONLINE)
+    if online:
+        _run_autocommit_phase(online, options, on_step, report)
@@ -0,0 +1,346 @@
+"""Monthly range partitions: online conversion, creation ahead and retention.
+
+Converting a plain table runs in steps that can each be re-run:
+
+1. a partitioned copy (``<table>_partitioned``) is created empty, with the
+   same columns, defaults (so it shares the id sequence), indexes and
+   foreign keys, plus the monthly partitions the existing rows need;
+2. a row trigger on the original mirrors every INSERT, UPDATE and DELETE
+   into the copy from then on;
+3. existing rows are copied in keyset batches through the resumable
+   backfill runner (``ON CONFLICT DO NOTHING`` skips rows the trigger
+   already wrote; the batch holds them FOR UPDATE so no write is lost);
+4. one short transaction under ``lock_timeout`` swaps the names. The old
+   table stays behind as ``<table>_retired`` until it is dropped.
+
+A partition's primary key must contain the partition column, so the
+copy's key is ``(id, <column>)``. New partitions are created standalone
+and then ATTACHed, which only takes SHARE UPDATE EXCLUSIVE on the parent;
+retention DETACHes ``CONCURRENTLY``. There is no default partition: a row
+for a month with no partition fails, so partitions are kept created
+several months ahead.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from .backfill import Backfill
+from .catalog import introspect
+from .prisma import quote, quote_list
+
+SHADOW_SUFFIX = "_partitioned"
+RETIRED_SUFFIX = "_retired"
+
+BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+INDEX_DEF_RE = re.compile(r"^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON )(?:ONLY )?(\S+)( USING .*)$")
+
+
+class PartitionError(Exception):
+    """Raised when a table cannot be converted or swapped safely."""
+
+
+PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid),
+           GREATEST(c.reltuples, 0)::bigint, COALESCE(s.n_live_tup, 0),
+           pg_total_relation_size(c.oid), i.inhdetachpending
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE i.inhparent = to_regclass(%s)
+    ORDER BY c.relname;
+"""
+
+
+@dataclass
+class Partition:
+    name: str
+    lower: date
+    upper: date
+    rows: int
+    bytes: int
+    detach_pending: bool = False
+
+
+def month_floor(moment):
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def months_between(first, last):
+    """Every month start from the month of ``first`` through the month of ``last``."""
+    month, end = month_floor(first), month_floor(last)
+    while month <= end:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def shadow_name(table):
+    return table + SHADOW_SUFFIX
+
+
+def retired_name(table):
+    return table + RETIRED_SUFFIX
+
+
+def _new_name(name, suffix):
+    return name[:63 - len(suffix)] + suffix
+
+
+def _parse_bound(text):
+    return datetime.fromisoformat(text).date()
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s);", (quote(table),))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (quote(table),))
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """Partitions of ``table`` ordered by name (and so by month)."""
+    cursor.execute(PARTITIONS_SQL, (quote(table),))
+    partitions = []
+    for name, bound, reltuples, live, size, pending in cursor.fetchall():
+        match = BOUND_RE.search(bound or "")
+        lower, upper = (_parse_bound(match.group(1)), _parse_bound(match.group(2))) if match else (None, None)
+        partitions.append(Partition(name, lower, upper, live or reltuples, size, pending))
+    return partitions
+
+
+def create_partition(cursor, parent, month, prefix=None):
+    """Create one month's partition empty and ATTACH it (no ACCESS EXCLUSIVE on the parent).
+
+    ATTACH clones the parent's indexes and foreign keys onto the new table.
+    Run it inside a transaction so a failed attach leaves nothing behind.
+    """
+    name = partition_name(prefix or parent, month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {quote(name)} "
+        f"(LIKE {quote(parent)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE);"
+    )
+    cursor.execute(
+        f"ALTER TABLE {quote(parent)} ATTACH PARTITION {quote(name)} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}');"
+    )
+    return name
+
+
+def missing_months(partitions, first, last):
+    covered = [(p.lower, p.upper) for p in partitions if p.lower and not p.detach_pending]
+    return [
+        month for month in months_between(first, last)
+        if not any(lower <= month < upper for lower, upper in covered)
+    ]
+
+
+def ensure_partitions(cursor, parent, first, last, prefix=None):
+    """Create every missing monthly partition between ``first`` and ``last``."""
+    months = missing_months(list_partitions(cursor, parent), first, last)
+    return [create_partition(cursor, parent, month, prefix) for month in months]
+
+
+def expired_partitions(partitions, keep_months, today=None):
+    """Partitions whose whole range is older than the last ``keep_months`` months."""
+    cutoff = add_months(month_floor(today or date.today()), -keep_months)
+    return [p for p in partitions if p.upper and p.upper <= cutoff]
+
+
+def detach_partition(cursor, parent, partition):
+    """DETACH ... CONCURRENTLY (autocommit only); finishes an interrupted detach.
+
+    The pending flag is read again on every call, not taken from
+    ``partition``: a retry after a lock timeout in the second transaction
+    of CONCURRENTLY has to FINALIZE.
+    """
+    cursor.execute(
+        "SELECT inhdetachpending FROM pg_inherits WHERE inhparent = to_regclass(%s) AND inhrelid = to_regclass(%s);",
+        (quote(parent), quote(partition.name)),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return  # already detached
+    mode = "FINALIZE" if row[0] else "CONCURRENTLY"
+    cursor.execute(f"ALTER TABLE {quote(parent)} DETACH PARTITION {quote(partition.name)} {mode};")
+
+
+def archive_partition(cursor, partition, schema):
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {quote(schema)};")
+    cursor.execute(f"ALTER TABLE {quote(partition.name)} SET SCHEMA {quote(schema)};")
+
+
+# -- conversion ---------------------------------------------------------------
+
+def _copy_index(definition, name, table):
+    match = INDEX_DEF_RE.match(definition)
+    if not match:
+        return None
+    return f"{match.group(1)}{quote(name)}{match.group(3)}{quote(table)}{match.group(5)};"
+
+
+def create_shadow(cursor, table, column):
+    """Create the empty partitioned copy of ``table``; return warnings for indexes not copied."""
+    info = introspect(cursor, [table])[table]
+    shadow = shadow_name(table)
+    primary = next((i for i in info.indexes if i.primary), None)
+    if primary is None:
+        raise PartitionError(f"{table} no tiene PRIMARY KEY")
+
+    cursor.execute(
+        f"CREATE TABLE {quote(shadow)} (LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+        f"INCLUDING STORAGE INCLUDING COMMENTS) PARTITION BY RANGE ({quote(column)});"
+    )
+    key = list(primary.columns) + ([] if column in primary.columns else [column])
+    cursor.execute(
+        f"ALTER TABLE {quote(shadow)} ADD CONSTRAINT {quote(shadow + '_pkey')} PRIMARY KEY ({quote_list(key)});"
+    )
+
+    warnings = []
+    for index in info.indexes:
+        if index.primary:
+            continue
+        if index.unique and column not in index.columns:
+            warnings.append(f"{index.name}: un índice único debe incluir {column}; no se copia")
+            continue
+        statement = _copy_index(index.definition, _new_name(index.name, "_new"), shadow)
+        if statement is None:
+            warnings.append(f"{index.name}: definición no reconocida; no se copia")
+            continue
+        cursor.execute(statement)
+
+    for constraint in info.constraints:
+        if constraint.type == "f":
+            cursor.execute(
+                f"ALTER TABLE {quote(shadow)} ADD CONSTRAINT {quote(constraint.name)} {constraint.definition};"
+            )
+    return warnings
+
+
+def _trigger_name(table):
+    return f"{table}_partition_sync"
+
+
+def install_sync_trigger(cursor, table, key):
+    """Mirror every row change on ``table`` into its partitioned copy."""
+    shadow = shadow_name(table)
+    columns = [c.name for c in introspect(cursor, [table])[table].columns]
+    values = ", ".join(f"NEW.{quote(c)}" for c in columns)
+    match = " AND ".join(f"{quote(c)} = OLD.{quote(c)}" for c in key)
+    trigger = _trigger_name(table)
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {quote(trigger)}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM {quote(shadow)} WHERE {match};
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO {quote(shadow)} ({quote_list(columns)}) VALUES ({values}) ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+    """)
+    cursor.execute(f"DROP TRIGGER IF EXISTS {quote(trigger)} ON {quote(table)};")
+    cursor.execute(
+        f"CREATE TRIGGER {quote(trigger)} AFTER INSERT OR UPDATE OR DELETE ON {quote(table)} "
+        f"FOR EACH ROW EXECUTE FUNCTION {quote(trigger)}();"
+    )
+
+
+def copy_job(cursor, table, batch_size):
+    """Backfill job that copies ``table`` into its partitioned copy by id."""
+    columns = quote_list(c.name for c in introspect(cursor, [table])[table].columns)
+    insert = (
+        f"INSERT INTO {quote(shadow_name(table))} ({columns}) "
+        f"SELECT {columns} FROM {quote(table)} WHERE id = ANY(%s) ON CONFLICT DO NOTHING;"
+    )
+
+    def copy(cursor, rows):
+        cursor.execute(insert, ([row[0] for row in rows],))
+        return cursor.rowcount
+
+    return Backfill(name=f"partition:{table}", table=table, columns=(), apply=copy, batch_size=batch_size)
+
+
+def compare_counts(cursor, table, after=None):
+    """Row counts of the table and its copy and the table's MAX(id), from one snapshot.
+
+    With ``after`` only rows with a higher id are counted: a primary-key
+    range read instead of two full scans.
+    """
+    shadow = shadow_name(table)
+    where = "" if after is None else " WHERE id > %(after)s"
+    cursor.execute(
+        f"SELECT (SELECT COUNT(*) FROM {quote(table)}{where}), (SELECT COUNT(*) FROM {quote(shadow)}{where}), "
+        f"(SELECT MAX(id) FROM {quote(table)});",
+        {"after": after},
+    )
+    return cursor.fetchone()
+
+
+def _index_renames(cursor, table):
+    """{original index: its counterpart on the copy} for every index that was copied."""
+    shadow = shadow_name(table)
+    live = introspect(cursor, [table, shadow])
+    copied = {index.name for index in live[shadow].indexes}
+    renames = {}
+    for index in live[table].indexes:
+        new = shadow + "_pkey" if index.primary else _new_name(index.name, "_new")
+        if new in copied:
+            renames[index.name] = new
+    return renames
+
+
+def swap(cursor, table, mark):
+    """Put the partitioned copy in place of ``table``. Runs in the caller's transaction.
+
+    ``mark`` is the MAX(id) returned by the full ``compare_counts`` done
+    before: under the lock only the rows written since are counted.
+    """
+    shadow, retired = shadow_name(table), retired_name(table)
+    cursor.execute(f"LOCK TABLE {quote(table)}, {quote(shadow)} IN ACCESS EXCLUSIVE MODE;")
+    # Rows up to the mark were counted outside the lock and the sync trigger
+    # mirrors every change to them; the newer ones are an index range read
+    original, copied, _ = compare_counts(cursor, table, after=mark or 0)
+    if original != copied:
+        raise PartitionError(
+            f"{table} tiene {original:,} filas con id > {mark or 0} y {shadow} {copied:,}; vuelve a ejecutar la copia"
+        )
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id');", (quote(table),))
+    sequence = cursor.fetchone()[0]
+
+    renames = _index_renames(cursor, table)
+
+    trigger = _trigger_name(table)
+    cursor.execute(f"DROP TRIGGER IF EXISTS {quote(trigger)} ON {quote(table)};")
+    cursor.execute(f"DROP FUNCTION IF EXISTS {quote(trigger)}();")
+
+    # The retired table keeps its rows but nothing else: no foreign keys
+    # holding back deletes in members, no claim on the sequence
+    info = introspect(cursor, [table])[table]
+    for constraint in info.constraints:
+        if constraint.type == "f":
+            cursor.execute(f"ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(constraint.name)};")
+    cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id DROP DEFAULT;")
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(retired)};")
+    for old in renames:
+        cursor.execute(f"ALTER INDEX {quote(old)} RENAME TO {quote(_new_name(old, RETIRED_SUFFIX))};")
+
+    cursor.execute(f"ALTER TABLE {quote(shadow)} RENAME TO {quote(table)};")
+    for old, new in renames.items():
+        cursor.execute(f"ALTER INDEX {quote(new)} RENAME TO {quote(old)};")
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id;")
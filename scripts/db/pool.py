@@ -0,0 +1,270 @@
+"""Shared psycopg2 connection pool with timeout and retry policies.
+
+One pool per process: scripts run back to back (see ``run-scripts.py``)
+reuse warm connections instead of paying the TLS handshake each time.
+"""
+
+import atexit
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from .config import load_settings
+
+# Errors worth retrying: dropped connections, Neon compute waking up,
+# serialization failures, deadlocks and lock timeouts
+TRANSIENT_ERRORS = (
+    psycopg2.OperationalError,
+    psycopg2.InterfaceError,
+    psycopg2.errors.SerializationFailure,
+    psycopg2.errors.DeadlockDetected,
+)
+
+# Retrying a statement that hit statement_timeout only repeats the slow query
+NON_RETRYABLE_ERRORS = (psycopg2.errors.QueryCanceled,)
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+_settings = None
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Connection that remembers whether its session defaults are applied."""
+
+    session_configured = False
+
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_ERRORS) and not isinstance(error, NON_RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempt, base):
+    """Exponential backoff with jitter for the given 1-based attempt."""
+    return base * (2 ** (attempt - 1)) * (1 + random.random() / 4)
+
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        _settings = load_settings()
+    return _settings
+
+
+def _get_slots():
+    """The DB_POOL_MAX cap, shared by this pool and the asyncpg pools of ``aio.py``."""
+    global _slots
+    with _lock:
+        if _slots is None:
+            # psycopg2 raises PoolError when exhausted; make callers wait instead.
+            # Created once: slots held by an asyncpg pool outlive close_pool()
+            _slots = threading.BoundedSemaphore(get_settings().pool_max)
+        return _slots
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    _get_slots()
+    with _lock:
+        if _pool is None or _pool.closed:
+            settings = get_settings()
+            _pool = ThreadedConnectionPool(
+                settings.pool_min,
+                settings.pool_max,
+                settings.database_url,
+                connect_timeout=settings.connect_timeout,
+                application_name=settings.application_name,
+                connection_factory=PooledConnection,
+            )
+        return _pool
+
+
+def close_pool():
+    """Close every pooled connection. Registered to run at exit."""
+    global _pool
+    with _lock:
+        if _pool is not None and not _pool.closed:
+            _pool.closeall()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
+def reserve_slots(wanted):
+    """Take up to ``wanted`` slots of the cap for connections opened outside this pool.
+
+    Waits for the first slot like ``connection()``; the others are taken
+    only if free. With every slot free the pool's idle connections are
+    closed; otherwise up to DB_POOL_MIN of them may stay open, so that
+    many slots are handed back. Returns how many were kept (at least one);
+    give them back with ``release_slots``.
+    """
+    settings = get_settings()
+    slots = _get_slots()
+    slots.acquire()
+    taken = 1
+    while taken < wanted and slots.acquire(blocking=False):
+        taken += 1
+    if taken == settings.pool_max:
+        close_pool()
+    elif _pool is not None and not _pool.closed:
+        spare = min(settings.pool_min, taken - 1)
+        release_slots(spare)
+        taken -= spare
+    return taken
+
+
+def release_slots(count):
+    slots = _get_slots()
+    for _ in range(count):
+        slots.release()
+
+
+def configure_session(conn, settings=None):
+    """Apply statement_timeout once per physical connection."""
+    if getattr(conn, "session_configured", False):
+        return
+    settings = settings or get_settings()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s;", (settings.statement_timeout_ms,))
+    conn.autocommit = autocommit
+    conn.session_configured = True
+
+
+@contextmanager
+def statement_timeout(conn, milliseconds):
+    """Temporarily override statement_timeout (0 disables it) for this session."""
+    with conn.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s;", (milliseconds,))
+    try:
+        yield conn
+    finally:
+        failed = not conn.closed and (
+            conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR
+        )
+        if failed:
+            # A SET here would raise and hide the real error. The rollback
+            # undoes it if it was part of this transaction; if it was
+            # committed earlier, the next checkout applies the default again
+            conn.session_configured = False
+        elif not conn.closed:
+            with conn.cursor() as cursor:
+                cursor.execute("SET statement_timeout = %s;", (get_settings().statement_timeout_ms,))
+
+
+def _checkout(pool, settings):
+    for attempt in range(1, settings.retry_attempts + 1):
+        conn = None
+        try:
+            conn = pool.getconn()
+            configure_session(conn, settings)
+            return conn
+        except TRANSIENT_ERRORS:
+            if conn is not None:
+                pool.putconn(conn, close=True)
+            if attempt == settings.retry_attempts:
+                raise
+            time.sleep(backoff_delay(attempt, settings.retry_backoff))
+
+
+@contextmanager
+def connection(autocommit=False):
+    """Borrow a pooled connection for the duration of the block.
+
+    The transaction is committed when the block exits cleanly and rolled
+    back on error; broken connections are discarded instead of returned.
+    """
+    settings = get_settings()
+    pool = get_pool()
+    _slots.acquire()
+    conn = None
+    discard = False
+    try:
+        conn = _checkout(pool, settings)
+        conn.autocommit = autocommit
+        try:
+            yield conn
+            if not conn.closed and not conn.autocommit:
+                conn.commit()
+        except BaseException as e:
+            # A server-side error (lock timeout, constraint...) leaves the
+            # connection usable; only drop it when the link itself is gone
+            discard = bool(conn.closed) or isinstance(e, psycopg2.InterfaceError)
+            if not conn.closed and not conn.autocommit:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            raise
+    finally:
+        if conn is not None:
+            if not conn.closed and not discard:
+                conn.autocommit = False
+            pool.putconn(conn, close=discard or conn.closed)
+        _slots.release()
+
+
+def run_with_retry(work, autocommit=False, attempts=None):
+    """Run ``work(conn)`` on a pooled connection, retrying transient errors.
+
+    ``work`` must be safe to repeat: each attempt runs in a new transaction.
+    """
+    settings = get_settings()
+    attempts = attempts or settings.retry_attempts
+    for attempt in range(1, attempts + 1):
+        try:
+            with connection(autocommit=autocommit) as conn:
+                return work(conn)
+        except psycopg2.Error as e:
+            if not is_transient(e) or attempt == attempts:
+                raise
+            time.sleep(backoff_delay(attempt, settings.retry_backoff))
+
+
+def with_lock_retry(run, label, attempts, backoff, report=None):
+    """Call ``run()``, retrying with backoff when a statement hits lock_timeout.
+
+    ``run`` must roll back whatever it did before raising (one transaction
+    or a single autocommit statement per call).
+    """
+    report = report or (lambda message: None)
+    for attempt in range(1, attempts + 1):
+        try:
+            return run()
+        except psycopg2.errors.LockNotAvailable:
+            if attempt == attempts:
+                raise
+            delay = backoff_delay(attempt, backoff)
+            report(f"lock_timeout en '{label}', reintento {attempt}/{attempts - 1} en {delay:.1f}s")
+            time.sleep(delay)
+
+
+def connect(dsn, autocommit=False):
+    """Open a standalone connection outside the pool with the same session policy."""
+    settings = get_settings()
+    for attempt in range(1, settings.retry_attempts + 1):
+        try:
+            conn = psycopg2.connect(
+                dsn,
+                connect_timeout=settings.connect_timeout,
+                application_name=settings.application_name,
+                connection_factory=PooledConnection,
+            )
+            break
+        except psycopg2.OperationalError:
+            if attempt == settings.retry_attempts:
+                raise
+            time.sleep(backoff_delay(attempt, settings.retry_backoff))
+    configure_session(conn, settings)
+    conn.autocommit = autocommit
+    return conn
@@ -0,0 +1,429 @@
+"""Minimal reader for prisma/schema.prisma.
+
+Turns models and enums into the tables, columns, keys and indexes Prisma
+would create, using Prisma's own naming (``<table>_pkey``,
+``<table>_<cols>_key``, ``<table>_<cols>_idx``, ``<table>_<cols>_fkey``).
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .config import PROJECT_ROOT
+
+SCHEMA_PATH = PROJECT_ROOT / "prisma" / "schema.prisma"
+
+SCALAR_TYPES = {
+    "Int": "integer",
+    "BigInt": "bigint",
+    "String": "text",
+    "Boolean": "boolean",
+    "Float": "double precision",
+    "Decimal": "numeric(65,30)",
+    "DateTime": "timestamp(3) without time zone",
+    "Json": "jsonb",
+    "Bytes": "bytea",
+}
+
+# @db.<Type>(args) native type attributes, as format_type() spells them
+NATIVE_TYPES = {
+    "Date": "date",
+    "Time": "time({}) without time zone",
+    "Timestamp": "timestamp({}) without time zone",
+    "Timestamptz": "timestamp({}) with time zone",
+    "Text": "text",
+    "VarChar": "character varying({})",
+    "Char": "character({})",
+    "Integer": "integer",
+    "SmallInt": "smallint",
+    "BigInt": "bigint",
+    "Real": "real",
+    "DoublePrecision": "double precision",
+    "Decimal": "numeric({})",
+    "Uuid": "uuid",
+    "Json": "json",
+    "JsonB": "jsonb",
+}
+
+REFERENTIAL_ACTIONS = {
+    "Cascade": "CASCADE",
+    "Restrict": "RESTRICT",
+    "NoAction": "NO ACTION",
+    "SetNull": "SET NULL",
+    "SetDefault": "SET DEFAULT",
+}
+
+BLOCK_RE = re.compile(r"^(model|enum)\s+(\w+)\s*\{\s*$")
+FIELD_RE = re.compile(r"^(\w+)\s+(\w+)(\[\])?(\?)?\s*(.*)$")
+
+
+class PrismaSchemaError(Exception):
+    """Raised when schema.prisma cannot be parsed."""
+
+
+@dataclass
+class ColumnSpec:
+    name: str
+    type: str
+    not_null: bool
+    default: str = None
+    serial: bool = False
+    updated_at: bool = False
+    field: str = None  # Prisma field name, the key Prisma uses in JSON
+
+
+@dataclass
+class ForeignKeySpec:
+    name: str
+    columns: list
+    ref_table: str
+    ref_columns: list
+    on_delete: str
+    on_update: str = "CASCADE"
+
+    def definition(self):
+        return (
+            f"FOREIGN KEY ({quote_list(self.columns)}) "
+            f"REFERENCES {quote(self.ref_table)}({quote_list(self.ref_columns)}) "
+            f"ON DELETE {self.on_delete} ON UPDATE {self.on_update}"
+        )
+
+
+@dataclass
+class IndexSpec:
+    name: str
+    columns: list
+    unique: bool
+
+
+@dataclass
+class TableSpec:
+    name: str
+    model: str
+    columns: list = field(default_factory=list)
+    primary_key: list = field(default_factory=list)
+    indexes: list = field(default_factory=list)
+    foreign_keys: list = field(default_factory=list)
+
+    def column(self, name):
+        return next((c for c in self.columns if c.name == name), None)
+
+
+@dataclass
+class EnumSpec:
+    name: str
+    values: list
+
+
+@dataclass
+class SchemaSpec:
+    tables: dict
+    enums: dict
+
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def quote_list(identifiers):
+    return ", ".join(quote(i) for i in identifiers)
+
+
+def _strip_comment(line):
+    in_string = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_string = not in_string
+        elif char == "/" and not in_string and line[i:i + 2] == "//":
+            return line[:i]
+    return line
+
+
+def _split_attributes(text):
+    """Split '@id @default(now()) @map("x")' into [(name, args or None)]."""
+    attributes = []
+    i = 0
+    while i < len(text):
+        if text[i] != "@":
+            i += 1
+            continue
+        match = re.match(r"@@?[\w.]+", text[i:])
+        name = match.group(0)
+        i += len(name)
+        args = None
+        if i < len(text) and text[i] == "(":
+            depth = 0
+            start = i
+            in_string = False
+            while i < len(text):
+                char = text[i]
+                if char == '"' and text[i - 1] != "\\":
+                    in_string = not in_string
+                elif not in_string and char in "([":
+                    depth += 1
+                elif not in_string and char in ")]":
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            args = text[start + 1:i]
+            i += 1
+        attributes.append((name, args))
+    return attributes
+
+
+def _split_args(args):
+    """Split top-level comma separated arguments, respecting brackets and strings."""
+    parts, depth, current, in_string = [], 0, "", False
+    for char in args or "":
+        if char == '"':
+            in_string = not in_string
+        if not in_string and char in "([":
+            depth += 1
+        elif not in_string and char in ")]":
+            depth -= 1
+        if char == "," and depth == 0 and not in_string:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _named_args(args):
+    """Return (positional, {name: value}) for an attribute's arguments."""
+    positional, named = [], {}
+    for part in _split_args(args):
+        match = re.match(r"^(\w+)\s*:\s*(.*)$", part, re.S)
+        if match:
+            named[match.group(1)] = match.group(2).strip()
+        else:
+            positional.append(part)
+    return positional, named
+
+
+def _list_value(value):
+    value = value.strip()
+    if value.startswith("[") and value.endswith("]"):
+        value = value[1:-1]
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _string_value(value):
+    value = value.strip()
+    if value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    return value
+
+
+def _sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def parse(path=SCHEMA_PATH):
+    """Parse schema.prisma into raw model/enum blocks."""
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except OSError as e:
+        raise PrismaSchemaError(f"No se pudo leer {path}: {e}")
+
+    models, enums = {}, {}
+    block = None
+    for number, raw in enumerate(text.splitlines(), 1):
+        line = _strip_comment(raw).strip()
+        if not line:
+            continue
+        if block is None:
+            match = BLOCK_RE.match(line)
+            if match:
+                kind, name = match.groups()
+                block = {"kind": kind, "name": name, "fields": [], "attributes": [], "values": []}
+            continue
+        if line == "}":
+            target = models if block["kind"] == "model" else enums
+            target[block["name"]] = block
+            block = None
+            continue
+        if line.startswith("@@"):
+            block["attributes"].extend(_split_attributes(line))
+        elif block["kind"] == "enum":
+            block["values"].append(line.split()[0])
+        else:
+            match = FIELD_RE.match(line)
+            if not match:
+                raise PrismaSchemaError(f"Línea {number} no reconocida: {raw.strip()}")
+            name, type_name, is_list, optional, rest = match.groups()
+            block["fields"].append({
+                "name": name,
+                "type": type_name,
+                "list": bool(is_list),
+                "optional": bool(optional),
+                "attributes": _split_attributes(rest),
+            })
+    if block is not None:
+        raise PrismaSchemaError(f"Bloque '{block['name']}' sin cerrar")
+    return models, enums
+
+
+def _db_name(attributes, default):
+    for name, args in attributes:
+        if name in ("@map", "@@map"):
+            positional, named = _named_args(args)
+            return _string_value(named.get("name", positional[0] if positional else default))
+    return default
+
+
+def _attribute(attributes, wanted):
+    return next((args for name, args in attributes if name == wanted), False)
+
+
+def _native_type(attributes):
+    for name, args in attributes:
+        if name.startswith("@db."):
+            native = name[len("@db."):]
+            if native not in NATIVE_TYPES:
+                raise PrismaSchemaError(f"Tipo nativo no soportado: {name}")
+            template = NATIVE_TYPES[native]
+            if "{}" not in template:
+                return template
+            if args is None:
+                # Prisma's defaults: timestamp(3), numeric(65,30), unbounded varchar
+                if native == "Decimal":
+                    args = "65,30"
+                elif native.startswith("Time"):
+                    args = "3"
+                else:
+                    return template.replace("({})", "")
+            return template.format(",".join(a.strip() for a in args.split(",")))
+    return None
+
+
+# Defaults Prisma Client fills in before the INSERT: the column has none
+CLIENT_DEFAULTS = ("uuid", "cuid", "nanoid", "ulid")
+
+
+def _default_sql(value, field, enum_names):
+    value = value.strip()
+    if value == "autoincrement()":
+        return None
+    if value.endswith(")") and value.split("(", 1)[0] in CLIENT_DEFAULTS:
+        return None
+    if value.startswith("dbgenerated(") and value.endswith(")"):
+        inner = value[len("dbgenerated("):-1].strip()
+        return _string_value(inner) if inner else None
+    if value == "now()":
+        return "CURRENT_TIMESTAMP"
+    if value.startswith("[") and value.endswith("]"):
+        items = _list_value(value)
+        element = SCALAR_TYPES.get(field["type"], quote(field["type"]))
+        if not items:
+            return f"ARRAY[]::{element}[]"
+        return "ARRAY[" + ", ".join(_default_sql(i, field, enum_names) for i in items) + "]"
+    if value.startswith('"'):
+        return _sql_literal(_string_value(value))
+    if field["type"] in enum_names:
+        return f"{_sql_literal(value)}::{quote(enum_names[field['type']])}"
+    return value
+
+
+def load_schema(path=SCHEMA_PATH):
+    """Return the desired database state described by schema.prisma."""
+    models, raw_enums = parse(path)
+
+    enum_names = {name: _db_name(block["attributes"], name) for name, block in raw_enums.items()}
+    enums = {
+        enum_names[name]: EnumSpec(enum_names[name], block["values"])
+        for name, block in raw_enums.items()
+    }
+    table_names = {name: _db_name(block["attributes"], name) for name, block in models.items()}
+
+    tables = {}
+    for model_name, block in models.items():
+        table = TableSpec(name=table_names[model_name], model=model_name)
+        columns_by_field = {}
+
+        for f in block["fields"]:
+            if f["type"] in models:
+                continue  # relation field, no column
+            column_name = _db_name(f["attributes"], f["name"])
+            columns_by_field[f["name"]] = column_name
+
+        for f in block["fields"]:
+            attrs = f["attributes"]
+            if f["type"] in models:
+                relation = _attribute(attrs, "@relation")
+                if relation is False or relation is None:
+                    continue
+                _, named = _named_args(relation)
+                if "fields" not in named:
+                    continue
+                fk_columns = [columns_by_field[n] for n in _list_value(named["fields"])]
+                ref_model = models[f["type"]]
+                ref_columns_by_field = {
+                    rf["name"]: _db_name(rf["attributes"], rf["name"])
+                    for rf in ref_model["fields"]
+                }
+                ref_columns = [ref_columns_by_field[n] for n in _list_value(named.get("references", ""))]
+                default_delete = "SetNull" if f["optional"] else "Restrict"
+                table.foreign_keys.append(ForeignKeySpec(
+                    name=f"{table.name}_{'_'.join(fk_columns)}_fkey",
+                    columns=fk_columns,
+                    ref_table=table_names[f["type"]],
+                    ref_columns=ref_columns,
+                    on_delete=REFERENTIAL_ACTIONS[named.get("onDelete", default_delete)],
+                    on_update=REFERENTIAL_ACTIONS[named.get("onUpdate", "Cascade")],
+                ))
+                continue
+
+            column_name = columns_by_field[f["name"]]
+            native = _native_type(attrs)
+            if native:
+                sql_type = native
+            elif f["type"] in SCALAR_TYPES:
+                sql_type = SCALAR_TYPES[f["type"]]
+            elif f["type"] in enum_names:
+                sql_type = quote(enum_names[f["type"]])
+            else:
+                raise PrismaSchemaError(f"Tipo desconocido {f['type']} en {model_name}.{f['name']}")
+            if f["list"]:
+                sql_type += "[]"
+
+            default_args = _attribute(attrs, "@default")
+            serial = default_args == "autoincrement()"
+            default = _default_sql(default_args, f, enum_names) if default_args else None
+
+            table.columns.append(ColumnSpec(
+                name=column_name,
+                type=sql_type,
+                # Prisma never marks scalar lists NOT NULL
+                not_null=(not f["optional"] and not f["list"]) or serial,
+                default=default,
+                serial=serial,
+                updated_at=_attribute(attrs, "@updatedAt") is not False,
+                field=f["name"],
+            ))
+
+            if _attribute(attrs, "@id") is not False:
+                table.primary_key = [column_name]
+            if _attribute(attrs, "@unique") is not False:
+                table.indexes.append(IndexSpec(f"{table.name}_{column_name}_key", [column_name], True))
+
+        for name, args in block["attributes"]:
+            if name not in ("@@id", "@@unique", "@@index"):
+                continue
+            positional, named = _named_args(args)
+            fields = _list_value(named.get("fields", positional[0] if positional else ""))
+            columns = [columns_by_field[n.split("(")[0]] for n in fields]
+            if name == "@@id":
+                table.primary_key = columns
+            else:
+                unique = name == "@@unique"
+                suffix = "key" if unique else "idx"
+                index_name = _string_value(named["map"]) if "map" in named else f"{table.name}_{'_'.join(columns)}_{suffix}"
+                table.indexes.append(IndexSpec(index_name, columns, unique))
+
+        tables[table.name] = table
+
+    return SchemaSpec(tables=tables, enums=enums)
@@ -0,0 +1,103 @@
+"""SQL equivalents of the queries the API routes send through Prisma.
+
+Each entry mirrors one Prisma call (same filters, same ordering, the
+relation filters written the way Prisma compiles them), so the
+benchmarks and tools in ``scripts/`` measure what production runs.
+Parameters are named; ``route_params`` builds them for a given gym and
+instant, using the same date arithmetic as the routes.
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import datetime
+
+STATS_ROUTE = "app/api/admin/stats/route.ts"
+PUBLIC_ROUTE = "app/api/public/gym/[gymId]"
+
+
+@dataclass(frozen=True)
+class RouteQuery:
+    name: str
+    route: str
+    sql: str
+
+
+ROUTE_QUERIES = (
+    # -- admin stats ---------------------------------------------------------
+    RouteQuery("stats.daily_stats", STATS_ROUTE, """
+        SELECT day, checkins, active_members, new_members, revenue FROM gym_daily_stats
+        WHERE gym_id = %(gym_id)s AND day >= %(start_of_last_month)s::date AND day < %(start_of_today)s::date
+    """),
+    RouteQuery("stats.active_members", STATS_ROUTE, """
+        SELECT COUNT(*) FROM members
+        WHERE gym_id = %(gym_id)s AND status = 'active' AND membership_end >= %(start_of_today)s
+    """),
+    RouteQuery("stats.today_checkins", STATS_ROUTE, """
+        SELECT COUNT(*) FROM check_ins
+        WHERE checkin_time >= %(start_of_today)s
+        AND member_id IN (SELECT id FROM members WHERE gym_id = %(gym_id)s)
+    """),
+    RouteQuery("stats.members_today", STATS_ROUTE, """
+        SELECT membership_type FROM members
+        WHERE gym_id = %(gym_id)s AND created_at >= %(start_of_today)s
+    """),
+    RouteQuery("stats.membership_plans", STATS_ROUTE, """
+        SELECT name, price, period FROM gym_membership_plans WHERE gym_id = %(gym_id)s
+    """),
+    RouteQuery("stats.total_members", STATS_ROUTE, """
+        SELECT COUNT(*) FROM members WHERE gym_id = %(gym_id)s
+    """),
+    # -- public gym pages ----------------------------------------------------
+    RouteQuery("public.gym_lookup", PUBLIC_ROUTE, """
+        SELECT * FROM gyms
+        WHERE slug = %(slug)s OR slug = %(slug_spaces)s OR slug = %(slug_dashes)s OR id = %(gym_id)s
+        LIMIT 1
+    """),
+    RouteQuery("public.schedules", PUBLIC_ROUTE + "/schedules", """
+        SELECT * FROM gym_schedules WHERE gym_id = %(gym_id)s ORDER BY day_of_week ASC
+    """),
+    RouteQuery("public.classes", PUBLIC_ROUTE + "/classes", """
+        SELECT c.*, i.name AS instructor_name_joined
+        FROM classes c
+        LEFT JOIN instructors i ON i.id = c.instructor_id
+        ORDER BY c.created_at DESC
+    """),
+    RouteQuery("public.membership_plans", PUBLIC_ROUTE + "/membership-plans", """
+        SELECT * FROM gym_membership_plans WHERE gym_id = %(gym_id)s ORDER BY "order" ASC
+    """),
+    RouteQuery("public.facilities", PUBLIC_ROUTE + "/facilities", """
+        SELECT * FROM gym_facilities WHERE gym_id = %(gym_id)s ORDER BY "order" ASC
+    """),
+    RouteQuery("public.amenities", PUBLIC_ROUTE + "/facilities", """
+        SELECT * FROM gym_amenities WHERE gym_id = %(gym_id)s ORDER BY "order" ASC
+    """),
+)
+
+
+def find_queries(names=None):
+    """Return the catalogue entries whose name starts with any of ``names``."""
+    if not names:
+        return list(ROUTE_QUERIES)
+    return [q for q in ROUTE_QUERIES if any(q.name == n or q.name.startswith(n + ".") for n in names)]
+
+
+def _same_day_last_month(moment):
+    year, month = (moment.year, moment.month - 1) if moment.month > 1 else (moment.year - 1, 12)
+    day = min(moment.day, calendar.monthrange(year, month)[1])
+    return moment.replace(year=year, month=month, day=day)
+
+
+def route_params(gym_id, slug, now=None):
+    """Parameters for every catalogue query, computed like the routes do."""
+    now = now or datetime.now()
+    start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_of_last_month = _same_day_last_month(start_of_today.replace(day=1))
+    slug = (slug or str(gym_id)).lower().strip()
+    return {
+        "gym_id": gym_id,
+        "slug": slug,
+        "slug_spaces": slug.replace("-", " "),
+        "slug_dashes": slug.replace(" ", "-"),
+        "start_of_today": start_of_today,
+        "start_of_last_month": start_of_last_month,
+    }
@@ -0,0 +1,187 @@
+"""Weekly slots stored as free text, and their dated occurrences.
+
+``coach_class_templates`` (``day_of_week`` + ``start_time``) and
+``classes`` (``day_of_week`` + ``time``) keep their schedule as strings
+typed in the admin forms: "lunes", "Miércoles", "Lun-Vie", "sábado y
+domingo"; "07:00", "7:30 pm", "19h". ``parse_days`` and ``parse_time``
+turn them into weekdays (0 = Monday) and minutes after midnight, or None
+when the text cannot be read.
+
+``occurrences`` expands any number of weekly slots over a date range in
+one NumPy operation: each slot's first date comes from its weekday, the
+rest are whole weeks after it, and the result is filtered to the range.
+Times are wall-clock, like the ``timestamp without time zone`` columns
+they are written to.
+
+``overlap_clusters`` is the matching index for checking a schedule: the
+intervals are sorted once by (key, start) and swept with a running
+maximum of their ends, which finds every double booking per coach, room
+or instructor in O(n log n) without comparing intervals pairwise.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DAY_NAMES = {
+    0: ("lunes", "lun", "lu", "monday", "mon"),
+    1: ("martes", "mar", "ma", "tuesday", "tue", "tues"),
+    2: ("miercoles", "mie", "mier", "mi", "wednesday", "wed"),
+    3: ("jueves", "jue", "ju", "thursday", "thu", "thur", "thurs"),
+    4: ("viernes", "vie", "vi", "friday", "fri"),
+    5: ("sabado", "sab", "sa", "saturday", "sat"),
+    6: ("domingo", "dom", "do", "sunday", "sun"),
+}
+DAYS = {name: day for day, names in DAY_NAMES.items() for name in names}
+
+DAY_GROUPS = {
+    "todos los dias": tuple(range(7)),
+    "diario": tuple(range(7)),
+    "daily": tuple(range(7)),
+    "entre semana": tuple(range(5)),
+    "weekdays": tuple(range(5)),
+    "fin de semana": (5, 6),
+    "fines de semana": (5, 6),
+    "weekend": (5, 6),
+}
+
+_LIST_SEPARATOR = re.compile(r"\s*(?:,|;|/|&|\+|\by\b|\band\b)\s*")
+_RANGE_SEPARATOR = re.compile(r"\s*(?:-|–|\ba\b|\bto\b)\s*")
+_TIME = re.compile(r"(\d{1,2})(?:\s*[:.h]\s*(\d{2}))?(?::\d{2})?\s*(?:h|hrs|hs)?\s*(am|pm)?")
+
+# Thursday: 1970-01-01, day 0 of datetime64
+EPOCH_WEEKDAY = 3
+
+
+def _plain(text):
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _day(token):
+    token = token.strip().rstrip(".")
+    if token.isdigit() and 1 <= int(token) <= 7:
+        return int(token) - 1  # ISO: 1 = Monday
+    return DAYS.get(token)
+
+
+@lru_cache(maxsize=4096)
+def parse_days(text):
+    """Weekdays (0 = Monday) named by ``text``, as a sorted tuple; None if unreadable."""
+    if not text or not text.strip():
+        return None
+    plain = _plain(text)
+    if plain in DAY_GROUPS:
+        return DAY_GROUPS[plain]
+    days = set()
+    for part in _LIST_SEPARATOR.split(plain):
+        if not part:
+            continue
+        bounds = _RANGE_SEPARATOR.split(part)
+        if len(bounds) == 2:
+            first, last = _day(bounds[0]), _day(bounds[1])
+            if first is None or last is None:
+                return None
+            # Ranges may wrap around the week: "sab-lun"
+            days.update((first + i) % 7 for i in range((last - first) % 7 + 1))
+        elif len(bounds) == 1 and _day(part) is not None:
+            days.add(_day(part))
+        else:
+            return None
+    return tuple(sorted(days)) or None
+
+
+@lru_cache(maxsize=4096)
+def parse_time(text):
+    """Minutes after midnight for "07:00", "7:30 pm", "19h", "7.15"; None if unreadable."""
+    if not text:
+        return None
+    plain = _plain(text).replace("a. m.", "am").replace("p. m.", "pm").replace("a.m.", "am").replace("p.m.", "pm")
+    match = _TIME.fullmatch(plain.strip())
+    if not match:
+        return None
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if minutes > 59:
+        return None
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem == "pm" else 0)
+    elif hours > 23:
+        return None
+    return hours * 60 + minutes
+
+
+def available():
+    return np is not None
+
+
+def occurrences(weekdays, minutes, start, end):
+    """Every weekly occurrence of the given slots with ``start <= t < end``.
+
+    ``weekdays`` (0 = Monday) and ``minutes`` are equal-length integer
+    arrays, one element per slot. Returns ``(slot, starts)``: the index
+    of the slot each occurrence belongs to and its ``datetime64[m]``
+    start, ordered by slot and then by date.
+    """
+    weekdays = np.asarray(weekdays, dtype=np.int64)
+    minutes = np.asarray(minutes, dtype=np.int64)
+    start = np.datetime64(start, "m")
+    end = np.datetime64(end, "m")
+    if not len(weekdays) or end <= start:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype="datetime64[m]")
+
+    first_day = start.astype("datetime64[D]")
+    first_weekday = (first_day.astype(np.int64) + EPOCH_WEEKDAY) % 7
+    # Days from the range's first day to each slot's first weekday
+    offsets = (weekdays - first_weekday) % 7
+    weeks = (end - start) // np.timedelta64(7, "D") + 2
+    days = first_day + (offsets[:, None] + 7 * np.arange(weeks)[None, :]).astype("timedelta64[D]")
+    starts = days.astype("datetime64[m]") + minutes[:, None].astype("timedelta64[m]")
+
+    inside = (starts >= start) & (starts < end)
+    slots = np.broadcast_to(np.arange(len(weekdays))[:, None], starts.shape)
+    return slots[inside], starts[inside]
+
+
+def overlap_clusters(keys, starts, ends):
+    """Find the intervals that overlap another one with the same key, in O(n log n).
+
+    Sorted by (key, start), an interval overlaps an earlier one of its
+    key exactly when it starts before the largest end seen so far in
+    that key. Runs of such intervals form a cluster: two or more
+    bookings of the same coach or room at once. Intervals that only
+    touch (one ends when the next starts) do not overlap.
+
+    Returns ``(positions, clusters)``: indexes into the inputs of every
+    interval in a cluster, ordered by key and start, and the cluster
+    number of each (equal numbers are contiguous).
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(keys) < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    order = np.lexsort((starts, keys))
+    key, start, end = keys[order], starts[order], ends[order]
+    first_of_key = np.ones(len(key), dtype=bool)
+    first_of_key[1:] = key[1:] != key[:-1]
+
+    # Running maximum of the end that restarts at every key: shifting each
+    # key's ends past the previous key's keeps a single accumulate per-key
+    group = np.cumsum(first_of_key) - 1
+    base = min(start.min(), end.min())
+    span = max(start.max(), end.max()) - base + 1
+    latest_end = np.maximum.accumulate(end - base + group * span) - group * span + base
+
+    overlaps = np.zeros(len(key), dtype=bool)
+    overlaps[1:] = ~first_of_key[1:] & (start[1:] < latest_end[:-1])
+    cluster = np.cumsum(~overlaps) - 1
+    booked_twice = np.bincount(cluster)[cluster] > 1
+    return order[booked_twice], cluster[booked_twice]
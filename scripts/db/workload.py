@@ -0,0 +1,389 @@
+"""Low-overhead sampling of what the database is busy with.
+
+A ``Sampler`` holds one autocommit connection. Every sample is a single
+round trip that reads the client sessions of ``pg_stat_activity`` and the
+ungranted entries of ``pg_locks``; ``pg_blocking_pids()`` is only called
+for sessions that are waiting on a lock. The cumulative views
+(``pg_stat_statements`` without query texts, ``pg_stat_user_tables``) are
+read once per bucket and turned into deltas, and a statement's text is
+fetched once, the first time its id shows up.
+
+Statements are grouped by fingerprint: the text with comments, literals
+and bind parameters removed, identifiers unquoted and ``public.``
+dropped. The same fingerprint comes out of the SQL psycopg2 sends, the
+``$1`` statements Prisma prepares and the normalized text kept by
+``pg_stat_statements``. A fingerprint whose tables and filtered columns
+match an entry of ``db/queries.py`` carries that route query's name.
+"""
+
+import hashlib
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+import psycopg2.errors
+
+from .queries import ROUTE_QUERIES
+
+# Leading comment on the profiler's own statements, to leave them out of the report
+MARKER = "/* workload-profiler */"
+
+_COMMENT = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRING = re.compile(r"(?:\bE)?'(?:[^']|'')*'")
+_QUOTED = re.compile(r'"([^"]*)"')
+_SCHEMA = re.compile(r"\bpublic\.")
+_PARAM = re.compile(r"\$\d+|%\(\w+\)s|%s")
+_NUMBER = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+_TABLE = re.compile(r"\b(?:from|join|update|into)\s+(\w+)")
+_FILTER = re.compile(r"(\w+)\s*(=|<>|!=|>=|<=|<|>|\bin\b|\blike\b|\bilike\b)\s*(?:cast\s*)?\(?\s*\?")
+
+SAMPLE_SQL = MARKER + """
+    SELECT
+        (
+            SELECT json_agg(json_build_object(
+                'pid', a.pid,
+                'state', a.state,
+                'wait', CASE WHEN a.wait_event IS NOT NULL THEN a.wait_event_type || ':' || a.wait_event END,
+                'xact_age', EXTRACT(epoch FROM clock_timestamp() - a.xact_start),
+                'query_age', EXTRACT(epoch FROM clock_timestamp() - a.query_start),
+                'query', CASE WHEN a.state <> 'idle' THEN a.query END,
+                'blocked_by', CASE WHEN a.wait_event_type = 'Lock' THEN pg_blocking_pids(a.pid) END
+            ))
+            FROM pg_stat_activity a
+            WHERE a.backend_type = 'client backend'
+            AND a.datname = current_database()
+            AND a.pid <> pg_backend_pid()
+        ),
+        (
+            SELECT json_agg(json_build_object(
+                'pid', l.pid,
+                'locktype', l.locktype,
+                'mode', l.mode,
+                'relation', l.relation::regclass::text
+            ))
+            FROM pg_locks l
+            WHERE NOT l.granted
+        );
+"""
+
+# showtext => false: the counters without reading the query text file
+STATEMENTS_SQL = MARKER + """
+    SELECT userid, queryid, calls, total_exec_time, rows, shared_blks_hit, shared_blks_read
+    FROM pg_stat_statements(false)
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+    AND queryid IS NOT NULL;
+"""
+
+STATEMENT_TEXTS_SQL = MARKER + """
+    SELECT userid, queryid, query FROM pg_stat_statements(true)
+    WHERE queryid = ANY(%s::bigint[]);
+"""
+
+TABLES_SQL = MARKER + """
+    SELECT relname, seq_scan, seq_tup_read, COALESCE(idx_scan, 0), n_tup_ins, n_tup_upd, n_tup_del
+    FROM pg_stat_user_tables;
+"""
+
+STATEMENT_COUNTERS = ("calls", "total_ms", "rows", "blks_hit", "blks_read")
+TABLE_COUNTERS = ("seq_scan", "seq_tup_read", "idx_scan", "n_tup_ins", "n_tup_upd", "n_tup_del")
+
+# pg_stat_statements missing, not in shared_preload_libraries, or too old
+STATEMENTS_UNAVAILABLE = (
+    psycopg2.errors.UndefinedTable,
+    psycopg2.errors.UndefinedFunction,
+    psycopg2.errors.UndefinedColumn,
+    psycopg2.errors.ObjectNotInPrerequisiteState,
+    psycopg2.errors.InsufficientPrivilege,
+)
+
+
+def normalize(sql):
+    """Statement text with comments, literals and parameters replaced by ``?``."""
+    text = _COMMENT.sub(" ", sql)
+    text = _STRING.sub("?", text)
+    text = _QUOTED.sub(r"\1", text)
+    text = _SCHEMA.sub("", text)
+    text = _PARAM.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _LIST.sub("(?)", text)
+    return _SPACE.sub(" ", text).strip().rstrip(";").strip().lower()
+
+
+def fingerprint(normalized):
+    return hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def shape(normalized):
+    """What a statement does, regardless of how it is spelled.
+
+    Tables read or written, (column, operator) pairs compared with a
+    parameter, and whether it counts rows: enough to tell the route
+    queries apart whether psycopg2 or Prisma wrote them.
+    """
+    return (
+        frozenset(_TABLE.findall(normalized)),
+        frozenset(_FILTER.findall(normalized)),
+        "count(" in normalized,
+    )
+
+
+def _route_shapes():
+    shapes = defaultdict(list)
+    for query in ROUTE_QUERIES:
+        shapes[shape(normalize(query.sql))].append(query.name)
+    return shapes
+
+
+ROUTE_SHAPES = _route_shapes()
+
+
+@dataclass
+class Fingerprint:
+    id: str
+    query: str
+    routes: list
+
+    @property
+    def label(self):
+        return ", ".join(self.routes) if self.routes else self.query[:80]
+
+
+class Registry:
+    """Fingerprints seen so far; ``new`` collects the ones not reported yet."""
+
+    def __init__(self):
+        self.by_id = {}
+        self._by_text = {}
+        self.new = []
+
+    def add(self, sql):
+        known = self._by_text.get(sql)
+        if known:
+            return known
+        normalized = normalize(sql)
+        fp_id = fingerprint(normalized)
+        fp = self.by_id.get(fp_id)
+        if fp is None:
+            fp = Fingerprint(fp_id, normalized[:1000], ROUTE_SHAPES.get(shape(normalized), []))
+            self.by_id[fp_id] = fp
+            self.new.append(fp)
+        # Raw texts repeat (the same prepared statement every sample); skip re-normalizing
+        if len(self._by_text) < 10_000:
+            self._by_text[sql] = fp
+        return fp
+
+    def take_new(self):
+        new, self.new = self.new, []
+        return new
+
+
+def lock_chains(sessions, waiting_locks, registry):
+    """Group lock waits by the session at the head of each chain.
+
+    ``sessions`` is one sample of pg_stat_activity; a chain is a root
+    blocker (not waiting itself) plus every session waiting on it,
+    directly or through another waiter.
+    """
+    by_pid = {s["pid"]: s for s in sessions}
+    locks = {lock["pid"]: lock for lock in waiting_locks}
+    waiters = defaultdict(list)
+    for s in sessions:
+        for blocker in s.get("blocked_by") or ():
+            waiters[blocker].append(s["pid"])
+    blocked = {s["pid"] for s in sessions if s.get("blocked_by")}
+
+    chains = []
+    for root in waiters:
+        if root in blocked:
+            continue
+        seen, depth, level = set(), 0, [root]
+        while level:
+            depth += 1
+            level = [pid for blocker in level for pid in waiters.get(blocker, ()) if pid not in seen]
+            seen.update(level)
+        head = by_pid.get(root, {})
+        lock = next((locks[pid] for pid in waiters[root] if pid in locks), {})
+        chains.append({
+            "root_pid": root,
+            "root_state": head.get("state"),
+            "root_statement": registry.add(head["query"]).id if head.get("query") else None,
+            "root_xact_age": head.get("xact_age"),
+            "waiters": len(seen),
+            "depth": depth - 1,
+            "max_wait": max((by_pid[pid].get("query_age") or 0 for pid in seen if pid in by_pid), default=0),
+            "relation": lock.get("relation") or lock.get("locktype"),
+            "mode": lock.get("mode"),
+        })
+    return chains
+
+
+def merge_chain(chains, key, chain):
+    """Fold a chain into ``chains``: samples add up, sizes and waits keep their maximum."""
+    known = chains.get(key)
+    if known is None:
+        chains[key] = dict(chain)
+        return
+    known["samples"] += chain["samples"]
+    for name in ("waiters", "depth", "max_wait", "root_xact_age"):
+        known[name] = max(known[name] or 0, chain[name] or 0)
+
+
+@dataclass
+class Bucket:
+    """Everything sampled during one reporting interval."""
+
+    start: object
+    samples: int = 0
+    sample_ms: float = 0.0
+    sessions: Counter = field(default_factory=Counter)
+    max_active: int = 0
+    waits: Counter = field(default_factory=Counter)
+    statements: Counter = field(default_factory=Counter)
+    longest: dict = field(default_factory=dict)
+    max_idle_in_transaction: float = 0.0
+    chains: dict = field(default_factory=dict)
+
+    def add(self, sessions, waiting_locks, registry, elapsed_ms):
+        self.samples += 1
+        self.sample_ms += elapsed_ms
+        active = 0
+        for s in sessions:
+            state = s["state"] or "unknown"
+            self.sessions[state] += 1
+            if state == "idle in transaction":
+                self.max_idle_in_transaction = max(self.max_idle_in_transaction, s["xact_age"] or 0)
+            if state != "active":
+                continue
+            active += 1
+            # An active session with no wait event is on CPU (or in a wait Postgres does not report)
+            self.waits[s["wait"] or "CPU"] += 1
+            if s["query"]:
+                fp = registry.add(s["query"]).id
+                self.statements[fp] += 1
+                self.longest[fp] = max(self.longest.get(fp, 0), s["query_age"] or 0)
+        self.max_active = max(self.max_active, active)
+
+        for chain in lock_chains(sessions, waiting_locks, registry):
+            merge_chain(self.chains, (chain["root_statement"], chain["relation"], chain["mode"]), dict(chain, samples=1))
+
+    def report(self, end, interval, top, statement_deltas, table_deltas, registry):
+        samples = max(self.samples, 1)
+        active = sorted(self.statements.items(), key=lambda item: -item[1])[:top]
+        record = {
+            "type": "bucket",
+            "start": self.start,
+            "end": end,
+            "samples": self.samples,
+            "sample_ms": round(self.sample_ms / samples, 2),
+            "sessions": {state: round(count / samples, 2) for state, count in self.sessions.most_common()},
+            "max_active": self.max_active,
+            "max_idle_in_transaction_s": round(self.max_idle_in_transaction, 1),
+            "waits": {wait: round(count * interval, 1) for wait, count in self.waits.most_common(top)},
+            "active": [
+                {"fingerprint": fp, "seconds": round(count * interval, 1),
+                 "longest_s": round(self.longest[fp], 2), "label": registry.by_id[fp].label}
+                for fp, count in active
+            ],
+            "lock_chains": sorted(self.chains.values(), key=lambda c: (-c["samples"], -c["waiters"])),
+        }
+        if statement_deltas is not None:
+            record["statements"] = top_statements(statement_deltas, top, registry)
+        if table_deltas:
+            record["tables"] = table_deltas
+        return record
+
+
+def top_statements(deltas, top, registry):
+    ranked = sorted(deltas.items(), key=lambda item: -item[1]["total_ms"])[:top]
+    rows = []
+    for fp, d in ranked:
+        if not d["calls"]:
+            continue
+        blocks = d["blks_hit"] + d["blks_read"]
+        rows.append({
+            "fingerprint": fp,
+            "label": registry.by_id[fp].label,
+            "calls": d["calls"],
+            "total_ms": round(d["total_ms"], 1),
+            "mean_ms": round(d["total_ms"] / d["calls"], 3),
+            "rows": d["rows"],
+            "hit_ratio": round(d["blks_hit"] / blocks, 4) if blocks else None,
+        })
+    return rows
+
+
+def _delta(current, previous, counters):
+    # A counter that went down was reset (or its entry evicted and re-added)
+    if previous is None or any(c < p for c, p in zip(current, previous)):
+        previous = (0,) * len(counters)
+    return {name: c - p for name, c, p in zip(counters, current, previous)}
+
+
+class Sampler:
+    """Reads the statistics views through one autocommit connection."""
+
+    def __init__(self, conn, registry):
+        self.conn = conn
+        self.registry = registry
+        self.has_statements = True
+        self._statements = None
+        self._tables = None
+        self._texts = {}
+        self._ignored = set()
+
+    def sample(self):
+        """One round trip: (sessions, ungranted locks, elapsed ms)."""
+        started = time.perf_counter()
+        with self.conn.cursor() as cursor:
+            cursor.execute(SAMPLE_SQL)
+            sessions, locks = cursor.fetchone()
+        return sessions or [], locks or [], (time.perf_counter() - started) * 1000
+
+    def statement_deltas(self):
+        """Counters per fingerprint since the previous call; None without pg_stat_statements."""
+        if not self.has_statements:
+            return None
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(STATEMENTS_SQL)
+                current = {(user, qid): tuple(rest) for user, qid, *rest in cursor.fetchall()}
+                unknown = [key for key in current if key not in self._texts and key not in self._ignored]
+                if unknown:
+                    cursor.execute(STATEMENT_TEXTS_SQL, ([qid for _, qid in unknown],))
+                    for user, qid, query in cursor.fetchall():
+                        if query.startswith(MARKER):
+                            self._ignored.add((user, qid))
+                        else:
+                            self._texts[(user, qid)] = self.registry.add(query).id
+        except STATEMENTS_UNAVAILABLE:
+            self.has_statements = False
+            return None
+
+        previous, self._statements = self._statements, current
+        if previous is None:
+            return {}
+        deltas = defaultdict(lambda: dict.fromkeys(STATEMENT_COUNTERS, 0))
+        for key, counters in current.items():
+            fp = self._texts.get(key)
+            if fp is None:
+                continue
+            for name, value in _delta(counters, previous.get(key), STATEMENT_COUNTERS).items():
+                deltas[fp][name] += value
+        return dict(deltas)
+
+    def table_deltas(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(TABLES_SQL)
+            current = {name: tuple(rest) for name, *rest in cursor.fetchall()}
+        previous, self._tables = self._tables, current
+        if previous is None:
+            return {}
+        changed = {}
+        for name, counters in current.items():
+            delta = _delta(counters, previous.get(name), TABLE_COUNTERS)
+            if any(delta.values()):
+                changed[name] = delta
+        return changed
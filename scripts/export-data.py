@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Export members, classes and check-ins to Parquet or CSV for finance and analytics.
+
+Each table is split by id into one slice per worker and streamed window
+by window with ``COPY ... TO STDOUT`` (see ``db/export.py``), so a large
+``check_ins`` never sits in memory nor holds one long snapshot. Every
+worker writes its own ``part-NNN`` file; a ``manifest.json`` next to them
+records the filters, files and row counts.
+
+Filters:
+
+* ``--gym`` keeps that gym's members and their check-ins (``classes`` has
+  no gym and is always exported in full);
+* ``--since`` / ``--until`` select by ``created_at`` (members, classes) or
+  ``checkin_time`` (check-ins); ``--until`` is not included. On the
+  partitioned ``check_ins`` only the months in range are read.
+
+Usage:
+    python scripts/export-data.py --gym mi-gimnasio
+    python scripts/export-data.py check-ins --since 2026-01-01 --until 2026-07-01 --format csv
+    python scripts/export-data.py members classes --workers 8 --output /tmp/exportacion
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connection, load_settings
+from db.catalog import format_bytes, introspect
+from db.config import PROJECT_ROOT
+from db.export import FORMATS, ExportSource, export_table
+from db.prisma import quote
+
+EXPORTS_DIR = PROJECT_ROOT / "exports"
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    name: str
+    date_column: str
+    gym_filter: str = None
+
+
+TABLES = {
+    "members": ExportTable("members", "created_at", "gym_id = %(gym_id)s"),
+    "classes": ExportTable("classes", "created_at"),
+    "check-ins": ExportTable(
+        "check_ins", "checkin_time", "member_id IN (SELECT id FROM members WHERE gym_id = %(gym_id)s)"
+    ),
+}
+TABLES_BY_NAME = {spec.name: spec for spec in TABLES.values()}
+
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"fecha inválida '{value}' (usa AAAA-MM-DD)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta miembros, clases y check-ins a Parquet o CSV")
+    parser.add_argument("tables", nargs="*", help=f"Tablas a exportar: {', '.join(TABLES)} (por defecto todas)")
+    parser.add_argument("--gym", help="Id o slug del gimnasio")
+    parser.add_argument("--since", type=iso_date, help="Desde esta fecha (AAAA-MM-DD, incluida)")
+    parser.add_argument("--until", type=iso_date, help="Hasta esta fecha (AAAA-MM-DD, sin incluir)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="Formato de salida (por defecto parquet)")
+    parser.add_argument("--workers", type=int, default=4, help="Conexiones en paralelo por tabla (por defecto 4)")
+    parser.add_argument("--batch-size", type=int, default=50_000,
+                        help="Ids por ventana de COPY; cada una es un grupo de filas en Parquet (por defecto 50000)")
+    parser.add_argument("--compression", default="zstd", help="Compresión Parquet (zstd, snappy, gzip, none)")
+    parser.add_argument("--output", type=Path, help="Directorio de salida (por defecto exports/<gimnasio>-<fecha>)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.tables if name not in TABLES]
+    if unknown:
+        parser.error(f"tabla desconocida: {', '.join(unknown)} (elige entre {', '.join(TABLES)})")
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers y --batch-size deben ser al menos 1")
+    if args.since and args.until and args.since >= args.until:
+        parser.error("--since debe ser anterior a --until")
+    args.tables = args.tables or list(TABLES)
+    return args
+
+
+def resolve_gym(cursor, value):
+    cursor.execute(
+        "SELECT id, name, slug FROM gyms WHERE id::text = %s OR slug = lower(%s) ORDER BY id::text = %s DESC LIMIT 1;",
+        (value, value, value),
+    )
+    return cursor.fetchone()
+
+
+def build_source(cursor, spec, columns, args, gym_id):
+    """ExportSource for one table with the gym and date filters bound into its predicate."""
+    column = quote(spec.date_column)
+    filters = []
+    if gym_id is not None and spec.gym_filter:
+        filters.append(spec.gym_filter)
+    if args.since:
+        filters.append(f"{column} >= %(since)s")
+    if args.until:
+        filters.append(f"{column} < %(until)s")
+    params = {"gym_id": gym_id, "since": args.since, "until": args.until}
+    where = cursor.mogrify(" AND ".join(filters), params).decode() if filters else None
+    return ExportSource(spec.name, columns, where)
+
+
+def report(rows, windows, total):
+    print(f"    ⏳ {rows:,} filas ({windows}/{total} ventanas)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.format == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            print("❌ Error: pyarrow no está instalado (necesario para --format parquet)")
+            print("   Instala con: pip install pyarrow, o usa --format csv")
+            sys.exit(1)
+
+    try:
+        pool_max = load_settings().pool_max
+        workers = min(args.workers, pool_max)
+        if workers < args.workers:
+            print(f"ℹ️  --workers limitado a {workers} (tamaño del pool, DB_POOL_MAX)\n")
+
+        gym = None
+        with connection() as conn:
+            cursor = conn.cursor()
+            if args.gym:
+                gym = resolve_gym(cursor, args.gym)
+                if gym is None:
+                    print(f"❌ Error: no existe ningún gimnasio con id o slug '{args.gym}'")
+                    sys.exit(1)
+            specs = [TABLES[name] for name in args.tables]
+            catalog = introspect(cursor, [spec.name for spec in specs])
+            sources = [
+                build_source(cursor, spec, catalog[spec.name].columns, args, gym[0] if gym else None)
+                for spec in specs if spec.name in catalog
+            ]
+            cursor.close()
+        for spec in specs:
+            if spec.name not in catalog:
+                print(f"⚠️  La tabla {spec.name} no existe; se omite")
+
+        label = (gym[2] or str(gym[0])) if gym else "todos"
+        output = args.output or EXPORTS_DIR / f"{label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        if gym:
+            print(f"🏋️  Gimnasio: {gym[1]} (id {gym[0]})")
+        print(f"📤 Exportando a {output} ({args.format}, {workers} en paralelo)\n")
+
+        manifest = {
+            "gym": {"id": gym[0], "name": gym[1], "slug": gym[2]} if gym else None,
+            "since": args.since,
+            "until": args.until,
+            "format": args.format,
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+            "tables": {},
+        }
+        total_rows = 0
+        for source in sources:
+            if gym and not TABLES_BY_NAME[source.table].gym_filter:
+                print(f"  ℹ️  {source.table} no tiene gimnasio; se exporta completa")
+            result = export_table(
+                source, output / source.table, args.format, workers, args.batch_size,
+                on_progress=report, compression=None if args.compression == "none" else args.compression,
+            )
+            total_rows += result.rows
+            print(f"  ✓ {source.table}: {result.rows:,} filas en {len(result.files)} archivos, "
+                  f"{format_bytes(result.bytes)}, {result.elapsed:.1f}s ({result.rate:,.0f} filas/s)")
+            manifest["tables"][source.table] = {
+                "rows": result.rows,
+                "bytes": result.bytes,
+                "files": [str(path.relative_to(output)) for path in result.files],
+            }
+
+        output.mkdir(parents=True, exist_ok=True)
+        (output / "manifest.json").write_text(json.dumps(manifest, indent=2, default=str, ensure_ascii=False), encoding="utf-8")
+        print(f"\n✅ Exportación completada: {total_rows:,} filas")
+        print(f"💾 {output / 'manifest.json'}")
+
+    except (psycopg2.Error, DatabaseConfigError, ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
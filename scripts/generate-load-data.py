@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""Generate synthetic, production-sized data for load and query testing.
+
+Fills gyms (with plans and schedules), classes, coaches, members,
+check_ins, coach_class_sessions and coach_class_attendees. Output is
+deterministic: the same --seed and --until always produce the same rows.
+
+Every member's attributes are derived from (seed, member id) alone, so
+check-ins are generated without holding the members in memory; each table
+is streamed through COPY (see ``db/copy.py``). The only state kept per
+member is its id in its gym's list, 8 bytes each.
+
+Distributions:
+  * members are spread over gyms with a Zipf-like skew (a few big gyms);
+  * sign-ups grow towards the present; plans churn at different rates, so
+    memberships end in the past ("expired"/"cancelled") or the future;
+  * visits peak on Monday-Tuesday and at 7:00 / 19:00, tapering off at
+    weekends; each member has their own visit rate and preferred hour.
+
+Usage:
+    python scripts/generate-load-data.py --members 1000000 --gyms 50
+    python scripts/generate-load-data.py --seed 7 --until 2025-06-30
+"""
+import argparse
+import bisect
+import math
+import random
+import sys
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+import psycopg2
+
+from db import DatabaseConfigError, connection, statement_timeout
+from db.copy import copy_rows, sync_sequence
+from db.partitions import ensure_partitions, is_partitioned
+
+TABLES = (
+    "gyms",
+    "gym_membership_plans",
+    "gym_schedules",
+    "classes",
+    "user_accounts",
+    "coach_profiles",
+    "members",
+    "check_ins",
+    "coach_class_sessions",
+    "coach_class_attendees",
+)
+
+# (name, period, days, price, probability of leaving at each renewal)
+PLANS = (
+    ("Mensual", "mes", 30, 599.0, 0.25),
+    ("Trimestral", "trimestre", 90, 1599.0, 0.30),
+    ("Anual", "año", 365, 5499.0, 0.35),
+)
+PLAN_WEIGHTS = (0.6, 0.25, 0.15)
+
+# Monday first, as datetime.weekday()
+DAY_NAMES = ("lunes", "martes", "miercoles", "jueves", "viernes", "sabado", "domingo")
+SCHEDULE_DAYS = ("Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo")
+DAY_WEIGHTS = (1.25, 1.15, 1.1, 1.0, 0.85, 0.6, 0.4)
+WEEKDAYS = range(7)
+DAY_CUMULATIVE = tuple(sum(DAY_WEIGHTS[:i + 1]) for i in WEEKDAYS)
+
+# Preferred visit hour: (weight, mean hour, std dev)
+HOUR_MODES = ((0.40, 7.5, 1.0), (0.15, 13.0, 1.0), (0.45, 19.0, 1.2))
+OPEN_HOUR, CLOSE_HOUR = 5, 23
+
+CLASS_ATTENDANCE = 0.15
+
+FIRST_NAMES = (
+    "Ana", "Carlos", "María", "Juan", "Lucía", "Diego", "Sofía", "Miguel", "Valeria", "Jorge",
+    "Camila", "Luis", "Fernanda", "Andrés", "Daniela", "Pablo", "Regina", "Emilio", "Paula", "Iván",
+)
+LAST_NAMES = (
+    "López", "González", "Rodríguez", "Martínez", "Hernández", "García", "Pérez", "Sánchez",
+    "Ramírez", "Torres", "Flores", "Rivera", "Gómez", "Díaz", "Cruz", "Morales", "Reyes", "Ortiz",
+)
+BRANDS = ("Tessalp", "Iron Club", "Pulso", "Fit Zone", "Atlas", "Núcleo", "Vértice", "Kinetic")
+AREAS = (
+    "Centro", "Norte", "Sur", "Poniente", "Oriente", "Valle", "Lomas", "Cumbres",
+    "Del Río", "San Pedro", "Las Torres", "Mitras",
+)
+CLASS_TYPES = (
+    ("Yoga", "Yoga"), ("Spinning", "Cardio"), ("Pilates", "Pilates"), ("CrossFit", "Fuerza"),
+    ("Zumba", "Baile"), ("HIIT", "Cardio"), ("Box", "Combate"), ("Funcional", "Fuerza"),
+)
+COACH_ROLES = ("STAFF", "PERSONAL_TRAINER", "SPINNING", "PILATES", "YOGA", "CROSSFIT", "NUTRITION")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para pruebas de carga")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla (misma semilla, mismos datos)")
+    parser.add_argument("--gyms", type=int, default=10, help="Gimnasios a crear (por defecto 10)")
+    parser.add_argument("--members", type=int, default=5000, help="Miembros en total (por defecto 5000)")
+    parser.add_argument("--days", type=int, default=180, help="Días de historial (por defecto 180)")
+    parser.add_argument("--visits", type=float, default=2.5, help="Visitas promedio por semana y miembro activo")
+    parser.add_argument("--classes", type=int, default=40, help="Clases semanales a crear (por defecto 40)")
+    parser.add_argument("--coaches-per-gym", type=int, default=3, help="Coaches por gimnasio (por defecto 3)")
+    parser.add_argument(
+        "--until",
+        type=date.fromisoformat,
+        default=date.today(),
+        help="Último día con visitas, AAAA-MM-DD (por defecto hoy)",
+    )
+    args = parser.parse_args(argv)
+    for name in ("gyms", "members", "days", "classes"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name} debe ser al menos 1")
+    if args.coaches_per_gym < 0 or args.visits <= 0:
+        parser.error("--coaches-per-gym no puede ser negativo y --visits debe ser positivo")
+    return args
+
+
+class Generator:
+    """Deterministic row factories sharing one id space per table."""
+
+    def __init__(self, args, base_ids):
+        self.args = args
+        self.seed = args.seed
+        self.base = base_ids
+        self.now = datetime.combine(args.until, datetime.min.time()) + timedelta(days=1)
+        self.window_start = self.now - timedelta(days=args.days)
+
+        rng = self.rng("gyms")
+        self.gym_ids = [base_ids["gyms"] + i + 1 for i in range(args.gyms)]
+        # Zipf-like sizes: gym k gets weight 1/k^0.8, shuffled so id order says nothing
+        weights = [1 / (k + 1) ** 0.8 for k in range(args.gyms)]
+        rng.shuffle(weights)
+        self.gym_cumulative = list(_accumulate(weights))
+        self.gym_members = {gym_id: array("q") for gym_id in self.gym_ids}
+
+        self.class_ids_by_day = {day: [] for day in range(7)}
+        self.coaches = []
+
+    def rng(self, *key):
+        return random.Random(f"{self.seed}:" + ":".join(str(k) for k in key))
+
+    # -- gyms -----------------------------------------------------------------
+
+    def gyms(self):
+        for i, gym_id in enumerate(self.gym_ids):
+            rng = self.rng("gym", gym_id)
+            name = f"{rng.choice(BRANDS)} {rng.choice(AREAS)}"
+            slug = name.lower().replace(" ", "-").replace(".", "")
+            yield (
+                gym_id, name, f"Av. {rng.choice(AREAS)} {rng.randint(100, 2999)}",
+                f"81{rng.randint(10000000, 99999999)}", f"contacto{gym_id}@example.com",
+                "Lun-Vie 5:00-23:00, Sáb-Dom 7:00-15:00", f"{slug}-{gym_id}",
+                self.window_start, self.window_start,
+            )
+
+    def plans(self):
+        plan_id = self.base["gym_membership_plans"]
+        for gym_id in self.gym_ids:
+            for order, (name, period, _, price, _) in enumerate(PLANS):
+                plan_id += 1
+                yield (plan_id, gym_id, name, price, period, "{}", order == 0, order, self.window_start)
+
+    def schedules(self):
+        schedule_id = self.base["gym_schedules"]
+        for gym_id in self.gym_ids:
+            for day, name in enumerate(SCHEDULE_DAYS):
+                schedule_id += 1
+                weekend = day >= 5
+                yield (
+                    schedule_id, gym_id, name, "07:00" if weekend else "05:00",
+                    "15:00" if weekend else "23:00", False, self.window_start,
+                )
+
+    def classes(self):
+        rng = self.rng("classes")
+        for i in range(self.args.classes):
+            class_id = self.base["classes"] + i + 1
+            day = rng.choices(range(7), DAY_WEIGHTS)[0]
+            hour = _visit_hour(rng)
+            name, kind = rng.choice(CLASS_TYPES)
+            capacity = rng.randint(10, 30)
+            self.class_ids_by_day[day].append(class_id)
+            yield (
+                class_id, name, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", DAY_NAMES[day],
+                f"{int(hour):02d}:{rng.choice((0, 30)):02d}", rng.choice((45, 60)), capacity,
+                rng.randint(capacity // 2, capacity), kind, 0, self.window_start,
+            )
+
+    # -- coaches --------------------------------------------------------------
+
+    def user_accounts(self):
+        account_id = self.base["user_accounts"]
+        for gym_id in self.gym_ids:
+            for _ in range(self.args.coaches_per_gym):
+                account_id += 1
+                rng = self.rng("coach", account_id)
+                yield (
+                    account_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    f"coach{account_id}@example.com", "COACH", self.window_start,
+                )
+
+    def coach_profiles(self):
+        profile_id = self.base["coach_profiles"]
+        account_id = self.base["user_accounts"]
+        for gym_id in self.gym_ids:
+            for _ in range(self.args.coaches_per_gym):
+                profile_id += 1
+                account_id += 1
+                rng = self.rng("coach", account_id)
+                self.coaches.append((profile_id, gym_id))
+                yield (
+                    profile_id, account_id, rng.choice(COACH_ROLES), "APPROVED",
+                    rng.randint(1, 15), "{}", gym_id, self.window_start,
+                )
+
+    # -- members --------------------------------------------------------------
+
+    def member(self, member_id):
+        """Everything about a member, derived from its id alone."""
+        rng = self.rng("member", member_id)
+        gym_index = bisect.bisect(self.gym_cumulative, rng.random() * self.gym_cumulative[-1])
+        gym_id = self.gym_ids[min(gym_index, len(self.gym_ids) - 1)]
+
+        # Sign-ups skew towards the present (u^0.6 leans to 1)
+        offset = self.args.days * rng.random() ** 0.6
+        start = self.window_start + timedelta(days=offset, seconds=rng.randint(0, 86399))
+        plan = rng.choices(PLANS, PLAN_WEIGHTS)[0]
+        name, _, period_days, _, churn = plan
+        renewals = 0
+        while rng.random() > churn and renewals < 20:
+            renewals += 1
+        end = start + timedelta(days=period_days * (renewals + 1))
+
+        if end >= self.now:
+            status = "active"
+        else:
+            status = "cancelled" if rng.random() < 0.2 else "expired"
+
+        return {
+            "id": member_id,
+            "gym_id": gym_id,
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "plan": name,
+            "start": start,
+            "end": end,
+            "status": status,
+            # Per-member habits: weekly visit rate and favourite hour
+            "rate": self.args.visits * rng.lognormvariate(0, 0.45) / math.exp(0.45 ** 2 / 2),
+            "hour": _visit_hour(rng),
+            "phone": f"81{rng.randint(10000000, 99999999)}" if rng.random() < 0.7 else None,
+        }
+
+    def member_ids(self):
+        first = self.base["members"] + 1
+        return range(first, first + self.args.members)
+
+    def members(self):
+        for member_id in self.member_ids():
+            m = self.member(member_id)
+            self.gym_members[m["gym_id"]].append(member_id)
+            first, last = m["name"].lower().split(" ", 1)
+            yield (
+                member_id, m["name"], f"{_ascii(first)}.{_ascii(last)}.{member_id}@example.com", m["phone"],
+                m["plan"], m["start"], m["end"], m["status"], m["gym_id"], m["start"], m["start"],
+            )
+
+    # -- check-ins ------------------------------------------------------------
+
+    def check_ins(self):
+        checkin_id = self.base["check_ins"]
+        days_seen = {}
+        for member_id in self.member_ids():
+            m = self.member(member_id)
+            rng = self.rng("visits", member_id)
+            active_until = min(m["end"], self.now)
+            week = _monday(m["start"])
+            while week < active_until:
+                # Visits this week ~ Poisson(rate), placed on weighted weekdays
+                visits = _poisson(rng, m["rate"])
+                weekdays = set(rng.choices(WEEKDAYS, cum_weights=DAY_CUMULATIVE, k=visits))
+                for weekday in sorted(weekdays):
+                    day = week + timedelta(days=weekday)
+                    seconds = int(min(max(rng.gauss(m["hour"], 1.0), OPEN_HOUR), CLOSE_HOUR - 1.5) * 3600)
+                    checkin = day + timedelta(seconds=seconds)
+                    if checkin < m["start"] or checkin >= active_until:
+                        continue
+                    checkout_seconds = seconds + rng.randint(40, 120) * 60
+                    class_id = None
+                    if rng.random() < CLASS_ATTENDANCE:
+                        options = self.class_ids_by_day[weekday]
+                        class_id = rng.choice(options) if options else None
+                    # str(datetime) per row dominates rendering; the date part repeats
+                    prefix = days_seen.get(day)
+                    if prefix is None:
+                        prefix = days_seen[day] = day.strftime("%Y-%m-%d ")
+                    checkin_text = prefix + _clock(seconds)
+                    checkout_text = None
+                    if day + timedelta(seconds=checkout_seconds) < self.now:
+                        checkout_text = prefix + _clock(checkout_seconds)
+                    checkin_id += 1
+                    yield (checkin_id, member_id, class_id, checkin_text, checkout_text, checkin_text)
+                week += timedelta(days=7)
+
+    # -- coach sessions -------------------------------------------------------
+
+    def sessions(self):
+        """Weekly slots per coach over the history window plus four weeks ahead."""
+        self.session_meta = []
+        session_id = self.base["coach_class_sessions"]
+        weeks = math.ceil(self.args.days / 7) + 4
+        for coach_id, gym_id in self.coaches:
+            rng = self.rng("sessions", coach_id)
+            slots = [
+                (rng.choices(range(7), DAY_WEIGHTS)[0], int(_visit_hour(rng)), rng.choice(CLASS_TYPES)[0])
+                for _ in range(rng.randint(2, 5))
+            ]
+            capacity = rng.randint(8, 20)
+            for week in range(weeks):
+                week_start = _monday(self.window_start) + timedelta(weeks=week)
+                for weekday, hour, title in slots:
+                    start = week_start + timedelta(days=weekday, hours=hour)
+                    session_id += 1
+                    self.session_meta.append((session_id, gym_id, capacity, hour, start))
+                    yield (
+                        session_id, coach_id, title, f"Sala {rng.randint(1, 4)}", start,
+                        start + timedelta(minutes=60), capacity, self.window_start,
+                    )
+
+    def attendees(self):
+        attendee_id = self.base["coach_class_attendees"]
+        for session_id, gym_id, capacity, hour, start in self.session_meta:
+            pool = self.gym_members[gym_id]
+            if not pool:
+                continue
+            rng = self.rng("attendees", session_id)
+            # Peak hours fill up, mid-day sessions run half empty
+            fill = 0.9 if hour in (6, 7, 8, 18, 19, 20) else 0.55
+            wanted = min(len(pool), max(0, round(capacity * fill * rng.uniform(0.7, 1.1))))
+            past = start < self.now
+            for index in rng.sample(range(len(pool)), wanted):
+                attendee_id += 1
+                if not past:
+                    status = "REGISTERED"
+                else:
+                    roll = rng.random()
+                    status = "ATTENDED" if roll < 0.8 else "CANCELLED" if roll < 0.92 else "REGISTERED"
+                yield (attendee_id, session_id, pool[index], status, start - timedelta(days=rng.randint(0, 6)))
+
+
+def _accumulate(values):
+    total = 0.0
+    for value in values:
+        total += value
+        yield total
+
+
+def _monday(moment):
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(days=midnight.weekday())
+
+
+def _clock(seconds):
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _visit_hour(rng):
+    _, mean, spread = rng.choices(HOUR_MODES, [mode[0] for mode in HOUR_MODES])[0]
+    return min(max(rng.gauss(mean, spread), OPEN_HOUR), CLOSE_HOUR - 1)
+
+
+def _poisson(rng, rate):
+    # Knuth's method; rates here are single digits
+    limit, k, p = math.exp(-rate), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _ascii(text):
+    return text.translate(str.maketrans("áéíóúñü ", "aeiounu-"))
+
+
+# table -> (columns, generator method)
+LOADS = (
+    ("gyms", ("id", "name", "location", "phone", "email", "hours", "slug", "created_at", "updated_at"), "gyms"),
+    ("gym_membership_plans",
+     ("id", "gym_id", "name", "price", "period", "features", "popular", "order", "updated_at"), "plans"),
+    ("gym_schedules",
+     ("id", "gym_id", "day_of_week", "open_time", "close_time", "is_closed", "updated_at"), "schedules"),
+    ("classes",
+     ("id", "name", "instructor_name", "day_of_week", "time", "duration", "capacity", "enrolled", "type",
+      "price", "updated_at"), "classes"),
+    ("user_accounts", ("id", "name", "email", "role", "updated_at"), "user_accounts"),
+    ("coach_profiles",
+     ("id", "user_account_id", "role", "status", "experience_years", "specialties", "gym_id", "updated_at"),
+     "coach_profiles"),
+    ("members",
+     ("id", "name", "email", "phone", "membership_type", "membership_start", "membership_end", "status",
+      "gym_id", "created_at", "updated_at"), "members"),
+    ("check_ins", ("id", "member_id", "class_id", "checkin_time", "checkout_time", "created_at"), "check_ins"),
+    ("coach_class_sessions",
+     ("id", "coach_id", "title", "location", "start_date", "end_date", "capacity", "updated_at"), "sessions"),
+    ("coach_class_attendees", ("id", "session_id", "member_id", "status", "created_at"), "attendees"),
+)
+
+
+def current_max_ids(cursor):
+    cursor.execute(
+        "SELECT " + ", ".join(f'(SELECT COALESCE(MAX(id), 0) FROM "{table}")' for table in TABLES) + ";"
+    )
+    return dict(zip(TABLES, cursor.fetchone()))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            # Ids are assigned here, so no one else may insert meanwhile; readers are not blocked
+            cursor.execute("LOCK TABLE " + ", ".join(f'"{t}"' for t in TABLES) + " IN EXCLUSIVE MODE;")
+            generator = Generator(args, current_max_ids(cursor))
+            if is_partitioned(cursor, "check_ins"):
+                # See partition-checkins.py: every generated month needs its partition
+                ensure_partitions(cursor, "check_ins", generator.window_start, generator.now)
+
+            print(f"🔄 Generando datos (semilla {args.seed}, hasta {args.until})...\n")
+            with statement_timeout(conn, 0):
+                for table, columns, method in LOADS:
+                    table_started = time.perf_counter()
+                    count = copy_rows(cursor, table, columns, getattr(generator, method)())
+                    sync_sequence(cursor, table)
+                    elapsed = time.perf_counter() - table_started
+                    rate = count / elapsed if elapsed > 0 else 0
+                    print(f"  ✓ {table}: {count:,} filas en {elapsed:.2f}s ({rate:,.0f} filas/s)")
+
+            print("\n💾 Confirmando transacción...")
+            conn.commit()
+            cursor.execute("ANALYZE " + ", ".join(f'"{t}"' for t in TABLES) + ";")
+            cursor.close()
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    print(f"\n✅ Datos generados en {time.perf_counter() - started:.2f}s")
+    print("   - Ejecuta setup-gym-auth.py para asignar código y contraseña a los gimnasios nuevos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""Import a gym's member roster or check-in history from CSV or Parquet.
+
+The file is streamed into a temporary staging table (CSV goes to the
+server as read; Parquet in record batches), so memory stays flat however
+large it is. Validation and normalisation run as set-based SQL over the
+whole staging table:
+
+* emails are trimmed and lowercased, and must look like an address;
+* ``membership_type`` is matched case-insensitively to the gym's plans
+  and stored with the plan's exact name (the stats route compares names);
+* dates are read as ``YYYY-MM-DD`` or ``DD/MM/YYYY``, with optional time;
+  a missing end date is derived from the plan's period;
+* status accepts the Spanish names (activo, vencido, cancelado...).
+
+Valid rows are merged in batches, one commit each. Members are upserted
+on ``email``; the last row for an email in the file wins and members of
+other gyms are never touched. Check-ins already present for the same
+member and time are skipped, so an import can be run again safely.
+Rejected rows go to ``<file>.rechazados.csv`` with their line number and
+reason, ready to fix and import again.
+
+Usage:
+    python scripts/import-data.py members socios.csv --gym mi-gimnasio
+    python scripts/import-data.py check-ins visitas.parquet --gym 12
+    python scripts/import-data.py members socios.csv --gym 12 --dry-run
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connection, statement_timeout
+from db.copy import copy_file, copy_query_to
+from db.partitions import ensure_partitions, is_partitioned
+from db.prisma import quote
+
+RAW_TABLE = "_import_raw"
+CLEAN_TABLE = "_import_clean"
+
+# Header spellings seen in gym software exports, after normalize_header()
+MEMBER_COLUMNS = {
+    "name": ("name", "nombre", "nombre_completo", "socio", "cliente"),
+    "email": ("email", "correo", "correo_electronico", "e_mail", "mail"),
+    "phone": ("phone", "telefono", "celular", "movil", "whatsapp"),
+    "membership_type": ("membership_type", "plan", "membresia", "tipo", "tipo_de_membresia"),
+    "membership_start": ("membership_start", "inicio", "fecha_inicio", "fecha_de_inicio", "alta_membresia"),
+    "membership_end": ("membership_end", "fin", "fecha_fin", "fecha_de_fin", "vencimiento", "vence"),
+    "status": ("status", "estado", "estatus"),
+    "created_at": ("created_at", "fecha_alta", "fecha_de_alta", "registro", "fecha_registro"),
+}
+CHECKIN_COLUMNS = {
+    "email": ("email", "member_email", "correo", "correo_electronico", "socio_email"),
+    "checkin_time": ("checkin_time", "check_in", "checkin", "entrada", "fecha", "fecha_entrada", "fecha_hora"),
+    "checkout_time": ("checkout_time", "check_out", "checkout", "salida", "fecha_salida"),
+}
+REQUIRED = {
+    "members": ("name", "email", "membership_type", "membership_start"),
+    "check-ins": ("email", "checkin_time"),
+}
+
+STATUS_ALIASES = {
+    "active": "active", "activo": "active", "activa": "active", "vigente": "active",
+    "expired": "expired", "vencido": "expired", "vencida": "expired", "expirado": "expired",
+    "cancelled": "cancelled", "canceled": "cancelled", "cancelado": "cancelled", "cancelada": "cancelled",
+    "baja": "cancelled",
+    "inactive": "inactive", "inactivo": "inactive", "inactiva": "inactive",
+}
+
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+# Dates without exceptions: a bad value becomes NULL instead of aborting
+# the statement. The day is checked against the length of its month, so
+# 31/02 is rejected rather than rolled into March.
+PARSE_FUNCTIONS_SQL = r"""
+    CREATE OR REPLACE FUNCTION pg_temp.import_timestamp(value text) RETURNS timestamp
+    LANGUAGE plpgsql IMMUTABLE AS $$
+    DECLARE
+        p int[];
+        y int;
+        mo int;
+        d int;
+    BEGIN
+        -- Match without capture groups and split by hand: captures cost ~10x more per row
+        value := btrim(value);
+        IF value ~ '^\d{4}-\d{1,2}-\d{1,2}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$' THEN
+            p := string_to_array(translate(value, 'T:-.', '    '), ' ')::int[];
+            y := p[1]; mo := p[2]; d := p[3];
+        ELSIF value ~ '^\d{1,2}/\d{1,2}/\d{4}(?:[ T]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$' THEN
+            p := string_to_array(translate(value, 'T:/.', '    '), ' ')::int[];
+            y := p[3]; mo := p[2]; d := p[1];
+        ELSE
+            RETURN NULL;
+        END IF;
+        IF y NOT BETWEEN 1900 AND 2100 OR mo NOT BETWEEN 1 AND 12 OR d NOT BETWEEN 1 AND 31
+            OR COALESCE(p[4], 0) > 23 OR COALESCE(p[5], 0) > 59 OR COALESCE(p[6], 0) > 59
+            OR d > extract(day FROM make_date(y, mo, 1) + interval '1 month - 1 day') THEN
+            RETURN NULL;
+        END IF;
+        RETURN make_timestamp(y, mo, d, COALESCE(p[4], 0), COALESCE(p[5], 0), COALESCE(p[6], 0));
+    END;
+    $$;
+"""
+
+# One row per lowercased email; an exact-case match wins over another spelling
+MEMBER_LOOKUP_SQL = """
+    SELECT DISTINCT ON (lower(email)) lower(email) AS key, id, email, gym_id
+    FROM members
+    ORDER BY lower(email), email = lower(email) DESC, id
+"""
+
+CLEAN_MEMBERS_SQL = f"""
+    CREATE TEMP TABLE {CLEAN_TABLE} AS
+    WITH plans AS (
+        SELECT DISTINCT ON (lower(name)) name, period
+        FROM gym_membership_plans
+        WHERE gym_id = %(gym_id)s
+        ORDER BY lower(name), "order", id
+    ), statuses (alias, status) AS (
+        VALUES {{statuses}}
+    ), parsed AS (
+        SELECT
+            line,
+            NULLIF(btrim(name), '') AS name,
+            lower(NULLIF(btrim(email), '')) AS email,
+            NULLIF(regexp_replace(phone, '[^0-9+]', '', 'g'), '') AS phone,
+            NULLIF(btrim(membership_type), '') AS plan,
+            pg_temp.import_timestamp(membership_start) AS membership_start,
+            pg_temp.import_timestamp(membership_end) AS membership_end,
+            NULLIF(btrim(membership_end), '') IS NOT NULL AS has_end,
+            lower(NULLIF(btrim(status), '')) AS status,
+            pg_temp.import_timestamp(created_at) AS created_at
+        FROM {RAW_TABLE}
+    ), resolved AS (
+        SELECT
+            r.*,
+            p.name AS plan_name,
+            COALESCE(r.membership_end, r.membership_start + CASE p.period
+                WHEN 'mes' THEN interval '1 month'
+                WHEN 'trimestre' THEN interval '3 months'
+                WHEN 'año' THEN interval '1 year'
+            END) AS end_at,
+            s.status AS status_name,
+            m.id AS member_id, m.email AS member_email, m.gym_id AS member_gym,
+            max(r.line) OVER (PARTITION BY r.email) AS last_line
+        FROM parsed r
+        LEFT JOIN plans p ON lower(p.name) = lower(r.plan)
+        LEFT JOIN statuses s ON s.alias = r.status
+        LEFT JOIN ({MEMBER_LOOKUP_SQL}) m ON m.key = r.email
+    )
+    SELECT
+        line,
+        name,
+        COALESCE(member_email, email) AS email,
+        phone,
+        COALESCE(plan_name, plan) AS membership_type,
+        membership_start,
+        end_at AS membership_end,
+        COALESCE(status_name, CASE WHEN end_at < now() THEN 'expired' ELSE 'active' END) AS status,
+        COALESCE(created_at, membership_start) AS created_at,
+        CASE
+            WHEN email IS NULL THEN 'falta el email'
+            WHEN email !~ '{EMAIL_PATTERN}' THEN 'email inválido'
+            WHEN line <> last_line THEN 'email repetido en el archivo (vale la fila ' || last_line || ')'
+            WHEN name IS NULL THEN 'falta el nombre'
+            WHEN plan IS NULL THEN 'falta el tipo de membresía'
+            WHEN plan_name IS NULL AND EXISTS (SELECT 1 FROM plans) THEN 'tipo de membresía que el gimnasio no ofrece'
+            WHEN membership_start IS NULL THEN 'fecha de inicio vacía o inválida'
+            WHEN has_end AND membership_end IS NULL THEN 'fecha de fin inválida'
+            WHEN end_at IS NULL THEN 'falta la fecha de fin'
+            WHEN end_at < membership_start THEN 'la fecha de fin es anterior al inicio'
+            WHEN status IS NOT NULL AND status_name IS NULL THEN 'estado desconocido'
+            WHEN member_gym IS NOT NULL AND member_gym <> %(gym_id)s THEN 'el email es de un miembro de otro gimnasio'
+        END AS reason
+    FROM resolved;
+"""
+
+CLEAN_CHECKINS_SQL = f"""
+    CREATE TEMP TABLE {CLEAN_TABLE} AS
+    WITH parsed AS (
+        SELECT
+            line,
+            lower(NULLIF(btrim(email), '')) AS email,
+            pg_temp.import_timestamp(checkin_time) AS checkin_time,
+            pg_temp.import_timestamp(checkout_time) AS checkout_time,
+            NULLIF(btrim(checkout_time), '') IS NOT NULL AS has_checkout
+        FROM {RAW_TABLE}
+    ), resolved AS (
+        SELECT
+            r.*,
+            m.id AS member_id,
+            m.gym_id AS member_gym,
+            row_number() OVER (PARTITION BY m.id, r.checkin_time ORDER BY r.line) AS occurrence
+        FROM parsed r
+        LEFT JOIN ({MEMBER_LOOKUP_SQL}) m ON m.key = r.email
+    )
+    SELECT
+        line, member_id, checkin_time, checkout_time,
+        CASE
+            WHEN email IS NULL THEN 'falta el email'
+            WHEN member_id IS NULL THEN 'no hay ningún miembro con ese email'
+            WHEN %(gym_id)s IS NOT NULL AND member_gym IS DISTINCT FROM %(gym_id)s
+                THEN 'el miembro pertenece a otro gimnasio'
+            WHEN checkin_time IS NULL THEN 'fecha de entrada vacía o inválida'
+            WHEN has_checkout AND checkout_time IS NULL THEN 'fecha de salida inválida'
+            WHEN checkout_time < checkin_time THEN 'la salida es anterior a la entrada'
+            WHEN occurrence > 1 THEN 'check-in repetido en el archivo'
+        END AS reason
+    FROM resolved;
+"""
+
+MERGE_MEMBERS_SQL = f"""
+    INSERT INTO members (
+        name, email, phone, membership_type, membership_start, membership_end, status, gym_id,
+        created_at, updated_at
+    )
+    SELECT name, email, phone, membership_type, membership_start, membership_end, status, %(gym_id)s,
+           created_at, now()
+    FROM {CLEAN_TABLE}
+    WHERE reason IS NULL AND line > %(after)s AND line <= %(upto)s
+    ON CONFLICT (email) DO UPDATE
+    SET name = EXCLUDED.name,
+        phone = COALESCE(EXCLUDED.phone, members.phone),
+        membership_type = EXCLUDED.membership_type,
+        membership_start = EXCLUDED.membership_start,
+        membership_end = EXCLUDED.membership_end,
+        status = EXCLUDED.status,
+        gym_id = EXCLUDED.gym_id,
+        updated_at = now()
+    -- Validation already rejects these; this guards rows added since
+    WHERE members.gym_id IS NULL OR members.gym_id = EXCLUDED.gym_id
+    RETURNING xmax = 0;
+"""
+
+MERGE_CHECKINS_SQL = f"""
+    INSERT INTO check_ins (member_id, checkin_time, checkout_time, created_at)
+    SELECT c.member_id, c.checkin_time, c.checkout_time, now()
+    FROM {CLEAN_TABLE} c
+    WHERE c.reason IS NULL AND c.line > %(after)s AND c.line <= %(upto)s
+    AND NOT EXISTS (
+        SELECT 1 FROM check_ins x WHERE x.member_id = c.member_id AND x.checkin_time = c.checkin_time
+    );
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Importa miembros o check-ins desde CSV o Parquet")
+    parser.add_argument("kind", choices=("members", "check-ins"), help="Qué se importa")
+    parser.add_argument("file", type=Path, help="Archivo .csv o .parquet")
+    parser.add_argument("--gym", help="Id o slug del gimnasio (obligatorio para miembros)")
+    parser.add_argument("--delimiter", help="Separador del CSV (por defecto se detecta: ',' o ';')")
+    parser.add_argument("--encoding", default="utf-8-sig", help="Codificación del CSV (por defecto utf-8)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Filas por lote al fusionar (por defecto 50000)")
+    parser.add_argument("--rejects", type=Path, help="Archivo de rechazados (por defecto <archivo>.rechazados.csv)")
+    parser.add_argument("--dry-run", action="store_true", help="Validar y escribir rechazados sin importar nada")
+    args = parser.parse_args(argv)
+    if args.kind == "members" and not args.gym:
+        parser.error("--gym es obligatorio al importar miembros")
+    if args.batch_size < 1:
+        parser.error("--batch-size debe ser al menos 1")
+    if args.rejects is None:
+        args.rejects = args.file.with_name(args.file.stem + ".rechazados.csv")
+    return args
+
+
+def normalize_header(name):
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return "_".join(text.lower().replace("-", " ").replace(".", " ").split())
+
+
+def map_headers(headers, aliases):
+    """Staging column for each file column (None for the ones not imported)."""
+    lookup = {alias: column for column, names in aliases.items() for alias in names}
+    mapping, taken = [], set()
+    for header in headers:
+        column = lookup.get(normalize_header(header))
+        if column in taken:
+            column = None
+        taken.add(column)
+        mapping.append(column)
+    return mapping
+
+
+def staging_columns(headers, mapping):
+    """(staging column, original header) pairs; unknown columns are kept as _extra_N."""
+    return [(column or f"_extra_{i}", header) for i, (column, header) in enumerate(zip(mapping, headers))]
+
+
+def create_staging(cursor, aliases, columns):
+    names = list(aliases) + [name for name, _ in columns if name not in aliases]
+    body = ", ".join(f"{quote(name)} text" for name in names)
+    cursor.execute(f"DROP TABLE IF EXISTS {RAW_TABLE}, {CLEAN_TABLE};")
+    cursor.execute(f"CREATE TEMP TABLE {RAW_TABLE} (line bigint GENERATED ALWAYS AS IDENTITY, {body});")
+
+
+def load_csv(cursor, args, aliases):
+    with args.file.open(encoding=args.encoding, newline="") as file:
+        first = file.readline()
+        delimiter = args.delimiter or (";" if first.count(";") > first.count(",") else ",")
+        headers = next(csv.reader([first], delimiter=delimiter))
+        columns = staging_columns(headers, map_headers(headers, aliases))
+        create_staging(cursor, aliases, columns)
+        count = copy_file(cursor, RAW_TABLE, [name for name, _ in columns], file, delimiter)
+    return columns, count
+
+
+def load_parquet(cursor, args, aliases):
+    try:
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("❌ Error: pyarrow no está instalado (necesario para archivos .parquet)")
+        print("   Instala con: pip install pyarrow")
+        sys.exit(1)
+
+    parquet = pq.ParquetFile(args.file)
+    headers = parquet.schema_arrow.names
+    mapping = map_headers(headers, aliases)
+    columns = [(column, header) for column, header in zip(mapping, headers) if column]
+    create_staging(cursor, aliases, columns)
+
+    # pyarrow renders each record batch to CSV in bulk; one COPY per batch
+    count = 0
+    options = pacsv.WriteOptions(include_header=False)
+    for batch in parquet.iter_batches(batch_size=args.batch_size, columns=[header for _, header in columns]):
+        buffer = io.BytesIO()
+        pacsv.write_csv(batch, buffer, options)
+        buffer.seek(0)
+        count += copy_file(cursor, RAW_TABLE, [name for name, _ in columns], buffer)
+    return columns, count
+
+
+def resolve_gym(cursor, value):
+    cursor.execute(
+        "SELECT id, name FROM gyms WHERE id::text = %s OR slug = lower(%s) ORDER BY id::text = %s DESC LIMIT 1;",
+        (value, value, value),
+    )
+    return cursor.fetchone()
+
+
+def validate(cursor, kind, gym_id):
+    cursor.execute(PARSE_FUNCTIONS_SQL)
+    if kind == "members":
+        statuses = ", ".join(cursor.mogrify("(%s, %s)", pair).decode() for pair in STATUS_ALIASES.items())
+        cursor.execute(CLEAN_MEMBERS_SQL.replace("{statuses}", statuses), {"gym_id": gym_id})
+    else:
+        cursor.execute(CLEAN_CHECKINS_SQL, {"gym_id": gym_id})
+    cursor.execute(f"CREATE INDEX ON {CLEAN_TABLE} (line);")
+    # Autovacuum never analyzes temporary tables
+    cursor.execute(f"ANALYZE {CLEAN_TABLE};")
+    cursor.execute(f"SELECT COUNT(*) FILTER (WHERE reason IS NULL), COUNT(*), MAX(line) FROM {CLEAN_TABLE};")
+    return cursor.fetchone()
+
+
+def write_rejects(cursor, columns, path):
+    select = ", ".join(f"r.{quote(name)} AS {quote(header)}" for name, header in columns)
+    query = (
+        f"SELECT r.line AS fila, c.reason AS motivo, {select} "
+        f"FROM {CLEAN_TABLE} c JOIN {RAW_TABLE} r USING (line) "
+        f"WHERE c.reason IS NOT NULL ORDER BY r.line"
+    )
+    with path.open("w", encoding="utf-8", newline="") as file:
+        return copy_query_to(cursor, query, file)
+
+
+def reject_summary(cursor):
+    cursor.execute(
+        f"SELECT regexp_replace(reason, ' \\(.*\\)$', ''), COUNT(*) FROM {CLEAN_TABLE} "
+        f"WHERE reason IS NOT NULL GROUP BY 1 ORDER BY 2 DESC;"
+    )
+    return cursor.fetchall()
+
+
+def merge(conn, cursor, kind, gym_id, last_line, batch_size):
+    """Merge valid rows one committed batch at a time; return (inserted, updated)."""
+    inserted = updated = 0
+    started = time.perf_counter()
+    for after in range(0, last_line, batch_size):
+        params = {"gym_id": gym_id, "after": after, "upto": after + batch_size}
+        if kind == "members":
+            cursor.execute(MERGE_MEMBERS_SQL, params)
+            flags = [row[0] for row in cursor.fetchall()]
+            inserted += sum(flags)
+            updated += len(flags) - sum(flags)
+        else:
+            cursor.execute(MERGE_CHECKINS_SQL, params)
+            inserted += cursor.rowcount
+        conn.commit()
+        done = min(after + batch_size, last_line)
+        elapsed = time.perf_counter() - started
+        print(f"    ⏳ {100 * done / last_line:.0f}% ({done:,} filas, {done / elapsed:,.0f} filas/s)")
+    return inserted, updated
+
+
+def ensure_checkin_partitions(cursor):
+    if not is_partitioned(cursor, "check_ins"):
+        return []
+    cursor.execute(f"SELECT MIN(checkin_time), MAX(checkin_time) FROM {CLEAN_TABLE} WHERE reason IS NULL;")
+    first, last = cursor.fetchone()
+    if first is None:
+        return []
+    return ensure_partitions(cursor, "check_ins", first, last)
+
+
+def rate(count, elapsed):
+    return f"{count / elapsed:,.0f} filas/s" if elapsed > 0 else "-"
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.file.exists():
+        print(f"❌ No existe el archivo {args.file}")
+        sys.exit(1)
+    aliases = MEMBER_COLUMNS if args.kind == "members" else CHECKIN_COLUMNS
+    started = time.perf_counter()
+
+    try:
+        with connection() as conn:
+            with statement_timeout(conn, 0):
+                cursor = conn.cursor()
+                gym_id = None
+                if args.gym:
+                    gym = resolve_gym(cursor, args.gym)
+                    if gym is None:
+                        print(f"❌ No existe el gimnasio {args.gym}")
+                        sys.exit(1)
+                    gym_id = gym[0]
+                    print(f"🏋️  Gimnasio: {gym[1]} (id {gym_id})\n")
+
+                print(f"📥 Cargando {args.file.name}...")
+                step = time.perf_counter()
+                if args.file.suffix.lower() == ".parquet":
+                    columns, total = load_parquet(cursor, args, aliases)
+                else:
+                    columns, total = load_csv(cursor, args, aliases)
+                elapsed = time.perf_counter() - step
+                print(f"  ✓ {total:,} filas en {elapsed:.2f}s ({rate(total, elapsed)})")
+
+                found = {name for name, _ in columns}
+                missing = [c for c in REQUIRED[args.kind] if c not in found]
+                if missing:
+                    print(f"❌ Faltan columnas obligatorias: {', '.join(missing)}")
+                    print(f"   Encabezados del archivo: {', '.join(header for _, header in columns)}")
+                    sys.exit(1)
+                ignored = [header for name, header in columns if name.startswith("_extra_")]
+                if ignored:
+                    print(f"  ℹ️  Columnas ignoradas: {', '.join(ignored)}")
+
+                print("\n🔍 Validando...")
+                step = time.perf_counter()
+                valid, total, last_line = validate(cursor, args.kind, gym_id)
+                elapsed = time.perf_counter() - step
+                print(f"  ✓ {valid:,} válidas, {total - valid:,} rechazadas en {elapsed:.2f}s ({rate(total, elapsed)})")
+                for reason, count in reject_summary(cursor):
+                    print(f"    - {reason}: {count:,}")
+                if valid < total:
+                    written = write_rejects(cursor, columns, args.rejects)
+                    print(f"  📝 {written:,} filas rechazadas en {args.rejects}")
+                conn.commit()
+
+                if args.dry_run:
+                    print("\nℹ️  --dry-run: no se importó nada")
+                    return
+                if not valid:
+                    print("\n⚠️  No hay filas válidas que importar")
+                    return
+
+                print("\n💾 Importando...")
+                step = time.perf_counter()
+                if args.kind == "check-ins":
+                    for name in ensure_checkin_partitions(cursor):
+                        print(f"  ✓ Partición creada: {name}")
+                    conn.commit()
+                inserted, updated = merge(conn, cursor, args.kind, gym_id, last_line, args.batch_size)
+                elapsed = time.perf_counter() - step
+                cursor.execute(f"DROP TABLE IF EXISTS {RAW_TABLE}, {CLEAN_TABLE};")
+                cursor.close()
+
+    except (psycopg2.Error, DatabaseConfigError, ValueError, OSError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    label = "miembros" if args.kind == "members" else "check-ins"
+    print(f"  ✓ {inserted:,} {label} nuevos", end="")
+    if args.kind == "members":
+        print(f", {updated:,} actualizados", end="")
+    else:
+        print(f", {valid - inserted:,} ya existían", end="")
+    print(f" en {elapsed:.2f}s ({rate(valid, elapsed)})")
+
+    total_elapsed = time.perf_counter() - started
+    print(f"\n✅ Importación completada en {total_elapsed:.2f}s ({rate(total, total_elapsed)})")
+    print("   - Ejecuta rollup-stats.py para actualizar las estadísticas (--rebuild si importaste historial)")
+
+
+if __name__ == "__main__":
+    main()
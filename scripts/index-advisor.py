@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Propose (and optionally build) the indexes the API routes are missing.
+
+Lists every candidate from ``db/advisor.py`` with its estimated size, the
+seq-scan counters of its table and, when pg_stat_statements is loaded,
+the slowest statements it would serve. With --apply the missing indexes
+are built CONCURRENTLY through the migration runner (lock_timeout, retries,
+progress) and the affected route queries are benchmarked before and after.
+
+Usage:
+    python scripts/index-advisor.py                     # solo el informe
+    python scripts/index-advisor.py --apply             # construir todos
+    python scripts/index-advisor.py --apply --index members_gym_id_created_at_idx
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+
+import psycopg2
+
+import benchmark
+from db import DatabaseConfigError, connection
+from db.advisor import advise
+from db.catalog import format_bytes
+from db.migrate import ONLINE_INDEX, PHASE_ONLINE, Plan, RunOptions, apply_plan
+from db.prisma import quote, quote_list
+from db.queries import find_queries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sugiere índices para las consultas de las rutas")
+    parser.add_argument("--apply", action="store_true", help="Construir los índices sugeridos (CONCURRENTLY)")
+    parser.add_argument("--index", action="append", help="Construir solo este índice (se puede repetir)")
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=1000,
+        help="Ignorar tablas con menos filas estimadas (por defecto 1000)",
+    )
+    parser.add_argument("--no-benchmark", action="store_true", help="No medir las consultas antes y después")
+    parser.add_argument("--iterations", type=int, default=30, help="Ejecuciones por consulta al medir")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conexiones simultáneas al medir")
+    return parser.parse_args(argv)
+
+
+def print_report(advice, has_statements):
+    actionable = [a for a in advice if a.actionable]
+    print(f"📊 Índices sugeridos ({len(actionable)}):\n")
+    for item in actionable:
+        c = item.candidate
+        where = f" WHERE {c.where}" if c.where else ""
+        print(f"  ➕ {c.name}")
+        print(f"     {c.table}({quote_list(c.columns)}){where}")
+        print(f"     Motivo: {c.reason}")
+        print(f"     Tamaño estimado: {format_bytes(item.estimated_bytes)} ({item.rows:,} filas en la tabla)")
+        print(f"     Lecturas secuenciales: {item.seq_scan:,} ({item.seq_tup_read:,} filas), por índice: {item.idx_scan:,}")
+        for statement in item.statements:
+            print(f"     ⏱️  {statement['calls']:,} llamadas, {statement['mean_ms']:.2f} ms promedio: {statement['query']}")
+        if c.prisma_hint():
+            print(f"     schema.prisma: {c.prisma_hint()}")
+        print()
+
+    covered = [a for a in advice if a.covered_by]
+    if covered:
+        print("✅ Ya cubiertos:")
+        for item in covered:
+            print(f"  - {item.candidate.table}({', '.join(item.candidate.columns)}) por {item.covered_by}")
+        print()
+
+    impossible = [a for a in advice if a.missing_columns]
+    for item in impossible:
+        print(f"⚠️  {item.candidate.table} no tiene la columna {', '.join(item.missing_columns)}; "
+              f"no se puede indexar ({item.candidate.reason})")
+    if impossible:
+        print()
+
+    if not has_statements:
+        print("ℹ️  pg_stat_statements no está disponible; solo se usan los contadores de pg_stat_user_tables\n")
+
+
+def build_indexes(selected):
+    plan = Plan()
+    for item in selected:
+        c = item.candidate
+        plan.add(PHASE_ONLINE, c.table, f"Crear índice {c.name} (concurrente)", c.definition(),
+                 ONLINE_INDEX, blocking=False, index=c.name)
+    apply_plan(
+        plan,
+        on_step=lambda step: print(f"  ✓ {step.description}"),
+        on_progress=lambda message: print(f"    ⏳ {message}"),
+        options=RunOptions(),
+    )
+    with connection(autocommit=True) as conn:
+        with conn.cursor() as cursor:
+            for table in sorted({item.candidate.table for item in selected}):
+                cursor.execute(f"ANALYZE {quote(table)};")
+
+
+def run_queries(args, names):
+    bench_args = benchmark.parse_args(
+        ["--iterations", str(args.iterations), "--concurrency", str(args.concurrency), "--no-explain"]
+        + [part for name in names for part in ("--query", name)]
+    )
+    return benchmark.run_benchmark(bench_args, find_queries(names))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            advice, has_statements = advise(cursor, args.min_rows)
+            cursor.close()
+
+        print_report(advice, has_statements)
+        if not args.apply:
+            if any(a.actionable for a in advice):
+                print("ℹ️  Ejecuta con --apply para construirlos")
+            return
+
+        selected = [a for a in advice if a.actionable and (not args.index or a.candidate.name in args.index)]
+        if not selected:
+            print("✅ No hay índices que construir")
+            return
+
+        queries = sorted({name for item in selected for name in item.candidate.queries})
+        before = None
+        if queries and not args.no_benchmark:
+            print("⏱️  Antes:\n")
+            before = run_queries(args, queries)
+
+        print("\n🔨 Construyendo índices...\n")
+        build_indexes(selected)
+
+        if before is not None:
+            print("\n⏱️  Después:\n")
+            after = run_queries(args, queries)
+            benchmark.compare(after, before, threshold=0)
+            benchmark.RESULTS_DIR.mkdir(exist_ok=True)
+            output = benchmark.RESULTS_DIR / f"index-advisor-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+            output.write_text(
+                json.dumps({"indexes": [a.candidate.name for a in selected], "before": before, "after": after},
+                           indent=2, default=str),
+                encoding="utf-8",
+            )
+            print(f"\n💾 Resultados guardados en {output}")
+
+        print("\n✅ Índices creados. Añade las líneas @@index sugeridas a schema.prisma para que Prisma los conserve")
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
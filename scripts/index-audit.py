@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""Find duplicate, redundant and unused indexes and add covering indexes for session lookups.
+
+Reads every index from pg_index and its scans from pg_stat_user_indexes
+(see ``db/indexes.py``) and reports:
+
+- duplicates and redundant prefixes, with the index that already serves
+  their reads (e.g. the old ``idx_user_accounts_email`` next to the
+  unique ``user_accounts_email_key``);
+- indexes with no scans since the statistics were last reset;
+- the covering (INCLUDE) index that makes ``getSession()`` an
+  index-only scan, and whether it exists;
+- covering indexes an earlier run created and that are no longer safe
+  (``WITHDRAWN_INDEXES``, e.g. the gyms one over free-text columns).
+
+With --apply the covering indexes are built and the redundant and
+withdrawn indexes dropped, all CONCURRENTLY through the migration runner; unused indexes
+are only dropped with --drop-unused. The touched tables are then
+vacuumed, so index-only scans skip the heap, and the session lookups are
+checked with EXPLAIN ANALYZE.
+
+Usage:
+    python scripts/index-audit.py                         # solo el informe
+    python scripts/index-audit.py --apply                 # índices de cobertura + borrar redundantes
+    python scripts/index-audit.py --apply --drop-unused   # también los que no se usan
+    python scripts/index-audit.py --output audit.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connection
+from db.catalog import format_bytes, introspect
+from db.indexes import (
+    WITHDRAWN_INDEXES,
+    find_covering,
+    find_redundant,
+    find_unused,
+    find_withdrawn,
+    inventory,
+    lookup_sql,
+    stats_reset,
+)
+from db.migrate import ONLINE_INDEX, PHASE_ONLINE, Plan, RunOptions, apply_plan
+from db.prisma import load_schema, quote
+
+KINDS = {
+    "duplicate": "duplicado de",
+    "prefix": "prefijo de",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Audita los índices: duplicados, sin uso y de cobertura")
+    parser.add_argument("--apply", action="store_true",
+                        help="Crear los índices de cobertura y borrar los redundantes y retirados (CONCURRENTLY)")
+    parser.add_argument("--drop-unused", action="store_true", help="Con --apply, borrar también los índices sin uso")
+    parser.add_argument("--no-covering", action="store_true", help="No crear los índices de cobertura")
+    parser.add_argument("--keep", action="append", default=[], help="No borrar este índice (se puede repetir)")
+    parser.add_argument("--output", help="Guardar el informe en este archivo JSON")
+    args = parser.parse_args(argv)
+    if args.drop_unused and not args.apply:
+        parser.error("--drop-unused requiere --apply")
+    return args
+
+
+def declared_indexes():
+    """Names of the indexes schema.prisma declares; dropping them would only bring them back."""
+    schema = load_schema()
+    return {index.name for table in schema.tables.values() for index in table.indexes}
+
+
+def describe(index):
+    include = f" INCLUDE ({', '.join(index.include)})" if index.include else ""
+    where = f" WHERE {index.predicate}" if index.predicate else ""
+    return f"{index.table}({', '.join(index.keys)}){include}{where}"
+
+
+def caveat(finding):
+    if finding.declared:
+        return "declarado en schema.prisma: quita la línea @@index para que no vuelva"
+    if finding.index.partitioned:
+        return "tabla particionada: no admite DROP INDEX CONCURRENTLY, bórralo en una ventana de mantenimiento"
+    return None
+
+
+def print_report(redundant, unused, withdrawn, covering, reset):
+    print(f"📊 Índices duplicados o redundantes ({len(redundant)}):\n")
+    for finding in redundant:
+        index, kept = finding.index, finding.kept_by
+        print(f"  🗑️  {index.name}: {describe(index)}")
+        print(f"     {KINDS[finding.kind]} {kept.name} ({describe(kept)})")
+        print(f"     {format_bytes(index.size)}, {index.scans:,} lecturas")
+        if caveat(finding):
+            print(f"     ⚠️  {caveat(finding)}")
+    print()
+
+    since = f" desde {reset:%Y-%m-%d %H:%M}" if reset else " desde que se creó la base de datos"
+    print(f"📊 Índices sin uso{since} ({len(unused)}):\n")
+    for finding in unused:
+        index = finding.index
+        print(f"  - {index.name}: {describe(index)}, {format_bytes(index.size)}")
+        if caveat(finding):
+            print(f"     ⚠️  {caveat(finding)}")
+    if unused:
+        print("\n  ℹ️  Sin lecturas aquí no significa sin uso en producción ni en réplicas: revísalo antes de --drop-unused")
+    print()
+
+    if withdrawn:
+        print(f"📊 Índices de cobertura retirados ({len(withdrawn)}):\n")
+        for finding in withdrawn:
+            index = finding.index
+            print(f"  🗑️  {index.name}: {describe(index)}, {format_bytes(index.size)}")
+            print(f"     {WITHDRAWN_INDEXES[index.name]}")
+        print()
+
+    print("📊 Índices de cobertura para las sesiones:\n")
+    for item in covering:
+        c = item.candidate
+        if item.missing_columns:
+            print(f"  ⚠️  {c.table} no tiene la columna {', '.join(item.missing_columns)} ({c.reason})")
+        elif item.covered_by:
+            print(f"  ✅ {c.table}({', '.join(c.columns)}) INCLUDE ({', '.join(c.include)}) ya cubierto por {item.covered_by}")
+        else:
+            print(f"  ➕ {c.name}")
+            print(f"     {c.table}({', '.join(c.columns)}) INCLUDE ({', '.join(c.include)})")
+            print(f"     Motivo: {c.reason}")
+    print()
+
+
+def apply_changes(create, drop):
+    plan = Plan()
+    for item in create:
+        c = item.candidate
+        plan.add(PHASE_ONLINE, c.table, f"Crear índice {c.name} (concurrente)", c.definition(),
+                 ONLINE_INDEX, blocking=False, index=c.name)
+    # Built before anything is dropped, so no read is left without an index
+    for finding in drop:
+        index = finding.index
+        plan.add(PHASE_ONLINE, index.table, f"Borrar índice {index.name} (concurrente)",
+                 f"DROP INDEX CONCURRENTLY IF EXISTS {quote(index.name)};",
+                 ONLINE_INDEX, blocking=False, index=index.name)
+    apply_plan(
+        plan,
+        on_step=lambda step: print(f"  ✓ {step.description}"),
+        on_progress=lambda message: print(f"    ⏳ {message}"),
+        options=RunOptions(),
+    )
+
+
+def vacuum(tables):
+    """VACUUM sets the visibility map bits that let index-only scans skip the heap."""
+    with connection(autocommit=True) as conn:
+        with conn.cursor() as cursor:
+            for table in sorted(tables):
+                cursor.execute(f"VACUUM (ANALYZE) {quote(table)};")
+                print(f"  ✓ VACUUM (ANALYZE) {table}")
+
+
+def check_lookups(cursor, covering):
+    """EXPLAIN ANALYZE each session lookup on one existing row."""
+    results = []
+    for item in covering:
+        if item.missing_columns:
+            continue
+        c = item.candidate
+        cursor.execute(f"SELECT {', '.join(quote(col) for col in c.columns)} FROM {quote(c.table)} LIMIT 1;")
+        row = cursor.fetchone()
+        if row is None:
+            print(f"  ℹ️  {c.table} está vacía, no hay nada que comprobar")
+            continue
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + lookup_sql(c), row)
+        plan = cursor.fetchone()[0][0]["Plan"]
+        result = {
+            "table": c.table,
+            "node": plan["Node Type"],
+            "index": plan.get("Index Name"),
+            "heap_fetches": plan.get("Heap Fetches"),
+            "ms": plan["Actual Total Time"],
+        }
+        results.append(result)
+        if result["node"] == "Index Only Scan":
+            print(f"  ✅ {c.table}: Index Only Scan con {result['index']}, "
+                  f"{result['heap_fetches']} lecturas del heap, {result['ms']:.3f} ms")
+        else:
+            on = f" con {result['index']}" if result["index"] else ""
+            print(f"  ⚠️  {c.table}: {result['node']}{on}, {result['ms']:.3f} ms "
+                  "(en tablas muy pequeñas el planificador prefiere leer la tabla)")
+    return results
+
+
+def to_json(finding):
+    index = finding.index
+    return {
+        "index": index.name,
+        "table": index.table,
+        "kind": finding.kind,
+        "kept_by": finding.kept_by.name if finding.kept_by else None,
+        "bytes": index.size,
+        "scans": index.scans,
+        "declared": finding.declared,
+        "definition": index.definition,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        declared = declared_indexes()
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                indexes = inventory(cursor)
+                tables = introspect(cursor)
+                reset = stats_reset(cursor)
+
+        covering = find_covering(indexes, tables)
+        withdrawn = find_withdrawn(indexes)
+        redundant = [f for f in find_redundant(indexes, declared) if f.index.name not in WITHDRAWN_INDEXES]
+        # A covering index that was just built has no scans yet
+        skip = {f.index.name for f in redundant + withdrawn} | {item.candidate.name for item in covering}
+        unused = find_unused(indexes, skip, declared)
+        print_report(redundant, unused, withdrawn, covering, reset)
+
+        if args.output:
+            report = {
+                "stats_reset": reset,
+                "redundant": [to_json(f) for f in redundant],
+                "unused": [to_json(f) for f in unused],
+                "withdrawn": [to_json(f) for f in withdrawn],
+                "covering": [
+                    {"index": item.candidate.name, "definition": item.candidate.definition(),
+                     "covered_by": item.covered_by, "missing_columns": list(item.missing_columns)}
+                    for item in covering
+                ],
+            }
+            Path(args.output).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+            print(f"💾 Informe guardado en {args.output}\n")
+
+        if not args.apply:
+            if redundant or withdrawn or any(item.actionable for item in covering):
+                print("ℹ️  Ejecuta con --apply para crear los índices de cobertura y borrar los redundantes")
+            return
+
+        create = [] if args.no_covering else [item for item in covering if item.actionable]
+        candidates = withdrawn + redundant + (unused if args.drop_unused else [])
+        drop = [f for f in candidates if f.droppable and f.index.name not in args.keep]
+        skipped = len(candidates) - len(drop)
+        if skipped:
+            print(f"ℹ️  {skipped} índice(s) no se borran (schema.prisma, particionados o --keep)\n")
+
+        if create or drop:
+            print("🔨 Aplicando cambios...\n")
+            apply_changes(create, drop)
+            touched = {item.candidate.table for item in create} | {f.index.table for f in drop}
+            print("\n🔄 Actualizando el mapa de visibilidad...\n")
+            vacuum(touched | {item.candidate.table for item in covering if not item.missing_columns})
+            print(f"\n✅ {len(create)} índice(s) creados, {len(drop)} borrados")
+            if drop:
+                print(f"💾 Espacio liberado: {format_bytes(sum(f.index.size for f in drop))}")
+        else:
+            print("✅ No hay cambios que aplicar")
+
+        print("\n📋 Consultas de sesión:\n")
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                check_lookups(cursor, covering)
+                conn.rollback()
+
+        if create:
+            print("\nℹ️  Prisma no puede declarar INCLUDE: los índices de cobertura se mantienen con este script")
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
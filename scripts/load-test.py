@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""Drive the real API with a realistic traffic mix and find where the latency SLO breaks.
+
+Meant for a local stack: ``npm run build && npm start`` (or ``npm run
+dev``) against a Postgres filled by ``generate-load-data.py`` and
+``setup-gym-auth.py``. Arrivals are open-loop (Poisson, like independent
+visitors), so a slow server shows up as latency rather than as a client
+quietly sending less. The mix, as shares of ``--rps`` actions per second:
+
+* ``public`` - a visitor opens a gym page: the schedules, classes,
+  facilities and membership-plans routes in parallel, for a gym picked in
+  proportion to its members;
+* ``stats`` - an admin dashboard polls ``/api/admin/stats`` with a gym
+  session obtained from ``/api/gym/auth/login`` at start-up;
+* ``login`` - ``/api/auth/login`` with seeded accounts, a share of them with
+  a wrong password;
+* ``checkin`` - the front desk registering a visit. The app has no check-in
+  route, so it is written straight to ``check_ins`` (asyncpg, the pool's
+  connection cap) and deleted at the end unless ``--keep-checkins``.
+
+Check-ins and logins come in bursts: ``--burst-factor`` times their rate
+during the first fifth of every ``--burst-period``, like the doors opening
+at 7:00. ``--ramp`` repeats the run in stages of growing ``--rps`` until
+any route's p95 exceeds ``--slo-p95`` or errors exceed ``--slo-errors``;
+the last passing stage is the capacity. Results go to ``load-results/``.
+
+Usage:
+    python scripts/load-test.py --rps 20 --duration 60
+    python scripts/load-test.py --ramp --rps 10 --ramp-step 10 --slo-p95 300
+    python scripts/load-test.py --mix public=80,stats=20 --base-url http://localhost:3000
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import psycopg2
+
+from db import DatabaseConfigError, connection, get_database_url
+from db import aio
+from db.config import LOCAL_HOSTS, PROJECT_ROOT, is_local_database
+from db.latency import percentile
+
+try:
+    import httpx
+except ImportError:
+    print("❌ Error: httpx no está instalado")
+    print("   Instala con: pip install httpx")
+    sys.exit(1)
+
+RESULTS_DIR = PROJECT_ROOT / "load-results"
+
+DEFAULT_MIX = {"public": 55, "stats": 15, "login": 10, "checkin": 20}
+BURSTY = ("login", "checkin")
+
+PUBLIC_ROUTES = ("schedules", "classes", "facilities", "membership-plans")
+
+# Password setup-gym-auth.py gives every gym
+DEFAULT_ADMIN_PASSWORD = "admin123"
+
+CHECKIN_SQL = "INSERT INTO check_ins (member_id, checkin_time) VALUES ($1, now()) RETURNING id"
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"escenario desconocido '{name}' (elige entre {', '.join(DEFAULT_MIX)})")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"peso inválido en '{part}' (usa nombre=peso)")
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("la suma de los pesos debe ser mayor que 0")
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera carga realista contra la API y mide latencias por ruta")
+    parser.add_argument("--base-url", default="http://localhost:3000", help="URL del servidor Next.js")
+    parser.add_argument("--rps", type=float, default=20, help="Acciones por segundo (por defecto 20)")
+    parser.add_argument("--duration", type=float, default=60, help="Segundos de medición por etapa (por defecto 60)")
+    parser.add_argument("--warmup", type=float, default=5, help="Segundos de calentamiento sin medir (por defecto 5)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="Pesos por escenario, p. ej. public=55,stats=15,login=10,checkin=20")
+    parser.add_argument("--burst-factor", type=float, default=4, help="Multiplicador de check-ins y logins en ráfaga")
+    parser.add_argument("--burst-period", type=float, default=60, help="Segundos entre ráfagas (por defecto 60)")
+    parser.add_argument("--ramp", action="store_true", help="Subir --rps por etapas hasta romper el SLO")
+    parser.add_argument("--ramp-step", type=float, default=10, help="Aumento de --rps por etapa (por defecto 10)")
+    parser.add_argument("--max-rps", type=float, default=500, help="Límite de la rampa (por defecto 500)")
+    parser.add_argument("--slo-p95", type=float, default=500, help="p95 máximo por ruta en ms (por defecto 500)")
+    parser.add_argument("--slo-errors", type=float, default=1.0, help="Porcentaje máximo de errores (por defecto 1)")
+    parser.add_argument("--max-inflight", type=int, default=200, help="Peticiones simultáneas máximas del cliente")
+    parser.add_argument("--timeout", type=float, default=10, help="Timeout por petición en segundos (por defecto 10)")
+    parser.add_argument("--admin-sessions", type=int, default=10, help="Gimnasios con sesión de admin (por defecto 10)")
+    parser.add_argument("--admin-password", default=DEFAULT_ADMIN_PASSWORD, help="Contraseña de los gimnasios")
+    parser.add_argument("--user-password", default=DEFAULT_ADMIN_PASSWORD, help="Contraseña de las cuentas de usuario")
+    parser.add_argument("--bad-login-ratio", type=float, default=0.1, help="Fracción de logins con contraseña errónea")
+    parser.add_argument("--keep-checkins", action="store_true", help="No borrar los check-ins insertados")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de la elección de gimnasios y usuarios")
+    parser.add_argument("--allow-remote", action="store_true", help="Permitir un servidor o base de datos no locales")
+    parser.add_argument("--output", type=Path, help="Archivo JSON de salida (por defecto load-results/)")
+    args = parser.parse_args(argv)
+    if args.rps <= 0 or args.duration <= 0 or args.warmup < 0:
+        parser.error("--rps y --duration deben ser mayores que 0")
+    if args.ramp and args.ramp_step <= 0:
+        parser.error("--ramp-step debe ser mayor que 0")
+    if args.max_inflight < 1 or args.admin_sessions < 0:
+        parser.error("--max-inflight debe ser al menos 1")
+    if not 0 <= args.bad_login_ratio <= 1:
+        parser.error("--bad-login-ratio debe estar entre 0 y 1")
+    return args
+
+
+def is_local(base_url):
+    host = urlsplit(base_url).hostname or ""
+    return host in LOCAL_HOSTS and is_local_database(get_database_url())
+
+
+class Fixtures:
+    """Gyms, accounts and members the scenarios pick from."""
+
+    def __init__(self, gyms, users, members):
+        self.gyms = gyms
+        self.users = users
+        self.members = members
+        self.admin_cookies = []
+        self._cumulative = []
+        total = 0
+        for gym in gyms:
+            total += gym["members"] + 1
+            self._cumulative.append(total)
+
+    def pick_gym(self, rng):
+        """A gym, in proportion to its members (big gyms get more visitors)."""
+        return self.gyms[bisect.bisect_left(self._cumulative, rng.random() * self._cumulative[-1])]
+
+
+def load_fixtures(cursor, rng, sample=20_000):
+    cursor.execute("""
+        SELECT g.id, g.slug, g.admin_code, g.password_hash IS NOT NULL,
+            (SELECT COUNT(*) FROM members m WHERE m.gym_id = g.id)
+        FROM gyms g ORDER BY g.id;
+    """)
+    gyms = [
+        {"id": gym_id, "slug": slug, "admin_code": code, "has_password": has_password, "members": members}
+        for gym_id, slug, code, has_password, members in cursor.fetchall()
+    ]
+    cursor.execute(
+        "SELECT email, password_hash IS NOT NULL FROM user_accounts ORDER BY password_hash IS NULL, id LIMIT %s;",
+        (sample,),
+    )
+    users = cursor.fetchall()
+    cursor.execute("SELECT id FROM members WHERE status = 'active' ORDER BY random() LIMIT %s;", (sample,))
+    members = [row[0] for row in cursor.fetchall()]
+    rng.shuffle(users)
+    return Fixtures(gyms, users, members)
+
+
+class Recorder:
+    """Latencies, statuses and errors per route for the current stage."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.dropped = Counter()
+        self.recording = False
+
+    def record(self, route, started, status, ok):
+        if not self.recording:
+            return
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        self.statuses[route][status] += 1
+        if not ok:
+            self.errors[route] += 1
+
+
+class LoadTest:
+    def __init__(self, args, fixtures, client, pool):
+        self.args = args
+        self.fixtures = fixtures
+        self.client = client
+        self.pool = pool
+        self.rng = random.Random(args.seed)
+        self.recorder = Recorder()
+        self.inflight = 0
+        self.tasks = set()
+        self.checkin_ids = []
+        self.started = time.monotonic()
+
+    async def request(self, route, method, url, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(route, started, type(e).__name__, False)
+            return None
+        self.recorder.record(route, started, response.status_code, response.status_code in expected)
+        return response
+
+    async def public(self):
+        gym = self.fixtures.pick_gym(self.rng)
+        key = gym["slug"] or gym["id"]
+        await asyncio.gather(*(
+            self.request(f"GET /api/public/gym/[gymId]/{name}", "GET", f"/api/public/gym/{key}/{name}")
+            for name in PUBLIC_ROUTES
+        ))
+
+    async def stats(self):
+        cookie = self.rng.choice(self.fixtures.admin_cookies)
+        await self.request("GET /api/admin/stats", "GET", "/api/admin/stats", headers={"Cookie": cookie})
+
+    async def login(self):
+        email, has_password = self.rng.choice(self.fixtures.users)
+        valid = has_password and self.rng.random() >= self.args.bad_login_ratio
+        password = self.args.user_password if valid else "contraseña-incorrecta"
+        await self.request(
+            "POST /api/auth/login", "POST", "/api/auth/login",
+            expected=(200,) if valid else (401,), json={"email": email, "password": password},
+        )
+
+    async def checkin(self):
+        started = time.perf_counter()
+        try:
+            async with self.pool.acquire() as conn:
+                checkin_id = await conn.fetchval(CHECKIN_SQL, self.rng.choice(self.fixtures.members))
+            self.checkin_ids.append(checkin_id)
+            self.recorder.record("SQL INSERT check_ins", started, "ok", True)
+        except (*aio.ERRORS, OSError, asyncio.TimeoutError) as e:
+            self.recorder.record("SQL INSERT check_ins", started, type(e).__name__, False)
+
+    def rate(self, scenario, rps, shares):
+        rate = rps * shares[scenario]
+        if scenario in BURSTY:
+            phase = (time.monotonic() - self.started) % self.args.burst_period
+            if phase < self.args.burst_period / 5:
+                rate *= self.args.burst_factor
+        return rate
+
+    async def arrivals(self, scenario, rps, shares, until):
+        """Poisson arrivals of one scenario until ``until`` (loop time)."""
+        loop = asyncio.get_running_loop()
+        run = getattr(self, scenario)
+        at = loop.time()
+        while True:
+            rate = self.rate(scenario, rps, shares)
+            at += self.rng.expovariate(rate) if rate > 0 else 1.0
+            if at >= until:
+                return
+            await asyncio.sleep(max(0.0, at - loop.time()))
+            if rate <= 0:
+                continue
+            if self.inflight >= self.args.max_inflight:
+                # The client itself is saturated; counted so the stage can be discarded
+                if self.recorder.recording:
+                    self.recorder.dropped[scenario] += 1
+                continue
+            self.inflight += 1
+            task = asyncio.create_task(run())
+            self.tasks.add(task)
+            task.add_done_callback(self._done)
+
+    def _done(self, task):
+        self.inflight -= 1
+        self.tasks.discard(task)
+
+    async def run_stage(self, rps, shares, warmup):
+        loop = asyncio.get_running_loop()
+        self.recorder.reset()
+        if warmup:
+            await asyncio.gather(*(self.arrivals(s, rps, shares, loop.time() + warmup) for s in shares))
+        self.recorder.recording = True
+        started = time.perf_counter()
+        await asyncio.gather(*(self.arrivals(s, rps, shares, loop.time() + self.args.duration) for s in shares))
+        if self.tasks:
+            await asyncio.wait(list(self.tasks))
+        elapsed = time.perf_counter() - started
+        self.recorder.recording = False
+        return self.stage_report(rps, elapsed)
+
+    def stage_report(self, rps, elapsed):
+        recorder = self.recorder
+        routes = {}
+        for route in sorted(recorder.latencies):
+            values = sorted(recorder.latencies[route])
+            errors = recorder.errors[route]
+            routes[route] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 0.50), 1),
+                "p95_ms": round(percentile(values, 0.95), 1),
+                "p99_ms": round(percentile(values, 0.99), 1),
+                "max_ms": round(values[-1], 1),
+                "error_pct": round(100 * errors / len(values), 2),
+                "statuses": {str(status): count for status, count in recorder.statuses[route].most_common()},
+            }
+        requests = sum(r["requests"] for r in routes.values())
+        errors = sum(recorder.errors.values())
+        dropped = sum(recorder.dropped.values())
+        breaches = [
+            route for route, r in routes.items()
+            if r["p95_ms"] > self.args.slo_p95 or r["error_pct"] > self.args.slo_errors
+        ]
+        return {
+            "rps": rps,
+            "elapsed_s": round(elapsed, 1),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1),
+            "error_pct": round(100 * errors / requests, 2) if requests else 0.0,
+            "dropped": dropped,
+            "slo_ok": not breaches and not dropped and requests > 0,
+            "breaches": breaches,
+            "routes": routes,
+        }
+
+    async def cleanup(self):
+        if not self.checkin_ids or self.args.keep_checkins:
+            return 0
+        async with self.pool.acquire() as conn:
+            deleted = await conn.execute("DELETE FROM check_ins WHERE id = ANY($1::int[])", self.checkin_ids)
+        return int(deleted.split()[-1])
+
+
+async def admin_sessions(base_url, args, fixtures):
+    """Log into a few gyms; return their session cookies."""
+    candidates = [g for g in fixtures.gyms if g["admin_code"] and g["has_password"]]
+    candidates.sort(key=lambda g: -g["members"])
+    cookies = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        for gym in candidates[: args.admin_sessions]:
+            response = await client.post(
+                "/api/gym/auth/login", json={"adminCode": gym["admin_code"], "password": args.admin_password}
+            )
+            token = response.cookies.get("gym_session")
+            if response.status_code == 200 and token:
+                cookies.append(f"gym_session={token}")
+            client.cookies.clear()
+    return cookies
+
+
+def print_stage(stage):
+    mark = "✅" if stage["slo_ok"] else "❌"
+    print(f"\n{mark} {stage['rps']:g} acciones/s: {stage['requests']:,} peticiones, "
+          f"{stage['throughput_rps']:.1f}/s, errores {stage['error_pct']:.2f}%")
+    print(f"  {'ruta':<46} {'pet.':>7} {'/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err%':>6}")
+    for route, r in stage["routes"].items():
+        flag = " ⚠️" if route in stage["breaches"] else ""
+        print(f"  {route:<46} {r['requests']:>7} {r['throughput_rps']:>7.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['error_pct']:>6.2f}{flag}")
+    if stage["dropped"]:
+        print(f"  ⚠️  {stage['dropped']} acciones no se enviaron: el cliente llegó a --max-inflight")
+
+
+async def run(args, fixtures, shares):
+    async with (aio.open_pool() if "checkin" in shares else nullcontext()) as pool:
+        return await run_stages(args, fixtures, shares, pool)
+
+
+async def run_stages(args, fixtures, shares, pool):
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    stages = []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        test = LoadTest(args, fixtures, client, pool)
+        rps = args.rps
+        try:
+            while True:
+                print(f"⏳ Etapa a {rps:g} acciones/s durante {args.duration:g}s...")
+                stage = await test.run_stage(rps, shares, args.warmup if not stages else 0)
+                stages.append(stage)
+                print_stage(stage)
+                if not args.ramp or not stage["slo_ok"] or rps + args.ramp_step > args.max_rps:
+                    break
+                rps += args.ramp_step
+        finally:
+            if test.tasks:
+                await asyncio.wait(list(test.tasks))
+            if pool is not None:
+                deleted = await test.cleanup()
+                if deleted:
+                    print(f"\n🗑️  {deleted} check-ins de prueba borrados")
+    return stages
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        if not args.allow_remote and not is_local(args.base_url):
+            print("❌ Error: la prueba de carga solo se ejecuta contra un servidor y una base de datos locales")
+            print("   Usa --allow-remote si de verdad quieres cargar otro entorno")
+            sys.exit(1)
+
+        shares = {name: weight for name, weight in args.mix.items() if weight > 0}
+        if "checkin" in shares and not aio.available():
+            print("ℹ️  asyncpg no está instalado; se omiten los check-ins (pip install asyncpg)")
+            del shares["checkin"]
+
+        rng = random.Random(args.seed)
+        with connection() as conn:
+            cursor = conn.cursor()
+            fixtures = load_fixtures(cursor, rng)
+            cursor.close()
+        if not fixtures.gyms:
+            print("❌ Error: no hay gimnasios; genera datos con scripts/generate-load-data.py")
+            sys.exit(1)
+        if "checkin" in shares and not fixtures.members:
+            print("⚠️  No hay miembros activos; se omiten los check-ins")
+            del shares["checkin"]
+        if "login" in shares:
+            if not fixtures.users:
+                print("⚠️  No hay cuentas de usuario; se omiten los logins")
+                del shares["login"]
+            elif not any(has_password for _, has_password in fixtures.users):
+                print("⚠️  Ninguna cuenta tiene contraseña: los logins responderán 401 sin llegar a bcrypt")
+
+        try:
+            if "stats" in shares:
+                fixtures.admin_cookies = asyncio.run(admin_sessions(args.base_url, args, fixtures))
+                if not fixtures.admin_cookies:
+                    print("⚠️  No se pudo iniciar sesión en ningún gimnasio (¿setup-gym-auth.py?); se omite stats")
+                    del shares["stats"]
+        except httpx.HTTPError as e:
+            print(f"❌ Error: no se pudo conectar con {args.base_url} ({e})")
+            print("   Arranca el servidor con: npm run build && npm start")
+            sys.exit(1)
+        if not shares:
+            print("❌ Error: ningún escenario se puede ejecutar")
+            sys.exit(1)
+
+        total = sum(shares.values())
+        shares = {name: weight / total for name, weight in shares.items()}
+        mix = ", ".join(f"{name} {share:.0%}" for name, share in shares.items())
+        print(f"🏋️  {len(fixtures.gyms)} gimnasios, {len(fixtures.admin_cookies)} sesiones de admin, "
+              f"{len(fixtures.users)} cuentas, {len(fixtures.members)} miembros")
+        print(f"📊 Mezcla: {mix}; SLO p95 ≤ {args.slo_p95:g} ms, errores ≤ {args.slo_errors:g}%\n")
+
+        stages = asyncio.run(run(args, fixtures, shares))
+    except KeyboardInterrupt:
+        print("\n⏹️  Prueba interrumpida")
+        sys.exit(1)
+    except (psycopg2.Error, DatabaseConfigError, *aio.ERRORS) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    passing = [stage for stage in stages if stage["slo_ok"]]
+    if args.ramp:
+        if passing:
+            print(f"\n✅ Capacidad: {passing[-1]['rps']:g} acciones/s "
+                  f"({passing[-1]['throughput_rps']:.1f} peticiones/s) dentro del SLO")
+        else:
+            print("\n❌ Ni la primera etapa cumple el SLO; baja --rps")
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        output = RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    result = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "base_url": args.base_url,
+        "mix": shares,
+        "burst": {"factor": args.burst_factor, "period_s": args.burst_period},
+        "slo": {"p95_ms": args.slo_p95, "error_pct": args.slo_errors},
+        "capacity_rps": passing[-1]["rps"] if passing else None,
+        "stages": stages,
+    }
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"💾 Resultados guardados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Turn coach_class_templates into dated coach_class_sessions over a rolling horizon.
+
+Every template's ``day_of_week`` and ``start_time`` are parsed (see
+``db/schedule.py``) and expanded with NumPy into one session per week from
+now until ``--weeks`` ahead. The result is compared by (template, start)
+with the sessions already in that window:
+
+* missing sessions are loaded with a single COPY;
+* sessions the template no longer produces (day or time changed, extra
+  copies) are deleted, except those with attendees, which are kept and
+  reported;
+* existing sessions whose title, description, capacity, coach or end
+  (duration) drifted from their template are updated in place.
+
+All three happen in one transaction under an advisory lock, so a run
+converges the window to the templates or changes nothing, and two runs
+cannot overlap. Past sessions, sessions without a template and sessions
+of templates that cannot be parsed are never touched.
+
+Usage:
+    python scripts/materialize-sessions.py                 # 13 semanas
+    python scripts/materialize-sessions.py --weeks 4 --dry-run
+    python scripts/materialize-sessions.py --coach 12
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from db import DatabaseConfigError, connection
+from db import schedule
+from db.copy import copy_rows
+
+if not schedule.available():
+    print("❌ Error: numpy no está instalado")
+    print("   Instala con: pip install numpy")
+    sys.exit(1)
+
+import numpy as np  # noqa: E402
+
+LOCK_NAME = "materialize-sessions"
+
+# updated_at is NOT NULL without a default in the Prisma migrations: COPY must fill it
+SESSION_COLUMNS = (
+    "template_id", "coach_id", "title", "description", "start_date", "end_date", "capacity", "updated_at",
+)
+
+# Invalid templates listed by name before summarizing the rest
+MAX_LISTED = 10
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Genera las sesiones de coach a partir de sus plantillas")
+    parser.add_argument("--weeks", type=int, default=13, help="Semanas hacia adelante (por defecto 13, un trimestre)")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat,
+                        help="Inicio de la ventana (por defecto ahora)")
+    parser.add_argument("--coach", type=int, help="Solo las plantillas de este coach")
+    parser.add_argument("--dry-run", action="store_true", help="Calcular los cambios sin aplicarlos")
+    args = parser.parse_args(argv)
+    if args.weeks < 1:
+        parser.error("--weeks debe ser al menos 1")
+    return args
+
+
+def load_templates(cursor, coach_id):
+    where = "WHERE coach_id = %(coach)s" if coach_id is not None else ""
+    cursor.execute(f"""
+        SELECT id, coach_id, title, description, day_of_week, start_time, duration, capacity
+        FROM coach_class_templates {where}
+        ORDER BY id;
+    """, {"coach": coach_id})
+    return cursor.fetchall()
+
+
+def parse_templates(templates):
+    """Split templates into weekly slots; return (slots, invalid).
+
+    ``slots`` holds parallel arrays: template row index, weekday and
+    start minute per slot. ``invalid`` lists (id, title, reason).
+    """
+    rows, weekdays, minutes, invalid = [], [], [], []
+    for index, (template_id, _, title, _, day_text, time_text, duration, _) in enumerate(templates):
+        days = schedule.parse_days(day_text)
+        minute = schedule.parse_time(time_text)
+        if days is None:
+            invalid.append((template_id, title, f"día '{day_text}'"))
+        elif minute is None:
+            invalid.append((template_id, title, f"hora '{time_text}'"))
+        elif not duration or duration <= 0:
+            invalid.append((template_id, title, f"duración {duration}"))
+        else:
+            rows.extend([index] * len(days))
+            weekdays.extend(days)
+            minutes.extend([minute] * len(days))
+    slots = {
+        "row": np.array(rows, dtype=np.int64),
+        "weekday": np.array(weekdays, dtype=np.int64),
+        "minute": np.array(minutes, dtype=np.int64),
+    }
+    return slots, invalid
+
+
+def session_keys(template_ids, starts):
+    """One int64 per (template, start second), for set operations in NumPy."""
+    seconds = starts.astype("datetime64[s]").astype(np.int64)
+    return (template_ids.astype(np.int64) << 32) | seconds
+
+
+def load_existing(cursor, template_ids, start, end):
+    """Sessions of ``template_ids`` starting in [start, end) with whether anyone signed up."""
+    cursor.execute("""
+        SELECT s.id, s.template_id, EXTRACT(epoch FROM s.start_date)::bigint,
+            EXISTS (SELECT 1 FROM coach_class_attendees a WHERE a.session_id = s.id)
+        FROM coach_class_sessions s
+        WHERE s.template_id = ANY(%s) AND s.start_date >= %s AND s.start_date < %s;
+    """, (template_ids, start, end))
+    rows = cursor.fetchall()
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=bool)
+    ids, templates, seconds, attended = zip(*rows)
+    keys = (np.array(templates, dtype=np.int64) << 32) | np.array(seconds, dtype=np.int64)
+    return np.array(ids, dtype=np.int64), keys, np.array(attended, dtype=bool)
+
+
+def diff(desired_keys, existing_ids, existing_keys, attended):
+    """Return (desired rows to insert, session ids to delete, stale sessions kept for their attendees)."""
+    missing = ~np.isin(desired_keys, existing_keys)
+    # Keep the first copy of each (template, start); later copies are duplicates
+    _, first = np.unique(existing_keys, return_index=True)
+    duplicate = np.ones(len(existing_keys), dtype=bool)
+    duplicate[first] = False
+    stale = duplicate | ~np.isin(existing_keys, desired_keys)
+    return np.flatnonzero(missing), existing_ids[stale & ~attended], int((stale & attended).sum())
+
+
+def new_sessions(templates, rows, starts, now):
+    """Rows for COPY, with start and end rendered by NumPy in bulk."""
+    durations = np.array([templates[row][6] for row in rows], dtype=np.int64)
+    start_text = np.datetime_as_string(starts, unit="s")
+    end_text = np.datetime_as_string(starts + durations.astype("timedelta64[m]"), unit="s")
+    updated_at = now.isoformat(sep=" ")
+    for row, start_at, end_at in zip(rows.tolist(), start_text.tolist(), end_text.tolist()):
+        template_id, coach_id, title, description, _, _, _, capacity = templates[row]
+        yield (template_id, coach_id, title, description, start_at, end_at, capacity, updated_at)
+
+
+def update_drift(cursor, template_ids, start, end):
+    """Copy template attributes onto the window's sessions that no longer match."""
+    cursor.execute("""
+        UPDATE coach_class_sessions s
+        SET title = t.title,
+            description = NULLIF(t.description, ''),
+            capacity = t.capacity,
+            coach_id = t.coach_id,
+            end_date = s.start_date + make_interval(mins => t.duration),
+            updated_at = CURRENT_TIMESTAMP
+        FROM coach_class_templates t
+        WHERE s.template_id = t.id
+        AND t.id = ANY(%(ids)s)
+        AND s.start_date >= %(start)s AND s.start_date < %(end)s
+        -- COPY loads an empty description as NULL; both mean "none"
+        AND (s.title, s.description, s.capacity, s.coach_id, s.end_date) IS DISTINCT FROM
+            (t.title, NULLIF(t.description, ''), t.capacity, t.coach_id, s.start_date + make_interval(mins => t.duration));
+    """, {"ids": template_ids, "start": start, "end": end})
+    return cursor.rowcount
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = (args.start or datetime.now()).replace(second=0, microsecond=0)
+    end = start + timedelta(weeks=args.weeks)
+    print(f"🔄 Sesiones del {start:%Y-%m-%d %H:%M} al {end:%Y-%m-%d %H:%M} ({args.weeks} semanas)\n")
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s));", (LOCK_NAME,))
+            if not cursor.fetchone()[0]:
+                print("❌ Error: otra ejecución está generando sesiones en este momento")
+                sys.exit(1)
+
+            started = time.perf_counter()
+            templates = load_templates(cursor, args.coach)
+            slots, invalid = parse_templates(templates)
+            template_ids = np.array([t[0] for t in templates], dtype=np.int64)
+            valid_ids = np.unique(template_ids[slots["row"]])
+
+            slot_index, starts = schedule.occurrences(slots["weekday"], slots["minute"], start, end)
+            rows = slots["row"][slot_index]
+            desired_keys = session_keys(template_ids[rows], starts)
+            expanded = time.perf_counter()
+
+            existing_ids, existing_keys, attended = load_existing(cursor, valid_ids.tolist(), start, end)
+            insert, delete, kept = diff(desired_keys, existing_ids, existing_keys, attended)
+            planned = time.perf_counter()
+
+            print(f"  ✓ {len(templates)} plantillas, {len(valid_ids)} válidas, {len(slots['row'])} horarios semanales")
+            print(f"  ✓ {len(desired_keys):,} sesiones en la ventana, {len(existing_keys):,} ya existían "
+                  f"(expandido en {(expanded - started) * 1000:.0f} ms, comparado en {(planned - expanded) * 1000:.0f} ms)")
+            for template_id, title, reason in invalid[:MAX_LISTED]:
+                print(f"  ⚠️  Plantilla {template_id} ({title}): {reason} no reconocido; se omite")
+            if len(invalid) > MAX_LISTED:
+                print(f"  ⚠️  ... y {len(invalid) - MAX_LISTED} plantillas más sin día u hora válidos")
+            if kept:
+                print(f"  ⚠️  {kept} sesiones ya no coinciden con su plantilla pero tienen asistentes; se conservan")
+
+            if args.dry_run:
+                conn.rollback()
+                print(f"\nℹ️  Simulación: {len(insert):,} por crear, {len(delete):,} por borrar; no se aplicó nada")
+                return
+
+            cursor.execute("DELETE FROM coach_class_sessions WHERE id = ANY(%s);", (delete.tolist(),))
+            deleted = cursor.rowcount
+            updated = update_drift(cursor, valid_ids.tolist(), start, end)
+            inserted = copy_rows(cursor, "coach_class_sessions", SESSION_COLUMNS,
+                                 new_sessions(templates, rows[insert], starts[insert], datetime.now()))
+            cursor.close()
+        elapsed = time.perf_counter() - started
+
+        print(f"\n✅ {inserted:,} creadas, {deleted:,} borradas, {updated:,} actualizadas en {elapsed:.2f}s")
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
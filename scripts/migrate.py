@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Bring the database in line with prisma/schema.prisma.
+
+Without --apply only the plan is printed. Blocking DDL runs under
+lock_timeout and is retried with backoff; concurrent index builds report
+their progress.
+
+Usage:
+    python scripts/migrate.py                          # mostrar el plan
+    python scripts/migrate.py --apply                  # aplicar el plan
+    python scripts/migrate.py --apply --table gyms     # sólo algunas tablas
+    python scripts/migrate.py --apply --backfill       # rellenar por lotes y aplicar NOT NULL
+"""
+import argparse
+import sys
+
+import psycopg2
+
+from db import DatabaseConfigError
+from db.migrate import (
+    PHASE_ONLINE,
+    PHASE_PRE,
+    PHASE_TRANSACTION,
+    RunOptions,
+    apply_plan,
+    plan_migration,
+)
+from db.prisma import PrismaSchemaError
+
+PHASE_TITLES = {
+    PHASE_PRE: "Antes de la transacción (enums)",
+    PHASE_TRANSACTION: "En una sola transacción",
+    PHASE_ONLINE: "En línea, después del commit (sin bloquear escrituras)",
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sincroniza la base de datos con schema.prisma")
+    parser.add_argument("--apply", action="store_true", help="Aplicar el plan (por defecto sólo se muestra)")
+    parser.add_argument("--table", action="append", dest="tables", help="Limitar a esta tabla (se puede repetir)")
+    parser.add_argument("--schema-file", help="Ruta alternativa a schema.prisma")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Rellenar por lotes las columnas NOT NULL con NULLs y aplicar la restricción",
+    )
+    parser.add_argument(
+        "--lock-timeout",
+        type=int,
+        default=RunOptions.lock_timeout_ms,
+        help=f"lock_timeout en ms para DDL bloqueante (por defecto {RunOptions.lock_timeout_ms})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RunOptions.attempts,
+        help=f"Intentos ante lock_timeout (por defecto {RunOptions.attempts})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=RunOptions.batch_size,
+        help=f"Filas por lote al rellenar (por defecto {RunOptions.batch_size})",
+    )
+    args = parser.parse_args(argv)
+    if args.lock_timeout < 1 or args.retries < 1 or args.batch_size < 1:
+        parser.error("--lock-timeout, --retries y --batch-size deben ser positivos")
+    return args
+
+
+def print_plan(plan):
+    for phase in (PHASE_PRE, PHASE_TRANSACTION, PHASE_ONLINE):
+        steps = plan.phase(phase)
+        if not steps:
+            continue
+        print(f"📋 {PHASE_TITLES[phase]}:")
+        for step in steps:
+            print(f"  - {step.description}")
+        print()
+
+    if plan.warnings:
+        print("⚠️  Diferencias que no se aplican automáticamente:")
+        for table, message in plan.warnings:
+            prefix = f"{table}: " if table else ""
+            print(f"  - {prefix}{message}")
+        print()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        print("🔍 Comparando schema.prisma con la base de datos...\n")
+        plan = plan_migration(only=args.tables, schema_path=args.schema_file, backfill=args.backfill)
+
+        if plan.empty:
+            print("✅ La base de datos ya coincide con el esquema\n")
+            print_plan(plan)
+            return
+
+        print_plan(plan)
+
+        if not args.apply:
+            print("ℹ️  Ejecuta con --apply para aplicar estos cambios")
+            return
+
+        print("🔨 Aplicando cambios...\n")
+        options = RunOptions(
+            lock_timeout_ms=args.lock_timeout,
+            attempts=args.retries,
+            batch_size=args.batch_size,
+        )
+        apply_plan(
+            plan,
+            on_step=lambda step: print(f"  ✓ {step.description}"),
+            on_progress=lambda message: print(f"    ⏳ {message}"),
+            options=options,
+        )
+        print(f"\n✅ Migración completada ({len(plan.steps)} pasos)")
+
+    except PrismaSchemaError as e:
+        print(f"❌ Error en schema.prisma: {e}")
+        sys.exit(1)
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
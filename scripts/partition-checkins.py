@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Monthly partitions for check_ins (range on checkin_time).
+
+The stats route only reads today, this week, this month and last month,
+so with one partition per month those counts touch one or two partitions
+however much history is kept.
+
+* ``--convert`` turns the existing table into a partitioned one without
+  downtime (see ``db/partitions.py``): a partitioned copy kept in sync by a
+  trigger, a resumable batched copy and a short rename under
+  lock_timeout. Interrupted runs continue where they stopped.
+* ``--maintain`` (run it daily from cron) creates the partitions for the
+  coming months and, with ``--retention-months``, detaches the old ones
+  CONCURRENTLY and moves them to the ``archive`` schema (``--drop`` to
+  delete them instead).
+
+Archived check-ins no longer count in the stats route nor in
+``rollup-stats.py --rebuild``; the daily rollups already computed keep them.
+
+Usage:
+    python scripts/partition-checkins.py                       # estado
+    python scripts/partition-checkins.py --convert
+    python scripts/partition-checkins.py --maintain --retention-months 24
+    python scripts/partition-checkins.py --drop-retired         # tras verificar
+"""
+import argparse
+import sys
+from datetime import date
+
+import psycopg2
+
+from db import DatabaseConfigError, connect, connection, get_database_url, statement_timeout
+from db.backfill import BackfillError, load_checkpoint, run_backfill
+from db.catalog import format_bytes
+from db.migrate import RunOptions
+from db.partitions import (
+    PartitionError,
+    add_months,
+    archive_partition,
+    compare_counts,
+    copy_job,
+    create_shadow,
+    detach_partition,
+    ensure_partitions,
+    expired_partitions,
+    install_sync_trigger,
+    is_partitioned,
+    list_partitions,
+    missing_months,
+    month_floor,
+    retired_name,
+    shadow_name,
+    swap,
+    table_exists,
+)
+from db.pool import with_lock_retry
+from db.prisma import quote
+
+TABLE = "check_ins"
+COLUMN = "checkin_time"
+KEY = ("id", COLUMN)
+ARCHIVE_SCHEMA = "archive"
+LOCK_NAME = "partition-checkins"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Particiona check_ins por mes y mantiene las particiones")
+    parser.add_argument("--convert", action="store_true", help="Convertir check_ins en tabla particionada (en línea)")
+    parser.add_argument("--maintain", action="store_true", help="Crear particiones futuras y aplicar la retención")
+    parser.add_argument("--premake", type=int, default=3, help="Meses futuros con partición creada (por defecto 3)")
+    parser.add_argument("--retention-months", type=int, help="Meses de check-ins a conservar (sin límite si se omite)")
+    parser.add_argument("--drop", action="store_true", help="Borrar las particiones vencidas en lugar de archivarlas")
+    parser.add_argument("--drop-retired", action="store_true", help=f"Borrar {retired_name(TABLE)} tras la conversión")
+    parser.add_argument("--batch-size", type=int, default=RunOptions.batch_size, help="Filas por lote al copiar")
+    parser.add_argument("--restart", action="store_true", help="Repetir la copia desde el principio")
+    parser.add_argument(
+        "--lock-timeout",
+        type=int,
+        default=RunOptions.lock_timeout_ms,
+        help=f"lock_timeout en ms para los pasos que bloquean (por defecto {RunOptions.lock_timeout_ms})",
+    )
+    parser.add_argument("--attempts", type=int, default=RunOptions.attempts, help="Intentos ante lock_timeout")
+    args = parser.parse_args(argv)
+    if args.premake < 1:
+        parser.error("--premake debe ser al menos 1")
+    if args.retention_months is not None and args.retention_months < 1:
+        parser.error("--retention-months debe ser al menos 1")
+    return args
+
+
+def report(message):
+    print(f"    ⏳ {message}")
+
+
+def locked_step(label, options, work):
+    """Run ``work(cursor)`` in one transaction under lock_timeout, retried on timeout."""
+    def attempt():
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET LOCAL lock_timeout = %s;", (options.lock_timeout_ms,))
+            result = work(cursor)
+            cursor.close()
+            return result
+
+    return with_lock_retry(attempt, label, options.attempts, options.backoff, report)
+
+
+def convert(args, options):
+    shadow = shadow_name(TABLE)
+    print(f"🔄 Convirtiendo {TABLE} en tabla particionada por mes ({COLUMN})...\n")
+
+    with connection() as conn:
+        with statement_timeout(conn, 0):
+            cursor = conn.cursor()
+            if is_partitioned(cursor, TABLE):
+                print(f"✅ {TABLE} ya está particionada\n")
+                return
+            cursor.execute(f"SELECT MIN({quote(COLUMN)}), MAX({quote(COLUMN)}) FROM {quote(TABLE)};")
+            first, last = cursor.fetchone()
+            exists = table_exists(cursor, shadow)
+            cursor.close()
+    today = date.today()
+    first = first or today
+    last = max(last.date() if last else today, add_months(month_floor(today), args.premake))
+
+    def prepare(cursor):
+        warnings = [] if exists else create_shadow(cursor, TABLE, COLUMN)
+        return warnings, ensure_partitions(cursor, shadow, first, last, prefix=TABLE)
+
+    warnings, created = locked_step(f"crear {shadow}", options, prepare)
+    for warning in warnings:
+        print(f"  ⚠️  {warning}")
+    print(f"  ✓ {shadow}: {len(created)} particiones nuevas ({month_floor(first):%Y-%m} a {month_floor(last):%Y-%m})")
+
+    locked_step("trigger de sincronización", options, lambda cursor: install_sync_trigger(cursor, TABLE, KEY))
+    print(f"  ✓ Trigger de sincronización en {TABLE}")
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        job = copy_job(cursor, TABLE, options.batch_size)
+        checkpoint = load_checkpoint(cursor, job.name) if table_exists(cursor, "_backfill_checkpoints") else None
+        cursor.close()
+    if checkpoint and checkpoint[3] and not args.restart:
+        print("  ✓ Copia ya completada (el trigger la mantiene al día)")
+    else:
+        progress = run_backfill(
+            job,
+            restart=args.restart,
+            on_batch=lambda p: report(f"{p.percent:.0f}% ({p.rows:,} filas, {p.rate:,.0f} filas/s)"),
+        )
+        resumed = " (reanudada)" if progress.resumed else ""
+        print(f"  ✓ Copia{resumed}: {progress.rows:,} filas en {progress.batches} lotes, {progress.elapsed:.1f}s")
+
+    with connection() as conn:
+        with statement_timeout(conn, 0):
+            cursor = conn.cursor()
+            original, copied, mark = compare_counts(cursor, TABLE)
+            cursor.close()
+    if original != copied:
+        raise PartitionError(f"{TABLE} tiene {original:,} filas y {shadow} {copied:,}; vuelve a ejecutar --convert")
+    print(f"  ✓ Conteo verificado: {original:,} filas")
+
+    locked_step("intercambio de tablas", options, lambda cursor: swap(cursor, TABLE, mark))
+    with connection(autocommit=True) as conn:
+        with statement_timeout(conn, 0):
+            with conn.cursor() as cursor:
+                cursor.execute(f"ANALYZE {quote(TABLE)};")
+    print(f"  ✓ {TABLE} ya es particionada; la tabla anterior queda como {retired_name(TABLE)}")
+    print("\n   Verifica la aplicación y luego bórrala con --drop-retired\n")
+
+
+def maintain(args, options):
+    today = date.today()
+    print("🔄 Mantenimiento de particiones...\n")
+    created = locked_step(
+        "crear particiones",
+        options,
+        lambda cursor: ensure_partitions(cursor, TABLE, today, add_months(month_floor(today), args.premake)),
+    )
+    for name in created:
+        print(f"  ✓ Partición creada: {name}")
+    if not created:
+        print(f"  ✓ Particiones al día hasta {add_months(month_floor(today), args.premake):%Y-%m}")
+
+    if args.retention_months is None:
+        return
+    with connection(autocommit=True) as conn:
+        with conn.cursor() as cursor:
+            expired = expired_partitions(list_partitions(cursor, TABLE), args.retention_months, today)
+            for partition in expired:
+                cursor.execute("SET lock_timeout = %s;", (options.lock_timeout_ms,))
+                with_lock_retry(
+                    lambda: detach_partition(cursor, TABLE, partition),
+                    f"separar {partition.name}", options.attempts, options.backoff, report,
+                )
+                cursor.execute("RESET lock_timeout;")
+                if args.drop:
+                    cursor.execute(f"DROP TABLE {quote(partition.name)};")
+                    print(f"  🗑️  {partition.name} separada y borrada ({partition.rows:,} filas)")
+                else:
+                    archive_partition(cursor, partition, ARCHIVE_SCHEMA)
+                    print(f"  📦 {partition.name} movida a {ARCHIVE_SCHEMA}.{partition.name} ({partition.rows:,} filas)")
+    if not expired:
+        print(f"  ✓ Nada anterior a {args.retention_months} meses")
+
+
+def drop_retired():
+    retired = retired_name(TABLE)
+    with connection() as conn:
+        cursor = conn.cursor()
+        if not table_exists(cursor, retired):
+            print(f"ℹ️  {retired} no existe")
+            return
+        cursor.execute(f"DROP TABLE {quote(retired)};")
+        cursor.close()
+    print(f"🗑️  {retired} borrada\n")
+
+
+def show_status(args):
+    today = date.today()
+    with connection() as conn:
+        cursor = conn.cursor()
+        if not is_partitioned(cursor, TABLE):
+            print(f"⚠️  {TABLE} no está particionada; conviértela con --convert")
+            if table_exists(cursor, shadow_name(TABLE)):
+                print(f"   Conversión en curso: {shadow_name(TABLE)} existe (vuelve a ejecutar --convert)")
+            cursor.close()
+            return
+        partitions = list_partitions(cursor, TABLE)
+        retired = table_exists(cursor, retired_name(TABLE))
+        cursor.close()
+
+    print(f"📊 {TABLE}: {len(partitions)} particiones por mes de {COLUMN}\n")
+    for p in partitions:
+        pending = " [separación pendiente]" if p.detach_pending else ""
+        print(f"  - {p.name}: {p.lower} → {p.upper}, {p.rows:,} filas, {format_bytes(p.bytes)}{pending}")
+
+    ahead = add_months(month_floor(today), args.premake)
+    missing = missing_months(partitions, today, ahead)
+    if missing:
+        print(f"\n⚠️  Faltan particiones para {', '.join(f'{m:%Y-%m}' for m in missing)}; ejecuta --maintain")
+    if args.retention_months is not None:
+        expired = expired_partitions(partitions, args.retention_months, today)
+        if expired:
+            print(f"\nℹ️  Fuera de la retención ({args.retention_months} meses): {', '.join(p.name for p in expired)}")
+    if retired:
+        print(f"\nℹ️  {retired_name(TABLE)} sigue existiendo; bórrala con --drop-retired")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = RunOptions(lock_timeout_ms=args.lock_timeout, attempts=args.attempts, batch_size=args.batch_size)
+
+    try:
+        # Own connection, outside the pool: the steps below need every pooled slot
+        lock_conn = connect(get_database_url(), autocommit=True)
+        try:
+            with lock_conn.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (LOCK_NAME,))
+                if not cursor.fetchone()[0]:
+                    print("⚠️  Otra ejecución de partition-checkins está en curso")
+                    sys.exit(1)
+            if args.convert:
+                convert(args, options)
+            if args.drop_retired:
+                drop_retired()
+            if args.maintain:
+                maintain(args, options)
+                print()
+            show_status(args)
+        finally:
+            lock_conn.close()
+
+    except (psycopg2.Error, DatabaseConfigError, PartitionError, BackfillError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
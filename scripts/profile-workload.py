@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Profile what the database spends its time on, for minutes or hours.
+
+Samples ``pg_stat_activity`` and ``pg_locks`` every ``--interval`` seconds
+and reads ``pg_stat_statements`` / ``pg_stat_user_tables`` once per
+``--bucket`` (see ``db/workload.py``). Each bucket is appended as one line
+of a JSON Lines report, so a long run can be followed with ``tail -f``
+and nothing is lost if it is stopped:
+
+* ``{"type": "meta"}`` - server, settings and whether pg_stat_statements is loaded;
+* ``{"type": "fingerprint"}`` - a normalized statement, the first time it is seen,
+  with the route query of ``db/queries.py`` it corresponds to;
+* ``{"type": "bucket"}`` - average sessions per state, seconds of active time per
+  wait event and per statement, lock chains, and the deltas of
+  pg_stat_statements (top statements by total time) and pg_stat_user_tables;
+* ``{"type": "summary"}`` - the same rankings for the whole run.
+
+The profiler uses one connection outside the pool, a few milliseconds
+per sample and never reads query texts it already has. The cost of each
+sample is reported, so it can be checked against production.
+
+Usage:
+    python scripts/profile-workload.py --duration 2h
+    python scripts/profile-workload.py --interval 0.5 --bucket 30 --output perfil.jsonl
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import psycopg2
+
+from db import DatabaseConfigError, connect, get_database_url
+from db.config import PROJECT_ROOT
+from db.pool import backoff_delay, get_settings
+from db.workload import STATEMENT_COUNTERS, Bucket, Registry, Sampler, merge_chain, top_statements
+
+RESULTS_DIR = PROJECT_ROOT / "profile-results"
+
+# A sample that takes longer than this is cancelled rather than piling up on a busy server
+SAMPLE_TIMEOUT_MS = 5000
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def duration(value):
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smh]?)", value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"duración inválida '{value}' (p. ej. 90, 30m, 2h)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Perfila la carga de la base de datos (sesiones, esperas, bloqueos)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Segundos entre muestras (por defecto 1)")
+    parser.add_argument("--bucket", type=duration, default=60, help="Duración de cada intervalo del informe (por defecto 60s)")
+    parser.add_argument("--duration", type=duration, help="Tiempo total (p. ej. 30m, 2h); por defecto hasta Ctrl+C")
+    parser.add_argument("--top", type=int, default=10, help="Consultas y esperas por intervalo (por defecto 10)")
+    parser.add_argument("--output", type=Path, help="Informe JSON Lines (por defecto profile-results/)")
+    parser.add_argument("--quiet", action="store_true", help="No imprimir una línea por intervalo")
+    args = parser.parse_args(argv)
+    if args.interval < 0.1:
+        parser.error("--interval debe ser al menos 0.1")
+    if args.bucket < args.interval:
+        parser.error("--bucket debe ser mayor que --interval")
+    if args.top < 1:
+        parser.error("--top debe ser al menos 1")
+    return args
+
+
+class Report:
+    """JSON Lines writer, flushed after every record."""
+
+    def __init__(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._file = path.open("a", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Totals:
+    """Rankings for the whole run, accumulated bucket by bucket."""
+
+    def __init__(self):
+        self.samples = 0
+        self.sample_ms = 0.0
+        self.waits = Counter()
+        self.active = Counter()
+        self.statements = defaultdict(lambda: dict.fromkeys(STATEMENT_COUNTERS, 0))
+        self.chains = {}
+
+    def add(self, bucket, statement_deltas):
+        self.samples += bucket.samples
+        self.sample_ms += bucket.sample_ms
+        self.waits.update(bucket.waits)
+        self.active.update(bucket.statements)
+        for fp, delta in (statement_deltas or {}).items():
+            for name, value in delta.items():
+                self.statements[fp][name] += value
+        for key, chain in bucket.chains.items():
+            merge_chain(self.chains, key, chain)
+
+    def summary(self, args, started, registry, has_statements):
+        interval = args.interval
+        return {
+            "type": "summary",
+            "started_at": started,
+            "ended_at": datetime.now(),
+            "samples": self.samples,
+            "sample_ms": round(self.sample_ms / self.samples, 2) if self.samples else None,
+            "waits": {wait: round(count * interval, 1) for wait, count in self.waits.most_common(args.top)},
+            "active": [
+                {"fingerprint": fp, "seconds": round(count * interval, 1), "label": registry.by_id[fp].label}
+                for fp, count in self.active.most_common(args.top)
+            ],
+            "statements": top_statements(self.statements, args.top, registry) if has_statements else None,
+            "lock_chains": sorted(self.chains.values(), key=lambda c: (-c["waiters"], -c["max_wait"]))[: args.top],
+        }
+
+
+def open_sampler_connection():
+    conn = connect(get_database_url(), autocommit=True)
+    with conn.cursor() as cursor:
+        cursor.execute("SET statement_timeout = %s;", (SAMPLE_TIMEOUT_MS,))
+    return conn
+
+
+def bucket_line(record):
+    active = sum(v for k, v in record["sessions"].items() if k == "active")
+    waits = [w for w in record["waits"] if w != "CPU"]
+    parts = [f"activas {active:.1f} (máx {record['max_active']})"]
+    if waits:
+        parts.append(f"espera {waits[0]} {record['waits'][waits[0]]:.0f}s")
+    if record["active"]:
+        head = record["active"][0]
+        parts.append(f"top {head['label'][:50]} {head['seconds']:.0f}s")
+    if record.get("statements"):
+        head = record["statements"][0]
+        parts.append(f"más tiempo {head['label'][:50]} {head['total_ms']:.0f} ms/{head['calls']} llamadas")
+    if record["lock_chains"]:
+        parts.append(f"🔒 {len(record['lock_chains'])} cadenas de bloqueo")
+    return f"  {record['end']:%H:%M:%S} ({record['sample_ms']:.1f} ms/muestra) · " + " · ".join(parts)
+
+
+def print_summary(summary, has_statements):
+    print(f"\n📊 {summary['samples']} muestras, {summary['sample_ms'] or 0:.1f} ms por muestra\n")
+    if summary["waits"]:
+        print("  Tiempo activo por espera:")
+        for wait, seconds in summary["waits"].items():
+            print(f"    {seconds:>8.1f}s  {wait}")
+    if summary["active"]:
+        print("\n  Consultas con más tiempo activo (muestreado):")
+        for row in summary["active"]:
+            print(f"    {row['seconds']:>8.1f}s  [{row['fingerprint']}] {row['label']}")
+    if has_statements and summary["statements"]:
+        print("\n  Consultas con más tiempo total (pg_stat_statements):")
+        for row in summary["statements"]:
+            print(f"    {row['total_ms']:>10.0f} ms  {row['calls']:>8} llamadas  {row['mean_ms']:>8.2f} ms/llamada  "
+                  f"[{row['fingerprint']}] {row['label']}")
+    if summary["lock_chains"]:
+        print("\n  🔒 Cadenas de bloqueo:")
+        for chain in summary["lock_chains"]:
+            print(f"    pid {chain['root_pid']} ({chain['root_state']}) bloquea a {chain['waiters']} sesiones "
+                  f"en {chain['relation']} ({chain['mode']}), espera máx {chain['max_wait']:.1f}s")
+
+
+def profile(args, report):
+    settings = get_settings()
+    registry = Registry()
+    started = datetime.now()
+    deadline = time.monotonic() + args.duration if args.duration else None
+    totals = Totals()
+
+    conn = open_sampler_connection()
+    sampler = Sampler(conn, registry)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT current_database(), current_setting('server_version'), current_setting('track_activity_query_size');")
+        database, version, query_size = cursor.fetchone()
+    sampler.statement_deltas()
+    sampler.table_deltas()
+    report.write({
+        "type": "meta",
+        "started_at": started,
+        "database": database,
+        "server_version": version,
+        "track_activity_query_size": query_size,
+        "interval": args.interval,
+        "bucket": args.bucket,
+        "pg_stat_statements": sampler.has_statements,
+    })
+    if not sampler.has_statements:
+        print("ℹ️  pg_stat_statements no está disponible; solo se muestrea pg_stat_activity\n")
+
+    def close_bucket(bucket, end):
+        statement_deltas = sampler.statement_deltas()
+        record = bucket.report(end, args.interval, args.top, statement_deltas, sampler.table_deltas(), registry)
+        for fp in registry.take_new():
+            report.write({"type": "fingerprint", "id": fp.id, "routes": fp.routes, "query": fp.query})
+        report.write(record)
+        totals.add(bucket, statement_deltas)
+        if not args.quiet:
+            print(bucket_line(record))
+
+    bucket = Bucket(started)
+    bucket_end = time.monotonic() + args.bucket
+    next_sample = time.monotonic()
+    attempt = 0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                sessions, locks, elapsed = sampler.sample()
+                bucket.add(sessions, locks, registry, elapsed)
+                attempt = 0
+                if time.monotonic() >= bucket_end:
+                    now = datetime.now()
+                    close_bucket(bucket, now)
+                    bucket = Bucket(now)
+                    bucket_end += args.bucket
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                attempt += 1
+                delay = min(backoff_delay(attempt, settings.retry_backoff), 30)
+                print(f"⚠️  Conexión perdida ({str(e).strip().splitlines()[0]}); reintentando en {delay:.1f}s")
+                conn.close()
+                time.sleep(delay)
+                conn = sampler.conn = open_sampler_connection()
+                next_sample = time.monotonic()
+                continue
+
+            next_sample += args.interval
+            pause = next_sample - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            else:
+                # Sampling fell behind (slow server or a long pause); do not burst to catch up
+                next_sample = time.monotonic()
+    except KeyboardInterrupt:
+        print("\n⏹️  Perfilado detenido")
+
+    try:
+        if bucket.samples:
+            close_bucket(bucket, datetime.now())
+    finally:
+        conn.close()
+    summary = totals.summary(args, started, registry, sampler.has_statements)
+    report.write(summary)
+    return summary, sampler.has_statements
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output = args.output or RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl"
+
+    report = None
+    try:
+        report = Report(output)
+        until = f" durante {args.duration:.0f}s" if args.duration else " (Ctrl+C para terminar)"
+        print(f"🔍 Muestreando cada {args.interval}s, informe cada {args.bucket:.0f}s{until}\n")
+        summary, has_statements = profile(args, report)
+        print_summary(summary, has_statements)
+        print(f"\n💾 Informe guardado en {output}")
+    except (psycopg2.Error, DatabaseConfigError, OSError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        if report is not None:
+            report.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""Keep the denormalised enrolment counters true, and report how far they drifted.
+
+Two counters are read instead of counting attendees on every request:
+
+* ``coach_class_sessions.enrolled`` - attendees of the session that are
+  not CANCELLED. ``--install`` adds statement-level triggers (with
+  transition tables) to ``coach_class_attendees`` that add and subtract
+  the affected rows per session, so the counter follows every insert,
+  delete, status change or move to another session in the same
+  transaction. Sessions are locked in id order first, so two statements
+  touching the same sessions cannot deadlock.
+* ``classes.enrolled`` - the weekly classes have no enrolment table and
+  the pages show ``enrolled/capacity`` as the occupancy of one class. The
+  closest real figure is the members who check in on a day the class
+  runs, averaged over the last ``--window`` days (``check_ins``). A
+  rolling window cannot be kept by triggers, so this counter is
+  maintained by running this job.
+
+The job walks each table in id ranges of ``--chunk-size``. Every chunk
+is one grouped query that returns only the rows whose stored count
+differs from the real one, then one UPDATE of those rows. The update is
+a compare-and-set (``enrolled`` must still hold the value that was read),
+so a counter a trigger moved in the meantime is left for the next run
+instead of being overwritten with a stale count. Chunks commit one by
+one; an advisory lock keeps two runs from overlapping.
+
+Usage:
+    python scripts/reconcile-enrolment.py --install       # triggers + primera reconciliación
+    python scripts/reconcile-enrolment.py                 # reconciliar
+    python scripts/reconcile-enrolment.py --dry-run --only sessions
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from db import DatabaseConfigError, connection
+from db.catalog import introspect
+
+LOCK_NAME = "reconcile-enrolment"
+ATTENDEES = "coach_class_attendees"
+TRIGGER_FUNCTION = "_session_enrolled_apply"
+
+# Rows with the largest drift listed per counter
+MAX_LISTED = 10
+
+# Attendees that count, per session: + for new rows, - for old rows
+DELTAS = {
+    "INSERT": "SELECT session_id, COUNT(*) AS delta FROM new_rows WHERE status <> 'CANCELLED' GROUP BY session_id",
+    "DELETE": "SELECT session_id, -COUNT(*) AS delta FROM old_rows WHERE status <> 'CANCELLED' GROUP BY session_id",
+    "UPDATE": (
+        "SELECT session_id, SUM(delta) AS delta FROM ("
+        "SELECT session_id, 1 AS delta FROM new_rows WHERE status <> 'CANCELLED' "
+        "UNION ALL SELECT session_id, -1 FROM old_rows WHERE status <> 'CANCELLED'"
+        ") changes GROUP BY session_id HAVING SUM(delta) <> 0"
+    ),
+}
+
+INSTALL_SQL = f"""
+    CREATE OR REPLACE FUNCTION {TRIGGER_FUNCTION}() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        deltas text;
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            UPDATE coach_class_sessions SET enrolled = 0 WHERE enrolled <> 0;
+            RETURN NULL;
+        END IF;
+        deltas := CASE TG_OP
+            WHEN 'INSERT' THEN %(insert)s
+            WHEN 'DELETE' THEN %(delete)s
+            ELSE %(update)s
+        END;
+        -- Lock in id order: concurrent multi-session statements queue instead of deadlocking
+        EXECUTE 'SELECT 1 FROM coach_class_sessions WHERE id IN (SELECT session_id FROM ('
+            || deltas || ') d) ORDER BY id FOR NO KEY UPDATE';
+        EXECUTE 'UPDATE coach_class_sessions s SET enrolled = s.enrolled + d.delta FROM ('
+            || deltas || ') d WHERE s.id = d.session_id';
+        RETURN NULL;
+    END;
+    $$;
+"""
+
+TRIGGERS = {
+    "ins": "AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows",
+    "upd": "AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "del": "AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows",
+    "trunc": "AFTER TRUNCATE ON {table}",
+}
+
+# Each counter: the table holding it and a grouped query returning
+# (id, stored, actual) for the rows of one id range whose count drifted
+COUNTERS = {
+    "sessions": ("coach_class_sessions", f"""
+        SELECT s.id, s.enrolled, COALESCE(a.actual, 0)
+        FROM coach_class_sessions s
+        LEFT JOIN (
+            SELECT session_id, COUNT(*) AS actual
+            FROM {ATTENDEES}
+            WHERE session_id >= %(low)s AND session_id < %(high)s AND status <> 'CANCELLED'
+            GROUP BY session_id
+        ) a ON a.session_id = s.id
+        WHERE s.id >= %(low)s AND s.id < %(high)s
+        AND s.enrolled IS DISTINCT FROM COALESCE(a.actual, 0);
+    """),
+    "classes": ("classes", """
+        SELECT c.id, c.enrolled, COALESCE(k.actual, 0)
+        FROM classes c
+        LEFT JOIN (
+            SELECT class_id, ROUND(AVG(members))::integer AS actual
+            FROM (
+                SELECT class_id, COUNT(DISTINCT member_id) AS members
+                FROM check_ins
+                WHERE class_id >= %(low)s AND class_id < %(high)s AND checkin_time >= %(since)s
+                GROUP BY class_id, checkin_time::date
+            ) days
+            GROUP BY class_id
+        ) k ON k.class_id = c.id
+        WHERE c.id >= %(low)s AND c.id < %(high)s
+        AND c.enrolled IS DISTINCT FROM COALESCE(k.actual, 0);
+    """),
+}
+
+# Compare-and-set: rows whose counter moved since it was read are skipped
+FIX_SQL = """
+    UPDATE {table} t
+    SET enrolled = d.actual
+    FROM unnest(%(ids)s::integer[], %(stored)s::integer[], %(actual)s::integer[]) AS d(id, stored, actual)
+    WHERE t.id = d.id AND t.enrolled IS NOT DISTINCT FROM d.stored;
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcilia los contadores de inscritos de clases y sesiones")
+    parser.add_argument("--install", action="store_true",
+                        help=f"Crear los triggers que mantienen coach_class_sessions.enrolled desde {ATTENDEES}")
+    parser.add_argument("--uninstall", action="store_true", help="Quitar los triggers")
+    parser.add_argument("--only", choices=sorted(COUNTERS), help="Reconciliar solo este contador")
+    parser.add_argument("--window", type=int, default=28,
+                        help="Días de check-ins promediados para los inscritos de una clase (por defecto 28)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Ids por consulta (por defecto 5000)")
+    parser.add_argument("--dry-run", action="store_true", help="Medir la desviación sin corregirla")
+    args = parser.parse_args(argv)
+    if args.window < 1:
+        parser.error("--window debe ser al menos 1")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size debe ser al menos 1")
+    if args.uninstall and (args.install or args.dry_run):
+        parser.error("--uninstall no se combina con --install ni --dry-run")
+    return args
+
+
+def trigger_name(suffix):
+    return f"{ATTENDEES}_enrolled_{suffix}"
+
+
+def install(cursor):
+    cursor.execute(INSTALL_SQL, {op.lower(): deltas for op, deltas in DELTAS.items()})
+    for suffix, event in TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name(suffix)} ON {ATTENDEES};")
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger_name(suffix)} {event.format(table=ATTENDEES)}
+            FOR EACH STATEMENT EXECUTE FUNCTION {TRIGGER_FUNCTION}();
+        """)
+
+
+def uninstall(cursor):
+    for suffix in TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name(suffix)} ON {ATTENDEES};")
+    cursor.execute(f"DROP FUNCTION IF EXISTS {TRIGGER_FUNCTION}();")
+
+
+def installed(cursor):
+    cursor.execute("SELECT COUNT(*) FROM pg_trigger WHERE tgname = ANY(%s);",
+                   ([trigger_name(suffix) for suffix in TRIGGERS],))
+    return cursor.fetchone()[0] == len(TRIGGERS)
+
+
+class Drift:
+    """How far one counter was from the truth, accumulated chunk by chunk."""
+
+    def __init__(self, name):
+        self.name = name
+        self.checked = 0
+        self.drifted = 0
+        self.fixed = 0
+        self.skipped = 0
+        self.over = 0
+        self.under = 0
+        self.total = 0
+        self.worst = []
+        self.elapsed = 0.0
+
+    def add(self, rows, fixed):
+        self.drifted += len(rows)
+        self.fixed += fixed
+        for _, stored, actual in rows:
+            stored = stored or 0
+            if stored > actual:
+                self.over += 1
+            else:
+                self.under += 1
+            self.total += abs(stored - actual)
+        self.worst = sorted(self.worst + rows, key=lambda r: -abs((r[1] or 0) - r[2]))[:MAX_LISTED]
+
+    def print(self, table, dry_run):
+        print(f"\n📊 {table}.enrolled: {self.checked:,} filas revisadas en {self.elapsed:.2f}s")
+        if not self.drifted:
+            print("  ✓ Sin desviación")
+            return
+        share = self.drifted / self.checked if self.checked else 0
+        print(f"  ⚠️  {self.drifted:,} desviadas ({share:.1%}): {self.over:,} por encima, {self.under:,} por debajo")
+        print(f"     desviación total {self.total:,}, media {self.total / self.drifted:.1f}, "
+              f"máxima {abs((self.worst[0][1] or 0) - self.worst[0][2]):,}")
+        for row_id, stored, actual in self.worst:
+            print(f"     id {row_id}: guardado {stored}, real {actual}")
+        if dry_run:
+            print("  ℹ️  Simulación: no se corrigió nada")
+        else:
+            print(f"  ✓ {self.fixed:,} corregidas")
+            if self.skipped:
+                print(f"  ⏳ {self.skipped:,} cambiaron durante la revisión; se corregirán en la próxima ejecución")
+
+
+def reconcile(cursor, name, args):
+    table, drift_sql = COUNTERS[name]
+    drift = Drift(name)
+    started = time.perf_counter()
+    cursor.execute(f"SELECT MIN(id), MAX(id), COUNT(*) FROM {table};")
+    low, high, drift.checked = cursor.fetchone()
+    since = datetime.now() - timedelta(days=args.window)
+    fix_sql = FIX_SQL.format(table=table)
+
+    # Autocommit: every chunk commits on its own and holds its locks briefly
+    for chunk_low in range(low or 0, (high or -1) + 1, args.chunk_size):
+        params = {"low": chunk_low, "high": chunk_low + args.chunk_size, "since": since}
+        cursor.execute(drift_sql, params)
+        rows = cursor.fetchall()
+        if not rows:
+            continue
+        fixed = 0
+        if not args.dry_run:
+            ids, stored, actual = (list(column) for column in zip(*rows))
+            cursor.execute(fix_sql, {"ids": ids, "stored": stored, "actual": actual})
+            fixed = cursor.rowcount
+            drift.skipped += len(rows) - fixed
+        drift.add(rows, fixed)
+    drift.elapsed = time.perf_counter() - started
+    return table, drift
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            sessions = introspect(cursor, ["coach_class_sessions"]).get("coach_class_sessions")
+            if sessions is None or "enrolled" not in {column.name for column in sessions.columns}:
+                print("❌ Falta la columna coach_class_sessions.enrolled")
+                print("   Créala con: python scripts/migrate.py --apply --table coach_class_sessions")
+                sys.exit(1)
+            if args.uninstall:
+                uninstall(cursor)
+                print("🗑️  Triggers de inscritos eliminados; coach_class_sessions.enrolled ya no se actualiza solo")
+                return
+            if args.install:
+                install(cursor)
+                print(f"✅ Triggers instalados en {ATTENDEES}")
+            elif not installed(cursor):
+                print(f"⚠️  Los triggers no están instalados; coach_class_sessions.enrolled solo se corrige "
+                      f"al ejecutar este script (usa --install)")
+            cursor.close()
+
+        with connection(autocommit=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (LOCK_NAME,))
+            if not cursor.fetchone()[0]:
+                print("❌ Error: otra ejecución está reconciliando los contadores en este momento")
+                sys.exit(1)
+            try:
+                names = [args.only] if args.only else list(COUNTERS)
+                print(f"🔄 Reconciliando {', '.join(names)} en bloques de {args.chunk_size:,} ids "
+                      f"(clases: check-ins de los últimos {args.window} días)")
+                results = [reconcile(cursor, name, args) for name in names]
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (LOCK_NAME,))
+                cursor.close()
+
+        for table, drift in results:
+            drift.print(table, args.dry_run)
+        drifted = sum(drift.drifted for _, drift in results)
+        print(f"\n✅ Reconciliación completada: {drifted:,} contadores desviados"
+              + (" (simulación)" if args.dry_run else ""))
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""Keep gym_public_profiles current: the public gym page as one JSON document per gym.
+
+A public page view calls the facilities, schedules, classes and
+membership-plans routes, each looking the gym up again before its own
+query. The profile holds each of those responses under one key, built
+with the same field names, ordering and formatting as the routes:
+
+    {"gym": {...}, "facilities": {"facilities": [...], "amenities": [...]},
+     "schedules": {"schedules": [...], "classesByDay": {...}},
+     "classes": [...], "membershipPlans": [...]}
+
+so the page can be served from one indexed read (by ``gym_id`` or
+``slug``). Admin codes and password hashes are never copied.
+
+``--install`` adds statement-level triggers to the source tables that
+put the changed gym ids in ``_gym_profile_queue`` and NOTIFY
+``gym_profiles``. Every run drains the queue in batches; ``--listen``
+keeps draining as notifications arrive. The queue lives in the same
+transaction as the change, so nothing is lost while no listener runs.
+The classes list is not per gym (the routes return every class), so a
+change to classes or instructors queues every gym.
+
+Usage:
+    python scripts/refresh-gym-profiles.py --install --all   # primera vez
+    python scripts/refresh-gym-profiles.py                   # procesar la cola
+    python scripts/refresh-gym-profiles.py --listen          # servicio
+"""
+import argparse
+import select
+import sys
+import time
+
+import psycopg2
+
+from db import DatabaseConfigError, connect, connection, get_database_url
+from db.catalog import introspect
+from db.pool import backoff_delay, get_settings
+from db.prisma import load_schema, quote
+
+PROFILE_TABLE = "gym_public_profiles"
+QUEUE_TABLE = "_gym_profile_queue"
+CHANNEL = "gym_profiles"
+
+# Source table -> column holding the gym id (None: the table feeds every profile)
+SOURCES = {
+    "gyms": "id",
+    "gym_facilities": "gym_id",
+    "gym_amenities": "gym_id",
+    "gym_schedules": "gym_id",
+    "gym_membership_plans": "gym_id",
+    "classes": None,
+    "instructors": None,
+}
+
+# Never leave the database through a public profile
+PRIVATE_COLUMNS = {"gyms": ("admin_code", "password_hash")}
+
+# Same labels as the routes' dayMap
+DAY_LABELS = {
+    "lunes": "Lunes",
+    "martes": "Martes",
+    "miercoles": "Miércoles",
+    "jueves": "Jueves",
+    "viernes": "Viernes",
+    "sabado": "Sábado",
+    "domingo": "Domingo",
+}
+
+# How Prisma serializes DateTime (stored as UTC without a zone)
+ISO_FORMAT = 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"'
+
+INSTALL_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {QUEUE_TABLE} (
+        gym_id integer PRIMARY KEY,
+        queued_at timestamptz NOT NULL DEFAULT now()
+    );
+
+    CREATE OR REPLACE FUNCTION {QUEUE_TABLE}_enqueue() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_NARGS = 0 OR TG_OP = 'TRUNCATE' THEN
+            INSERT INTO {QUEUE_TABLE} (gym_id) SELECT id FROM gyms ON CONFLICT DO NOTHING;
+        ELSE
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                EXECUTE format(
+                    'INSERT INTO {QUEUE_TABLE} (gym_id) SELECT DISTINCT %1$I FROM new_rows '
+                    'WHERE %1$I IS NOT NULL ON CONFLICT DO NOTHING', TG_ARGV[0]);
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                EXECUTE format(
+                    'INSERT INTO {QUEUE_TABLE} (gym_id) SELECT DISTINCT %1$I FROM old_rows '
+                    'WHERE %1$I IS NOT NULL ON CONFLICT DO NOTHING', TG_ARGV[0]);
+            END IF;
+        END IF;
+        PERFORM pg_notify('{CHANNEL}', '');
+        RETURN NULL;
+    END;
+    $$;
+"""
+
+# Claim a batch of queued gyms; SKIP LOCKED lets two refreshers share the queue
+CLAIM_SQL = f"""
+    DELETE FROM {QUEUE_TABLE}
+    WHERE gym_id IN (
+        SELECT gym_id FROM {QUEUE_TABLE} ORDER BY gym_id LIMIT %s FOR UPDATE SKIP LOCKED
+    )
+    RETURNING gym_id;
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza los perfiles públicos de los gimnasios")
+    parser.add_argument("--install", action="store_true", help="Crear la cola y los triggers en las tablas de origen")
+    parser.add_argument("--uninstall", action="store_true", help="Quitar los triggers y la cola")
+    parser.add_argument("--all", action="store_true", help="Encolar todos los gimnasios (reconstrucción completa)")
+    parser.add_argument("--listen", action="store_true", help="Seguir escuchando cambios (LISTEN) hasta Ctrl+C")
+    parser.add_argument("--batch-size", type=int, default=200, help="Gimnasios por transacción (por defecto 200)")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60,
+        help="Con --listen, segundos entre revisiones de la cola sin notificaciones (por defecto 60)",
+    )
+    args = parser.parse_args(argv)
+    if args.batch_size < 1:
+        parser.error("--batch-size debe ser al menos 1")
+    if args.interval <= 0:
+        parser.error("--interval debe ser mayor que 0")
+    if args.uninstall and (args.install or args.all or args.listen):
+        parser.error("--uninstall no se combina con otras opciones")
+    return args
+
+
+def row_json(spec, alias):
+    """json_build_object() of a row with Prisma's keys and DateTime format."""
+    private = PRIVATE_COLUMNS.get(spec.name, ())
+    pairs = []
+    for column in spec.columns:
+        if column.name in private:
+            continue
+        value = f"{alias}.{quote(column.name)}"
+        if column.type.startswith("timestamp"):
+            value = f"to_char({value}, '{ISO_FORMAT}')"
+        pairs.append(f"'{column.field}', {value}")
+    return f"json_build_object({', '.join(pairs)})"
+
+
+def build_profile_sql(schema):
+    """Upsert the profiles of the gyms in %(ids)s, one statement for the whole batch."""
+    tables = schema.tables
+    days = ", ".join(f"('{key}', '{label}')" for key, label in DAY_LABELS.items())
+
+    def rows(table, order):
+        return (
+            f"(SELECT COALESCE(json_agg({row_json(tables[table], 'x')} ORDER BY {order}, x.id), '[]') "
+            f"FROM {quote(table)} x WHERE x.gym_id = g.id)"
+        )
+
+    # The routes format classes with JS ||, which also skips empty strings
+    return f"""
+        WITH listed AS (
+            SELECT
+                c.id, c.name, c.time, c.duration,
+                COALESCE(NULLIF(i.name, ''), NULLIF(c.instructor_name, ''), 'Sin instructor') AS instructor,
+                COALESCE(d.label, c.day_of_week) AS day,
+                c.enrolled::text || '/' || c.capacity AS occupancy,
+                COALESCE(c.description, '') AS description,
+                COALESCE(NULLIF(c.type, ''), 'General') AS difficulty,
+                row_number() OVER (ORDER BY c.created_at DESC, c.id DESC) AS position
+            FROM classes c
+            LEFT JOIN instructors i ON i.id = c.instructor_id
+            LEFT JOIN (VALUES {days}) AS d(key, label) ON d.key = lower(c.day_of_week)
+        ), shared AS (
+            SELECT
+                (
+                    SELECT COALESCE(json_agg(json_build_object(
+                        'id', id, 'name', name, 'instructor', instructor, 'day', day, 'time', time,
+                        'duration', duration, 'capacity', occupancy, 'description', description,
+                        'difficulty', difficulty
+                    ) ORDER BY position), '[]')
+                    FROM listed
+                ) AS classes,
+                (
+                    SELECT COALESCE(json_object_agg(day, items ORDER BY first), '{{}}')
+                    FROM (
+                        SELECT day, MIN(position) AS first, json_agg(json_build_object(
+                            'time', time, 'class', name, 'instructor', instructor, 'capacity', occupancy
+                        ) ORDER BY position) AS items
+                        FROM listed
+                        GROUP BY day
+                    ) AS by_day
+                ) AS classes_by_day
+        )
+        INSERT INTO {PROFILE_TABLE} (gym_id, slug, profile, refreshed_at)
+        SELECT
+            g.id,
+            g.slug,
+            json_build_object(
+                'gym', {row_json(tables["gyms"], "g")},
+                'facilities', json_build_object(
+                    'facilities', {rows("gym_facilities", 'x."order"')},
+                    'amenities', {rows("gym_amenities", 'x."order"')}
+                ),
+                'schedules', json_build_object(
+                    'schedules', {rows("gym_schedules", "x.day_of_week")},
+                    'classesByDay', shared.classes_by_day
+                ),
+                'classes', shared.classes,
+                'membershipPlans', {rows("gym_membership_plans", 'x."order"')}
+            ),
+            now()
+        FROM gyms g
+        CROSS JOIN shared
+        WHERE g.id = ANY(%(ids)s)
+        ON CONFLICT (gym_id) DO UPDATE
+        SET slug = EXCLUDED.slug, profile = EXCLUDED.profile, refreshed_at = EXCLUDED.refreshed_at;
+    """
+
+
+def trigger_names():
+    """{table: [trigger names]} that --install creates."""
+    names = {}
+    for table, key in SOURCES.items():
+        suffixes = ("all",) if key is None else ("ins", "upd", "del", "trunc")
+        names[table] = [f"{table}_profile_queue_{suffix}" for suffix in suffixes]
+    return names
+
+
+def missing_triggers(cursor):
+    """Source tables whose queue triggers are not all in place."""
+    expected = trigger_names()
+    cursor.execute(
+        "SELECT c.relname, t.tgname FROM pg_trigger t JOIN pg_class c ON c.oid = t.tgrelid "
+        "WHERE t.tgname = ANY(%s);",
+        ([name for names in expected.values() for name in names],),
+    )
+    present = set(cursor.fetchall())
+    return [table for table, names in expected.items() if any((table, name) not in present for name in names)]
+
+
+def install(cursor):
+    cursor.execute(INSTALL_SQL)
+    function = f"{QUEUE_TABLE}_enqueue"
+    for table, key in SOURCES.items():
+        prefix = f"{table}_profile_queue"
+        for suffix in ("ins", "upd", "del", "all", "trunc"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {quote(f'{prefix}_{suffix}')} ON {quote(table)};")
+        if key is None:
+            cursor.execute(
+                f"CREATE TRIGGER {quote(prefix + '_all')} AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE "
+                f"ON {quote(table)} FOR EACH STATEMENT EXECUTE FUNCTION {function}();"
+            )
+            continue
+        # Transition tables: one queue insert per statement, however many rows it touched
+        for suffix, event, tables in (
+            ("ins", "INSERT", "NEW TABLE AS new_rows"),
+            ("upd", "UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+            ("del", "DELETE", "OLD TABLE AS old_rows"),
+        ):
+            cursor.execute(
+                f"CREATE TRIGGER {quote(f'{prefix}_{suffix}')} AFTER {event} ON {quote(table)} "
+                f"REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION {function}('{key}');"
+            )
+        cursor.execute(
+            f"CREATE TRIGGER {quote(prefix + '_trunc')} AFTER TRUNCATE ON {quote(table)} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION {function}();"
+        )
+
+
+def uninstall(cursor):
+    for table in SOURCES:
+        for suffix in ("ins", "upd", "del", "all", "trunc"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {quote(f'{table}_profile_queue_{suffix}')} ON {quote(table)};")
+    cursor.execute(f"DROP FUNCTION IF EXISTS {QUEUE_TABLE}_enqueue();")
+    cursor.execute(f"DROP TABLE IF EXISTS {QUEUE_TABLE};")
+
+
+def drain(profile_sql, batch_size):
+    """Refresh every queued gym, one committed batch at a time; return (refreshed, removed, seconds)."""
+    refreshed = removed = 0
+    started = time.perf_counter()
+    while True:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(CLAIM_SQL, (batch_size,))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                cursor.close()
+                break
+            cursor.execute(profile_sql, {"ids": ids})
+            refreshed += cursor.rowcount
+            # Queued by a DELETE on gyms: the gym is gone, so is its profile
+            cursor.execute(
+                f"DELETE FROM {PROFILE_TABLE} p WHERE p.gym_id = ANY(%s) "
+                f"AND NOT EXISTS (SELECT 1 FROM gyms g WHERE g.id = p.gym_id);",
+                (ids,),
+            )
+            removed += cursor.rowcount
+            cursor.close()
+    return refreshed, removed, time.perf_counter() - started
+
+
+def report_drain(result):
+    refreshed, removed, elapsed = result
+    if refreshed or removed:
+        gone = f", {removed} borrados" if removed else ""
+        print(f"  ✓ {refreshed} perfiles actualizados{gone} en {elapsed * 1000:.0f} ms")
+
+
+def listen(profile_sql, args):
+    """Drain on every NOTIFY (and every --interval seconds) until interrupted."""
+    settings = get_settings()
+    attempt = 0
+    print(f"👂 Escuchando '{CHANNEL}' (Ctrl+C para salir)...\n")
+    while True:
+        try:
+            conn = connect(get_database_url(), autocommit=True)
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL};")
+                attempt = 0
+                # Catch up on whatever was queued while nobody listened
+                report_drain(drain(profile_sql, args.batch_size))
+                while True:
+                    if select.select([conn], [], [], args.interval) != ([], [], []):
+                        conn.poll()
+                        conn.notifies.clear()
+                    report_drain(drain(profile_sql, args.batch_size))
+            finally:
+                conn.close()
+        except psycopg2.OperationalError as e:
+            attempt += 1
+            delay = min(backoff_delay(attempt, settings.retry_backoff), 30)
+            print(f"⚠️  Conexión perdida ({e}); reintentando en {delay:.1f}s")
+            time.sleep(delay)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            if args.uninstall:
+                uninstall(cursor)
+                print("🗑️  Triggers y cola de perfiles eliminados")
+                return
+            if PROFILE_TABLE not in introspect(cursor, [PROFILE_TABLE]):
+                print(f"❌ Falta la tabla {PROFILE_TABLE}")
+                print(f"   Créala con: python scripts/migrate.py --apply --table {PROFILE_TABLE}")
+                sys.exit(1)
+            if args.install:
+                install(cursor)
+                print(f"✅ Triggers instalados en {', '.join(SOURCES)}")
+            elif QUEUE_TABLE not in introspect(cursor, [QUEUE_TABLE]):
+                print(f"❌ Falta la cola {QUEUE_TABLE} y sus triggers")
+                print("   Instálalos con: python scripts/refresh-gym-profiles.py --install --all")
+                sys.exit(1)
+            else:
+                missing = missing_triggers(cursor)
+                if missing:
+                    print(f"⚠️  Faltan triggers en {', '.join(missing)}: sus cambios no se detectan "
+                          f"(vuelve a ejecutar con --install)\n")
+            if args.all:
+                cursor.execute(f"INSERT INTO {QUEUE_TABLE} (gym_id) SELECT id FROM gyms ON CONFLICT DO NOTHING;")
+                print(f"🔄 {cursor.rowcount} gimnasios encolados")
+            cursor.close()
+
+        profile_sql = build_profile_sql(load_schema())
+        if args.listen:
+            listen(profile_sql, args)
+
+        print("🔄 Procesando la cola de perfiles...\n")
+        result = drain(profile_sql, args.batch_size)
+        report_drain(result)
+        if not (result[0] or result[1]):
+            print("  ✓ Sin cambios pendientes")
+
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*), MAX(refreshed_at) FROM {PROFILE_TABLE};")
+            count, latest = cursor.fetchone()
+            cursor.close()
+        print(f"\n✅ {count} perfiles públicos (último: {latest:%Y-%m-%d %H:%M:%S})" if latest
+              else f"\n✅ {count} perfiles públicos")
+
+    except KeyboardInterrupt:
+        print("\n👋 Escucha detenida")
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
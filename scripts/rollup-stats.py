@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Keep the per-gym daily rollups (gym_daily_stats, gym_daily_plan_revenue) current.
+
+Each run recomputes the days that may have changed since the last one,
+whose day and start time are stored in ``_rollup_watermarks``:
+
+* check-ins and new members from the last run's day minus
+  ``--overlap-days`` onwards. Rows that a transaction still open during
+  the last run committed later fall inside that overlap;
+* the creation days of members edited since the last run (plan, gym),
+  so their revenue moves with them;
+* active members, a per-day snapshot, from the last day rolled up, or
+  from the membership start of any edited member (status, end date),
+  within the ``--days`` of history kept.
+
+Days are recomputed, never incremented, so re-reading one is harmless.
+Check-ins and members loaded with dates older than the overlap only reach
+their days with ``--rebuild``. Counters, snapshots and the new marks
+commit in one transaction, so a run that fails changes nothing.
+Revenue uses the dashboard's rule: the plan price per month (``trimestre``
+/3, ``año`` /12), looked up by gym and plan name. So do active members:
+status ``active`` and a membership that had not ended when the day began.
+
+Usage:
+    python scripts/rollup-stats.py                      # incremental
+    python scripts/rollup-stats.py --overlap-days 7     # releer una semana
+    python scripts/rollup-stats.py --rebuild            # borrar y recalcular todo
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+import psycopg2
+
+from db import DatabaseConfigError, connection, statement_timeout
+from db.catalog import introspect
+
+ROLLUP_TABLES = ("gym_daily_stats", "gym_daily_plan_revenue")
+WATERMARK_TABLE = "_rollup_watermarks"
+
+WATERMARK_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+        name text PRIMARY KEY,
+        last_id bigint,
+        last_day date,
+        updated_at timestamp(3) NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    -- Same type as the rollups' updated_at (Prisma's timestamp(3)); older
+    -- installs created it as timestamptz
+    DO $$
+    BEGIN
+        IF (SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = '{WATERMARK_TABLE}'::regclass AND attname = 'updated_at')
+            <> 'timestamp(3) without time zone' THEN
+            ALTER TABLE {WATERMARK_TABLE}
+                ALTER COLUMN updated_at TYPE timestamp(3),
+                ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+        END IF;
+    END $$;
+"""
+
+# One plan per (gym, name), as the route's allPlans.find() picks the first
+PLAN_PRICES_SQL = """
+    SELECT DISTINCT ON (gym_id, name)
+        gym_id, name,
+        CASE period WHEN 'trimestre' THEN price / 3 WHEN 'año' THEN price / 12 ELSE price END AS monthly_price
+    FROM gym_membership_plans
+    ORDER BY gym_id, name, "order", id
+"""
+
+# Each day in range is recomputed, not incremented: running it twice over
+# the same days gives the same counters
+CHECKINS_SQL = """
+    UPDATE gym_daily_stats SET checkins = 0, updated_at = now()
+    WHERE day >= %(first)s AND checkins <> 0;
+
+    INSERT INTO gym_daily_stats (gym_id, day, checkins, updated_at)
+    SELECT m.gym_id, c.checkin_time::date, COUNT(*), now()
+    FROM check_ins c
+    JOIN members m ON m.id = c.member_id
+    WHERE c.checkin_time >= %(first)s AND m.gym_id IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (gym_id, day) DO UPDATE
+    SET checkins = EXCLUDED.checkins, updated_at = now();
+"""
+
+NEW_MEMBERS_SQL = f"""
+    DELETE FROM gym_daily_plan_revenue WHERE day >= %(first)s OR day = ANY(%(days)s::date[]);
+    UPDATE gym_daily_stats SET new_members = 0, revenue = 0, updated_at = now()
+    WHERE (day >= %(first)s OR day = ANY(%(days)s::date[])) AND (new_members <> 0 OR revenue <> 0);
+
+    WITH new_members AS (
+        SELECT m.gym_id, m.created_at::date AS day, m.membership_type AS plan_name,
+               COUNT(*) AS members, COALESCE(SUM(p.monthly_price), 0) AS revenue
+        FROM members m
+        LEFT JOIN ({PLAN_PRICES_SQL}) p ON p.gym_id = m.gym_id AND p.name = m.membership_type
+        WHERE (m.created_at >= %(first)s OR m.created_at::date = ANY(%(days)s::date[])) AND m.gym_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    ), by_plan AS (
+        INSERT INTO gym_daily_plan_revenue (gym_id, day, plan_name, new_members, revenue, updated_at)
+        SELECT gym_id, day, plan_name, members, revenue, now() FROM new_members
+    )
+    INSERT INTO gym_daily_stats (gym_id, day, new_members, revenue, updated_at)
+    SELECT gym_id, day, SUM(members), SUM(revenue), now()
+    FROM new_members
+    GROUP BY 1, 2
+    ON CONFLICT (gym_id, day) DO UPDATE
+    SET new_members = EXCLUDED.new_members, revenue = EXCLUDED.revenue, updated_at = now();
+"""
+
+# Members edited since the last run: the days whose new-member counters
+# and active snapshots they may have moved
+CHANGED_MEMBERS_SQL = """
+    SELECT COUNT(*), COALESCE(array_agg(DISTINCT created_at::date), '{}'), MIN(membership_start)::date
+    FROM members
+    WHERE updated_at >= %s;
+"""
+
+# The dashboard's rule (app/api/admin/stats/route.ts): status 'active' and
+# membership_end not before the start of the day (the route compares with
+# today at 00:00). Like the route, today counts memberships starting later;
+# a past day only those started by its end. Members keep just their current
+# status, so past days count who is 'active' now
+ACTIVE_MEMBERS_SQL = """
+    INSERT INTO gym_daily_stats (gym_id, day, active_members, updated_at)
+    SELECT m.gym_id, d.day::date, COUNT(*), now()
+    FROM generate_series(%(first)s::date, %(last)s::date, interval '1 day') AS d(day)
+    JOIN members m
+        ON m.membership_end >= d.day
+        AND (d.day::date = %(last)s::date OR m.membership_start < d.day + interval '1 day')
+    WHERE m.gym_id IS NOT NULL AND m.status = 'active'
+    GROUP BY 1, 2
+    ON CONFLICT (gym_id, day) DO UPDATE
+    SET active_members = EXCLUDED.active_members, updated_at = now();
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza las tablas de estadísticas diarias por gimnasio")
+    parser.add_argument("--rebuild", action="store_true", help="Borrar los agregados y recalcular desde cero")
+    parser.add_argument(
+        "--days",
+        type=int,
+        default=90,
+        help="Días de historial de miembros activos en la primera ejecución (por defecto 90)",
+    )
+    parser.add_argument(
+        "--overlap-days",
+        type=int,
+        default=2,
+        help="Días ya agregados que se vuelven a leer en cada ejecución (por defecto 2)",
+    )
+    args = parser.parse_args(argv)
+    if args.days < 1:
+        parser.error("--days debe ser al menos 1")
+    if args.overlap_days < 1:
+        parser.error("--overlap-days debe ser al menos 1")
+    return args
+
+
+def read_watermarks(cursor):
+    """{name: (last_day, updated_at)}: the day and start time of the last run."""
+    cursor.execute(f"SELECT name, last_day, updated_at FROM {WATERMARK_TABLE};")
+    return {name: (last_day, updated_at) for name, last_day, updated_at in cursor.fetchall()}
+
+
+def save_watermark(cursor, name, last_day):
+    # now() is the start of this transaction: anything committed later is
+    # at or after it, and the next run re-reads from there minus the overlap
+    cursor.execute(
+        f"""
+        INSERT INTO {WATERMARK_TABLE} (name, last_day, updated_at) VALUES (%s, %s, now())
+        ON CONFLICT (name) DO UPDATE
+        SET last_id = NULL, last_day = EXCLUDED.last_day, updated_at = now();
+        """,
+        (name, last_day),
+    )
+
+
+def first_day(marks, name, overlap_days):
+    """First day to recompute: the last run's day minus the overlap, or all history."""
+    last_day = (marks.get(name) or (None, None))[0]
+    return last_day - timedelta(days=overlap_days) if last_day else date.min
+
+
+def changed_members(cursor, marks, overlap_days):
+    """(count, created days, earliest membership start) of members edited since the last run."""
+    updated_at = (marks.get("members") or (None, None))[1]
+    if updated_at is None:
+        return 0, [], None  # first run: everything is recomputed anyway
+    # The overlap also absorbs the offset between the server's now() and the
+    # UTC timestamps Prisma writes into updated_at
+    cursor.execute(CHANGED_MEMBERS_SQL, (updated_at - timedelta(days=overlap_days),))
+    return cursor.fetchone()
+
+
+def roll_checkins(cursor, marks, overlap_days):
+    first = first_day(marks, "check_ins", overlap_days)
+    cursor.execute(CHECKINS_SQL, {"first": first})
+    save_watermark(cursor, "check_ins", date.today())
+    return first
+
+
+def roll_new_members(cursor, marks, overlap_days, changed_days):
+    first = first_day(marks, "members", overlap_days)
+    cursor.execute(NEW_MEMBERS_SQL, {"first": first, "days": changed_days})
+    save_watermark(cursor, "members", date.today())
+    return first
+
+
+def roll_active_members(cursor, marks, history_days, overlap_days, changed_start):
+    today = date.today()
+    oldest = today - timedelta(days=history_days - 1)
+    last_day = (marks.get("active_members") or (None, None))[0]
+    first = max(last_day - timedelta(days=overlap_days), oldest) if last_day else oldest
+    if changed_start is not None:
+        # A member's edited status or end date can move any snapshot since
+        # their membership started, within the kept history
+        first = min(first, max(changed_start, oldest))
+    cursor.execute(
+        "UPDATE gym_daily_stats SET active_members = 0 WHERE day BETWEEN %s AND %s;",
+        (first, today),
+    )
+    cursor.execute(ACTIVE_MEMBERS_SQL, {"first": first, "last": today})
+    save_watermark(cursor, "active_members", today)
+    return (today - first).days + 1
+
+
+def since(first):
+    return "todo el historial" if first == date.min else f"desde {first:%Y-%m-%d}"
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            missing = [t for t in ROLLUP_TABLES if t not in introspect(cursor, ROLLUP_TABLES)]
+            if missing:
+                print(f"❌ Faltan las tablas {', '.join(missing)}")
+                print("   Créalas con: python scripts/migrate.py --apply " + " ".join(f"--table {t}" for t in missing))
+                sys.exit(1)
+
+            cursor.execute(WATERMARK_DDL)
+            cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext('rollup-stats'));")
+            if not cursor.fetchone()[0]:
+                print("⚠️  Otra ejecución de rollup-stats está en curso")
+                sys.exit(1)
+
+            if args.rebuild:
+                print("🧹 Borrando agregados existentes...\n")
+                cursor.execute(f"TRUNCATE {', '.join(ROLLUP_TABLES)}; DELETE FROM {WATERMARK_TABLE};")
+            marks = read_watermarks(cursor)
+
+            print("🔄 Actualizando estadísticas diarias...\n")
+            # A rebuild or a long gap scans a lot of history
+            with statement_timeout(conn, 0):
+                changed, changed_days, changed_start = changed_members(cursor, marks, args.overlap_days)
+                if changed:
+                    print(f"  ✓ Miembros modificados desde la última ejecución: {changed:,}")
+                first = roll_checkins(cursor, marks, args.overlap_days)
+                print(f"  ✓ Check-ins recalculados {since(first)}")
+                first = roll_new_members(cursor, marks, args.overlap_days, changed_days)
+                extra = f" y {len(changed_days)} días con miembros modificados" if changed_days else ""
+                print(f"  ✓ Miembros nuevos e ingresos recalculados {since(first)}{extra}")
+                days = roll_active_members(cursor, marks, args.days, args.overlap_days, changed_start)
+                print(f"  ✓ Miembros activos recalculados para {days} días")
+
+            conn.commit()
+            cursor.close()
+
+    except (psycopg2.Error, DatabaseConfigError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    print(f"\n✅ Estadísticas actualizadas en {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
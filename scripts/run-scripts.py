@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Run several maintenance scripts in one process so they share the pool.
+
+Usage: python scripts/run-scripts.py create-gym-tables.py setup-gym-auth.py check-db.py
+"""
+import runpy
+import sys
+import time
+from pathlib import Path
+
+from db import close_pool
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+if len(sys.argv) < 2:
+    print("Uso: python scripts/run-scripts.py <script.py> [<script.py> ...]")
+    sys.exit(1)
+
+names = sys.argv[1:]
+missing = [name for name in names if not (SCRIPTS_DIR / name).is_file()]
+if missing:
+    print(f"❌ Scripts no encontrados: {', '.join(missing)}")
+    sys.exit(1)
+
+exit_code = 0
+for name in names:
+    print(f"▶️  {name}\n")
+    started = time.perf_counter()
+    sys.argv = [str(SCRIPTS_DIR / name)]
+    try:
+        runpy.run_path(str(SCRIPTS_DIR / name), run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            exit_code = e.code if isinstance(e.code, int) else 1
+    print(f"\n⏱️  {name}: {time.perf_counter() - started:.2f}s\n")
+    if exit_code:
+        print(f"❌ {name} falló; se detiene la ejecución")
+        break
+
+close_pool()
+sys.exit(exit_code)